@@ -0,0 +1,253 @@
+"""
+bench_guess.py
+--------------
+Воспроизводимое сравнение стратегий начального приближения
+(JutulMiniStepPatch, MS_GUESS) с чистым Jutul на одном наборе кейсов
+вместо одного ручного прогона из таблицы README.
+
+  • кейсы — .DATA из выходов генераторов (run_XXX, edge_cases, BHP_XXX,
+    *_TSTEP_a_b), каждый × каждая стратегия × --repeats повторов;
+    порядок стратегий внутри кейса чередуется, чтобы дрейф машины
+    не ложился на одну стратегию;
+  • на расчёт — case_metrics (wall, фазы, RSS) и итерации / потерянная
+    работа из логов; готовые расчёты при повторном запуске не повторяются;
+  • отчёт JSON (версия схемы, git-ревизия, набор кейсов): медианы по кейсам
+    с бутстреп-ДИ 95 %, отношение к baseline по парам кейсов и, с --compare,
+    флаги регрессий относительно сохранённого отчёта.
+
+    python bench_guess.py D:\\runs\\edge_cases D:\\runs\\QINJ_120 --repeats 3 --limit 20
+    python bench_guess.py … --compare bench_reports/baseline.json --fail-on-regression
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from case_metrics import (DATA_RX, case_record, default_sim, metrics_path, run_monitored,
+                          sim_argv, write_record)
+from case_pipeline import run_jobs
+
+REPORT_VERSION = 1
+STRATEGIES = ("baseline", "original", "lr", "sma", "broyden", "aitken")
+METRICS = ("wall", "t_simulate", "newtons", "linear_iterations", "newtons_wasted")
+DEFAULT_SIM = default_sim("data", "logs", "a")
+
+
+class BenchJob(NamedTuple):
+    strategy: str
+    case: str               # идентификатор кейса (путь относительно корня)
+    data: Path
+    rep: int
+    logs: Path              # каталог логов этого расчёта
+    sim: str
+    initial_dt: int         # сутки, если в имени нет _TSTEP_a_b
+    keep_logs: bool
+    force: bool
+
+
+def run_one(job: BenchJob) -> Dict[str, object]:
+    mp = metrics_path(job.logs)
+    if mp.is_file() and not job.force:
+        rec = json.loads(mp.read_text(encoding="utf-8"))
+        if rec.get("rc") == 0:
+            return rec                  # упавший прогон пересчитывается
+    m = DATA_RX.search(job.data.name)
+    a = int(m.group(1)) if m else job.initial_dt
+    fields = {"data": str(job.data), "logs": str(job.logs), "a": a, "b": 0}
+    cmd = sim_argv(job.sim, **fields)
+    log_path = job.logs.with_suffix(".log")
+    rc, res = run_monitored(cmd, job.data.parent, log_path, env={"MS_GUESS": job.strategy})
+    rec = case_record(job.data, job.logs, log_path, rc, res,
+                      strategy=job.strategy, bench_case=job.case, rep=job.rep)
+    write_record(job.logs, rec)
+    if not job.keep_logs and job.logs.is_dir():
+        shutil.rmtree(job.logs, ignore_errors=True)     # итоги уже в записи
+    return rec
+
+
+def find_cases(roots: Sequence[Path], limit: int) -> Dict[str, Path]:
+    cases: Dict[str, Path] = {}
+    for root in roots:
+        root = root.resolve()
+        paths = [root] if root.is_file() else sorted(root.rglob("*.DATA"))
+        for p in paths:
+            if "!logs" in p.parts or "!bench" in p.parts:
+                continue
+            base = root.parent if root.is_file() else root
+            cases[f"{base.name}/{p.relative_to(base).as_posix()}"] = p
+    if limit and len(cases) > limit:
+        # равномерная детерминированная выборка по отсортированному списку
+        keys = sorted(cases)
+        pick = np.linspace(0, len(keys) - 1, limit).round().astype(int)
+        cases = {keys[i]: cases[keys[i]] for i in sorted(set(pick.tolist()))}
+    return cases
+
+
+# -------------------- статистика ------------------------------------
+
+def median_ci(x: Sequence[float], n_boot: int = 2000, seed: int = 0) -> Dict[str, float]:
+    """Медиана и 95 % бутстреп-ДИ медианы."""
+    x = np.asarray([v for v in x if v is not None and np.isfinite(v)], dtype=float)
+    if x.size == 0:
+        return {"median": None, "ci_lo": None, "ci_hi": None, "n": 0}
+    rng = np.random.default_rng(seed)
+    boot = np.median(rng.choice(x, size=(n_boot, x.size)), axis=1)
+    lo, hi = np.percentile(boot, [2.5, 97.5])
+    return {"median": float(np.median(x)), "ci_lo": float(lo), "ci_hi": float(hi), "n": int(x.size)}
+
+
+def per_case(records: List[dict], strategy: str, metric: str) -> Dict[str, float]:
+    """Медиана повторов на кейс (только успешные расчёты)."""
+    vals: Dict[str, List[float]] = {}
+    for r in records:
+        if r.get("strategy") == strategy and r.get("rc") == 0 and r.get(metric) is not None:
+            vals.setdefault(r["bench_case"], []).append(float(r[metric]))
+    return {c: float(np.median(v)) for c, v in vals.items()}
+
+
+def build_report(records: List[dict], strategies: Sequence[str], cases: Dict[str, Path],
+                 repeats: int, reference: str) -> dict:
+    report: dict = {
+        "version": REPORT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "git": _git_rev(),
+        "cases_sha": hashlib.sha256("\n".join(sorted(cases)).encode()).hexdigest()[:16],
+        "cases": sorted(cases),
+        "repeats": repeats,
+        "reference": reference,
+        "strategies": {},
+    }
+    for s in strategies:
+        entry: dict = {"failed": sum(1 for r in records if r.get("strategy") == s and r.get("rc") != 0)}
+        for metric in METRICS:
+            pc = per_case(records, s, metric)
+            entry[metric] = median_ci(list(pc.values()))
+            if s != reference:
+                ref = per_case(records, reference, metric)
+                ratios = [pc[c] / ref[c] for c in pc if c in ref and ref[c] > 0]
+                entry[metric]["ratio_to_reference"] = median_ci(ratios)
+        report["strategies"][s] = entry
+    return report
+
+
+def compare(report: dict, old: dict, threshold: float) -> List[str]:
+    """Регрессии: медиана вышла за верхнюю границу старого ДИ больше чем на threshold."""
+    flags = []
+    if old.get("cases_sha") != report["cases_sha"]:
+        print("Внимание: набор кейсов отличается от сравниваемого отчёта.", file=sys.stderr)
+    for s, entry in report["strategies"].items():
+        old_entry = old.get("strategies", {}).get(s)
+        if old_entry is None:
+            continue
+        for metric in METRICS:
+            new, ref = entry[metric], old_entry.get(metric, {})
+            if new.get("median") is None or ref.get("ci_hi") is None:
+                continue
+            if new["median"] > ref["ci_hi"] * (1 + threshold):
+                verdict = "regression"
+            elif new["median"] < ref["ci_lo"] * (1 - threshold):
+                verdict = "improvement"
+            else:
+                continue
+            new["vs_stored"] = {"verdict": verdict, "stored_median": ref["median"]}
+            if verdict == "regression":
+                flags.append(f"{s}.{metric}: {ref['median']:g} → {new['median']:g}")
+    return flags
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+                             capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def print_report(report: dict) -> None:
+    ref = report["reference"]
+    print(f"{'стратегия':<10} {'wall, с':>18} {'Newton':>18} {'Newton/ref':>20} {'сбоев':>6}")
+    for s, e in report["strategies"].items():
+        w, n = e["wall"], e["newtons"]
+        rr = e["newtons"].get("ratio_to_reference")
+        fmt = lambda d: "—" if d["median"] is None else f"{d['median']:.4g} [{d['ci_lo']:.4g}, {d['ci_hi']:.4g}]"
+        flag = e["newtons"].get("vs_stored", {}).get("verdict", "")
+        print(f"{s:<10} {fmt(w):>18} {fmt(n):>18} {(fmt(rr) if rr else ref):>20} {e['failed']:>6} {flag}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Бенчмарк стратегий начального приближения")
+    ap.add_argument("roots", nargs="+", type=Path, help="каталоги с кейсами (.DATA) или файлы")
+    ap.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=STRATEGIES)
+    ap.add_argument("--reference", default="baseline", choices=STRATEGIES,
+                    help="с чем сравнивать по парам кейсов")
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--limit", type=int, default=0, help="не больше N кейсов (равномерная выборка)")
+    ap.add_argument("--initial-dt", type=int, default=365,
+                    help="initial_dt, сут, для колод без _TSTEP_a_b в имени")
+    ap.add_argument("--workers", "-j", type=int, default=1,
+                    help="параллельных расчётов (1 — чистые замеры времени)")
+    ap.add_argument("--sim", default=DEFAULT_SIM,
+                    help="команда симулятора; подстановки {data} {logs} {a}; MS_GUESS — в окружении")
+    ap.add_argument("--work", type=Path, default=Path("!bench"), help="каталог логов и записей")
+    ap.add_argument("--out", type=Path, default=None,
+                    help="отчёт JSON (по умолчанию bench_reports/guess_<время>.json)")
+    ap.add_argument("--compare", type=Path, default=None, help="сохранённый отчёт для сравнения")
+    ap.add_argument("--threshold", type=float, default=0.05, help="допуск для флага регрессии")
+    ap.add_argument("--fail-on-regression", action="store_true")
+    ap.add_argument("--keep-logs", action="store_true", help="не удалять jutul_N.jld2 после замера")
+    ap.add_argument("--force", action="store_true", help="пересчитать уже выполненные расчёты (упавшие пересчитываются всегда)")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args(argv)
+
+    strategies = list(dict.fromkeys(args.strategies + [args.reference]))
+    cases = find_cases(args.roots, args.limit)
+    if not cases:
+        raise SystemExit("Кейсы (.DATA) не найдены.")
+    work = args.work.resolve()
+
+    def jobs():
+        for rep in range(args.repeats):
+            for i, (case, data) in enumerate(sorted(cases.items())):
+                k = (i + rep) % len(strategies)            # чередование порядка стратегий
+                for s in strategies[k:] + strategies[:k]:
+                    logs = work / s / case.replace("/", "__") / f"rep{rep}"
+                    yield BenchJob(s, case, data, rep, logs, args.sim, args.initial_dt,
+                                   args.keep_logs, args.force)
+
+    records: List[dict] = []
+    print(f"Кейсов: {len(cases)}, стратегий: {len(strategies)}, повторов: {args.repeats}")
+    run_jobs(run_one, jobs(), workers=args.workers, dry_run=args.dry_run,
+             describe=lambda j: f"{j.strategy:<9} rep{j.rep} {j.case}",
+             on_result=records.append)
+    if args.dry_run:
+        return
+
+    report = build_report(records, strategies, cases, args.repeats, args.reference)
+    flags = compare(report, json.loads(args.compare.read_text(encoding="utf-8")),
+                    args.threshold) if args.compare else []
+    out = args.out or Path("bench_reports") / f"guess_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+    print_report(report)
+    print(f"Отчёт: {out}")
+    if flags:
+        print("Регрессии:\n  " + "\n  ".join(flags))
+        if args.fail_on_regression:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+case_metrics.py
+---------------
+Ресурсы и время каждого расчёта рядом с итерациями: экономят ли стратегии
+начального приближения (src/simulator_linear_comb.jl) время, а не только
+число Ньютонов.
+
+Запуск симулятора оборачивается в Monitor:
+  • wall, CPU user/sys, пиковый RSS, байты чтения/записи процесса
+    (psutil, если установлен; иначе rusage дочернего процесса через wait4);
+  • фазы — строки `@phase <имя> <секунды>` в выводе симулятора
+    (run_tstep_case.jl печатает load / setup / simulate); остаток wall —
+    запуск Julia и компиляция (startup);
+  • запись кейса — <!logs/TSTEP_a_b>.metrics.json вместе с итерациями
+    из логов jutul_N.jld2 (wasted_work) или *.PRT.
+
+    python case_metrics.py D:\\runs -o D:\\runs\\case_metrics.csv    # сводная таблица
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import re
+import shlex
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+PHASE_RX = re.compile(r"^@phase\s+(\w+)\s+([0-9.eE+-]+)\s*$", re.M)
+METRICS_SUFFIX = ".metrics.json"
+DATA_RX = re.compile(r"_TSTEP_(\d+)_(\d+)\.DATA$", re.I)
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class Resources(NamedTuple):
+    wall: float             # с
+    cpu_user: float         # с
+    cpu_sys: float          # с
+    peak_rss: int           # байт
+    read_bytes: int
+    write_bytes: int
+
+
+class Monitor:
+    """Наблюдение за процессом симулятора; poll() вызывается периодически."""
+
+    def __init__(self, proc: subprocess.Popen):
+        self.proc = proc
+        self.t0 = time.perf_counter()
+        self.wall = 0.0
+        self.peak_rss = 0
+        self.cpu = (0.0, 0.0)
+        self.io = (0, 0)
+        self._ps = None
+        if psutil is not None:
+            try:
+                self._ps = psutil.Process(proc.pid)
+            except psutil.Error:
+                self._ps = None
+
+    def _sample(self) -> None:
+        if self._ps is None:
+            return
+        try:
+            procs = [self._ps] + self._ps.children(recursive=True)
+            self.peak_rss = max(self.peak_rss, sum(p.memory_info().rss for p in procs))
+            t = self._ps.cpu_times()
+            self.cpu = (t.user + t.children_user, t.system + t.children_system)
+            if hasattr(self._ps, "io_counters"):
+                c = self._ps.io_counters()
+                self.io = (c.read_bytes, c.write_bytes)
+        except psutil.Error:
+            pass                    # процесс уже завершился — остаётся последний замер
+
+    def poll(self) -> Optional[int]:
+        if self.proc.returncode is not None:
+            return self.proc.returncode
+        self._sample()
+        if self._ps is None and hasattr(os, "wait4"):
+            # без psutil: rusage именно этого ребёнка (POSIX)
+            pid, status, ru = os.wait4(self.proc.pid, os.WNOHANG)
+            if pid == 0:
+                return None
+            self.proc.returncode = os.waitstatus_to_exitcode(status)
+            self.peak_rss = ru.ru_maxrss * 1024         # Linux: КБ
+            self.cpu = (ru.ru_utime, ru.ru_stime)
+            self.io = (ru.ru_inblock * 512, ru.ru_oublock * 512)
+        elif self.proc.poll() is None:
+            return None
+        self.wall = time.perf_counter() - self.t0
+        return self.proc.returncode
+
+    def resources(self) -> Resources:
+        wall = self.wall or time.perf_counter() - self.t0
+        return Resources(round(wall, 3), round(self.cpu[0], 3), round(self.cpu[1], 3),
+                         int(self.peak_rss), int(self.io[0]), int(self.io[1]))
+
+
+RUN_TSTEP_CASE = Path(__file__).with_name("run_tstep_case.jl")
+
+
+def _quote(arg: str) -> str:
+    if os.name != "nt":
+        return shlex.quote(arg)
+    return f'"{arg}"' if any(c.isspace() for c in arg) else arg
+
+
+def default_sim(*fields: str) -> str:
+    """--sim по умолчанию: julia run_tstep_case.jl {поле} …; путь к скрипту — в кавычках."""
+    return " ".join(["julia", _quote(str(RUN_TSTEP_CASE))] + [f"{{{f}}}" for f in fields])
+
+
+def sim_argv(sim: str, **fields: object) -> List[str]:
+    """
+    argv команды --sim с подстановками {data} {logs} {a} …; пустые аргументы
+    опускаются. Кавычки разбираются как в shell (в Windows — только снимаются
+    с краёв аргумента, обратные слэши путей не трогаются).
+    """
+    if os.name == "nt":
+        toks = [t[1:-1] if len(t) > 1 and t[0] == t[-1] and t[0] in "\"'" else t
+                for t in shlex.split(sim, posix=False)]
+    else:
+        toks = shlex.split(sim)
+    return [t for t in (tok.format(**fields) for tok in toks) if t]
+
+
+def launch(cmd: Sequence[str], cwd: Path, log_path: Path,
+           env: Optional[Dict[str, str]] = None) -> Monitor:
+    """Процесс симулятора (stdout+stderr → log_path) под наблюдением; env дополняет окружение."""
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    out = open(log_path, "w", encoding="utf-8")
+    try:
+        proc = subprocess.Popen(list(cmd), cwd=cwd, stdout=out, stderr=subprocess.STDOUT,
+                                env={**os.environ, **env} if env else None)
+    finally:
+        out.close()                           # дескриптор уже унаследован процессом
+    return Monitor(proc)
+
+
+def run_monitored(cmd: Sequence[str], cwd: Path, log_path: Path,
+                  interval: float = 0.1, env: Optional[Dict[str, str]] = None) -> tuple:
+    """Блокирующий запуск → (код выхода, Resources)."""
+    mon = launch(cmd, cwd, log_path, env)
+    while (rc := mon.poll()) is None:
+        time.sleep(interval)
+    return rc, mon.resources()
+
+
+# -------------------- запись кейса ----------------------------------
+
+def read_phases(log_path: Path) -> Dict[str, float]:
+    try:
+        text = log_path.read_text(encoding="utf-8", errors="ignore")
+    except OSError:
+        return {}
+    return {name: float(sec) for name, sec in PHASE_RX.findall(text)}
+
+
+def iteration_stats(data: Path, logs: Path) -> Dict[str, object]:
+    """Итерации кейса: из jutul_N.jld2 (как counter.jl) или из PRT."""
+    if logs.is_dir() and any(logs.glob("jutul_*.jld2")):
+        from jutul_logs import read_logs_dir
+        from wasted_work import summarize
+
+        s = summarize(read_logs_dir(logs))
+        out: Dict[str, object] = {"steps": s.nsteps, "ministeps": s.tot_ms}
+        for k, w in s.work.items():
+            out[k] = w.total
+            out[f"{k}_wasted"] = w.wasted
+        return out
+    prt = data.with_suffix(".PRT")
+    if prt.is_file():
+        from prt_stats import summarize as prt_summary
+
+        s = prt_summary(prt)
+        return {"steps": s.steps, "newtons": s.newton, "linear_iterations": s.linear}
+    return {}
+
+
+def case_record(data: Path, logs: Path, log_path: Path, rc: int, res: Resources,
+                **extra) -> Dict[str, object]:
+    m = DATA_RX.search(data.name)
+    phases = read_phases(log_path)
+    rec: Dict[str, object] = {
+        "case": data.parent.name, "data": data.name,
+        "a": int(m.group(1)) if m else None, "b": int(m.group(2)) if m else None,
+        "rc": rc, **res._asdict(),
+    }
+    for name, sec in phases.items():
+        rec[f"t_{name}"] = sec
+    if phases:
+        rec["t_startup"] = round(max(res.wall - sum(phases.values()), 0.0), 3)
+    rec["log_bytes"] = sum(p.stat().st_size for p in logs.glob("*") if p.is_file()) \
+        if logs.is_dir() else 0
+    rec.update(extra)
+    if rc == 0:
+        try:
+            rec.update(iteration_stats(data, logs))
+        except (OSError, ValueError, SystemExit) as e:
+            rec["stats_error"] = str(e)
+    return rec
+
+
+def metrics_path(logs: Path) -> Path:
+    return logs.with_name(logs.name + METRICS_SUFFIX)
+
+
+def write_record(logs: Path, rec: Dict[str, object]) -> Path:
+    path = metrics_path(logs)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(rec, ensure_ascii=False, indent=1), encoding="utf-8")
+    return path
+
+
+def collect(root: Path) -> List[Dict[str, object]]:
+    rows = []
+    for p in sorted(root.rglob(f"*{METRICS_SUFFIX}")):
+        try:
+            rec = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        rec["path"] = p.parent.parent.relative_to(root).as_posix()
+        rows.append(rec)
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser("Сводка ресурсов и итераций по кейсам (*.metrics.json)")
+    ap.add_argument("root", type=Path)
+    ap.add_argument("--out", "-o", type=Path, default=None,
+                    help="CSV (по умолчанию <root>/case_metrics.csv)")
+    args = ap.parse_args()
+
+    rows = collect(args.root.resolve())
+    if not rows:
+        raise SystemExit(f"Под {args.root} нет *{METRICS_SUFFIX}.")
+    cols: List[str] = []
+    for r in rows:
+        cols += [k for k in r if k not in cols]
+    out = args.out or args.root / "case_metrics.csv"
+    with open(out, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=cols)
+        w.writeheader()
+        w.writerows(rows)
+    wall = sum(float(r.get("wall", 0)) for r in rows)
+    newt = sum(int(r.get("newtons", 0) or 0) for r in rows)
+    print(f"Кейсов: {len(rows)}, wall {wall / 3600:.2f} ч, Newton {newt} → {out}")
@@ -0,0 +1,181 @@
+"""
+case_pipeline.py
+----------------
+Общий драйвер генерации кейсов на пуле процессов:
+  • задания (патч + запись файла) выполняются на ProcessPoolExecutor;
+  • в полёте не больше `inflight` заданий — генератор заданий читается лениво,
+    память не растёт с размером перебора;
+  • результаты печатаются строго в порядке заданий (имена детерминированы);
+  • --dry-run только печатает план.
+
+Функция-исполнитель и задания должны сериализоваться pickle (функция уровня
+модуля), а скрипт-генератор — запускаться из-под `if __name__ == "__main__":`
+(на Windows процессы пула заново импортируют главный модуль).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, NamedTuple, Optional
+
+from deck_patch import DeckTemplate, case_values
+from include_store import IncludeStore, file_digest
+from manifest import CaseResult, Manifest, add_manifest_args, write_case
+from sweep import GRID_ORDER, Sweep
+
+
+def add_pool_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--workers", "-j", type=int, default=os.cpu_count() or 1,
+                    help="число процессов генерации (1 = без пула)")
+    ap.add_argument("--inflight", type=int, default=0,
+                    help="макс. заданий в очереди пула (0 = 4 × workers)")
+    ap.add_argument("--dry-run", action="store_true",
+                    help="только показать план, ничего не записывать")
+
+
+def run_jobs(fn: Callable, jobs: Iterable, *,
+             workers: int = 1,
+             inflight: int = 0,
+             dry_run: bool = False,
+             describe: Callable[[object], str] = str,
+             initializer: Optional[Callable] = None,
+             initargs: tuple = (),
+             on_result: Optional[Callable[[object], None]] = None,
+             quiet: bool = False) -> int:
+    """
+    Выполняет fn(job) для всех заданий, печатает результат каждого по порядку
+    (или передаёт его в `on_result`). Возвращает число выполненных
+    (в dry-run — запланированных) заданий.
+    """
+    t0 = time.perf_counter()
+    n = 0
+
+    def done(res) -> None:
+        if on_result is not None:
+            on_result(res)
+        elif not quiet and res:
+            print(res)
+
+    if dry_run:
+        for job in jobs:
+            n += 1
+            print(f"[план] {describe(job)}")
+        print(f"[план] всего заданий: {n}")
+        return n
+
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for job in jobs:
+            done(fn(job))
+            n += 1
+    else:
+        limit = inflight if inflight > 0 else 4 * workers
+        pending: Deque[Future] = deque()
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                                 initargs=initargs) as pool:
+            for job in jobs:
+                pending.append(pool.submit(fn, job))
+                if len(pending) >= limit:
+                    done(pending.popleft().result())
+                    n += 1
+            while pending:
+                done(pending.popleft().result())
+                n += 1
+
+    if not quiet:
+        print(f"Выполнено заданий: {n} за {time.perf_counter() - t0:.2f} с "
+              f"(процессов: {max(1, workers)})")
+    return n
+
+
+# -------------------- задания на один шаблон .DATA --------------------
+
+class DeckJob(NamedTuple):
+    root: Path                  # корень вывода (там же манифест)
+    rel: str                    # путь .DATA относительно root
+    values: Dict[str, object]   # поля DeckTemplate.render
+    label: str                  # строка для лога / плана
+    old: Optional[Dict[str, dict]] = None   # записи манифеста о файлах кейса
+
+
+_deck: Optional[DeckTemplate] = None
+
+
+def init_deck(text: str) -> None:
+    """Инициализатор процесса пула: шаблон разбирается один раз на процесс."""
+    global _deck
+    _deck = DeckTemplate(text)
+
+
+def write_deck(job: DeckJob) -> CaseResult:
+    case = Path(job.rel).parts[0]
+    return write_case(job.root, case, {job.rel: _deck.render(job.values)},
+                      job.old, f"✓ {job.label}")
+
+
+def describe_deck(job: DeckJob) -> str:
+    return f"{job.root / job.rel}: {job.label}"
+
+
+# -------------------- сетки run_XXX (build_32_cases / edge_cases) ---------
+
+GRID_GENERATOR = "build_grid_cases/1"   # смена версии → перепроверка всех кейсов
+
+
+def build_grid_cases(template_data: Path, inc_files: Iterable[str], output_root: Path,
+                     spec: Path, argv=None) -> int:
+    """
+    Общий main() генераторов сеток: кейсы (bhp, skin, qinj, so, p_init) из
+    спецификации перебора (sweep.py) → папки run_XXX с патченым .DATA
+    и ссылками на *.INC.
+    """
+    ap = argparse.ArgumentParser("Генерация run_XXX по сетке параметров")
+    ap.add_argument("--spec", type=Path, default=spec,
+                    help=f"спецификация перебора (по умолчанию {spec.name})")
+    add_pool_args(ap)
+    add_manifest_args(ap)
+    args = ap.parse_args(argv)
+
+    sweep = Sweep.from_file(args.spec)
+    template_dir = template_data.parent
+    template_sha = file_digest(template_data)
+    manifest = Manifest(output_root, GRID_GENERATOR)
+    store = None
+    if not args.dry_run:
+        output_root.mkdir(parents=True, exist_ok=True)
+        store = IncludeStore(output_root)   # *.INC — ссылками на общий экземпляр
+
+    def jobs():
+        for run_id, params in enumerate(sweep.tuples(GRID_ORDER), 1):
+            bhp, skin, qinj, so, p_init = params
+            case = f"run_{run_id:03d}"
+            if store is not None:
+                (output_root / case).mkdir(exist_ok=True)
+                for inc in inc_files:
+                    store.link(template_dir / inc, output_root / case / inc)
+            inputs = manifest.inputs(template_sha, dict(zip(GRID_ORDER, params)))
+            if not manifest.plan(case, inputs, args.force):
+                continue
+            yield DeckJob(output_root, f"{case}/{template_data.name}",
+                          case_values(so, p_init, skin, bhp, qinj),
+                          f"{case}: SO={so:.2f}, P={p_init}, "
+                          f"skin={skin}, BHP={bhp}, Qinj={qinj}",
+                          manifest.known(case))
+
+    text = "" if args.dry_run else template_data.read_text(encoding="utf-8", errors="ignore")
+    n = run_jobs(write_deck, jobs(), workers=args.workers, inflight=args.inflight,
+                 dry_run=args.dry_run, describe=describe_deck,
+                 initializer=init_deck, initargs=(text,), on_result=manifest.collect)
+    if sweep.duplicates:
+        print(f"Отброшено повторяющихся наборов параметров: {sweep.duplicates}")
+    if not args.dry_run:
+        manifest.finish(args.prune)
+    if store is not None:
+        print(store.report())
+    return n + manifest.counts["unchanged"]
@@ -0,0 +1,102 @@
+# ============================================================
+# deck_cache.jl
+# setup_case_cached(data_path) — замена setup_case_from_data_file
+# для колод, подготовленных deck_cache.py:
+#   <stem>.deck_delta рядом с .DATA: `-- @deck_head <sha> <cache>`
+#   и секция SCHEDULE кейса; <cache>/<sha>.deck_head — общая часть
+#   до SCHEDULE (RUNSPEC … SOLUTION).
+# Разбор head делается один раз на ключ и сохраняется рядом
+# (<sha>.jl<версия Julia>.bin, Serialization); кейс дочитывает
+# только свой SCHEDULE. Нет delta или она устарела — обычный
+# setup_case_from_data_file.
+# Для каждого ключа первый кейс сравнивается с полным разбором
+# исходной .DATA (с её INCLUDE, а не склейки head+delta;
+# <key>.ok — совпало); расхождение → ключ помечается .bad и дальше
+# читается полностью. ENV DECK_CACHE_VERIFY=0 отключает сравнение.
+# Ошибка быстрого разбора не подменяется полным: ключ помечается .bad
+# (с текстом ошибки), ошибка пробрасывается — кейс падает явно, а
+# следующие кейсы этого ключа читаются полностью.
+# ============================================================
+using Serialization
+
+# parse_data_file! — из модуля, которому принадлежит parse_data_file
+# (GeoEnergyIO.InputParser на JutulDarcy 0.2.44 / GeoEnergyIO 1.1.25;
+# JutulDarcy его только реэкспортирует)
+const DECK_PARSER = parentmodule(parse_data_file)
+isdefined(DECK_PARSER, :parse_data_file!) ||
+    error("deck_cache: в $(DECK_PARSER) нет parse_data_file! — проверьте версию GeoEnergyIO")
+
+const DECK_HEAD_RX = r"^--\s*@deck_head\s+(\S+)\s+(.+?)\s*$"
+const DECK_HEADS = Dict{String, Dict{String, Any}}()     # разобранные head в процессе
+
+function _delta_for(data_path::AbstractString)
+    delta = string(splitext(data_path)[1], ".deck_delta")
+    isfile(delta) || return nothing
+    newest = mtime(data_path)
+    inc = joinpath(dirname(data_path), "INCLUDE")
+    if isdir(inc)
+        for f in readdir(inc; join=true)
+            isfile(f) && (newest = max(newest, mtime(f)))
+        end
+    end
+    return mtime(delta) >= newest ? delta : nothing
+end
+
+function _load_head(key::AbstractString, cache::AbstractString)
+    haskey(DECK_HEADS, key) && return DECK_HEADS[key]
+    bin = joinpath(cache, "$(key).jl$(VERSION).bin")
+    head = nothing
+    if isfile(bin)
+        head = try
+            deserialize(bin)
+        catch err
+            # другая версия пакетов / битый файл — разбираем head заново
+            @warn "deck_cache: не прочитан $(bin), head разбирается заново" exception=err
+            nothing
+        end
+    end
+    if head === nothing
+        head = parse_data_file(joinpath(cache, "$(key).deck_head"))
+        tmp = "$(bin).$(getpid()).tmp"
+        serialize(tmp, head)
+        mv(tmp, bin; force=true)
+    end
+    DECK_HEADS[key] = head
+    return head
+end
+
+function parse_data_cached(data_path::AbstractString;
+        verify::Bool = get(ENV, "DECK_CACHE_VERIFY", "1") != "0")
+    delta = _delta_for(data_path)
+    delta === nothing && return parse_data_file(data_path)
+    m = match(DECK_HEAD_RX, readline(delta))
+    m === nothing && error("deck_cache: $(delta) без строки `-- @deck_head`")
+    key, cache = m.captures
+    isfile(joinpath(cache, "$(key).bad")) && return parse_data_file(data_path)
+
+    data = try
+        d = deepcopy(_load_head(key, cache))
+        DECK_PARSER.parse_data_file!(d, delta)
+        d
+    catch err
+        write(joinpath(cache, "$(key).bad"), "$(data_path)\n" * sprint(showerror, err))
+        @error "deck_cache: быстрый разбор не удался, ключ отключён" data_path key
+        rethrow()
+    end
+
+    ok_mark = joinpath(cache, "$(key).ok")
+    if verify && !isfile(ok_mark)
+        ref = parse_data_file(data_path)       # исходная колода, не head+delta
+        if isequal(ref, data)
+            touch(ok_mark)
+        else
+            @warn "deck_cache: разбор по частям отличается от полного, ключ отключён" key
+            touch(joinpath(cache, "$(key).bad"))
+            return ref
+        end
+    end
+    return data
+end
+
+setup_case_cached(data_path::AbstractString; kwarg...) =
+    setup_case_from_parsed_data(parse_data_cached(data_path); kwarg...)
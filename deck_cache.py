@@ -0,0 +1,147 @@
+"""
+deck_cache.py
+-------------
+Предобработка колод перед расчётом: каждый рабочий процесс run_bhp_parallel.jl
+заново читает и токенизирует одни и те же ~240 КБ ACTIVE.INC / MDARCY.INC
+(а генераторы кладут в каждый кейс свою копию INCLUDE).
+
+  • колода кейса раскрывается в плоскую (INCLUDE подставлены, комментарии
+    и пустые строки убраны) и режется на две части по SCHEDULE;
+  • часть до SCHEDULE (RUNSPEC … SOLUTION, вся тяжёлая сетка) кладётся
+    в кэш один раз: <cache>/<sha>.deck_head, ключ — хэш содержимого;
+  • рядом с кейсом пишется маленькая <stem>.deck_delta: строка-метка
+    `-- @deck_head <sha> <cache>` и секция SCHEDULE кейса.
+
+deck_cache.jl (setup_case_cached) разбирает head один раз на ключ и
+хранит результат разбора бинарным файлом в том же каталоге кэша; для
+кейса остаётся разобрать только delta. Если delta старше колоды или
+её INCLUDE/, она не используется — кейс читается как обычно. Первый
+кейс каждого ключа сверяется с полным разбором (<sha>.ok); расхождение
+или ошибка разбора по частям отключают ключ (<sha>.bad, см. stats).
+
+    python deck_cache.py build D:\\runs --cache D:\\deck_cache
+    python deck_cache.py stats --cache D:\\deck_cache
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from result_cache import flatten_deck, split_schedule
+
+# не .DATA — чтобы rglob("*.DATA") генераторов и очередей их не подхватывал
+DELTA_SUFFIX = ".deck_delta"
+HEAD_SUFFIX = ".deck_head"
+MARK = "-- @deck_head"
+_INCLUDE_LEFT_RX = re.compile(rb"^[ \t]*INCLUDE\b", re.M | re.I)
+
+
+class Prepared(NamedTuple):
+    delta: Path
+    key: str
+    flat_bytes: int         # плоская колода целиком
+    delta_bytes: int
+    new_head: bool          # head записан впервые
+
+
+def _compact(text: str) -> str:
+    return "\n".join(ln.rstrip() for ln in text.splitlines() if ln.strip()) + "\n"
+
+
+def delta_path(data: Path) -> Path:
+    return data.with_name(data.stem + DELTA_SUFFIX)
+
+
+def prepare(data: Path, cache: Path) -> Prepared:
+    """Плоская колода кейса → общий head в кэше + delta рядом с кейсом."""
+    flat = flatten_deck(data.read_bytes(), data.parent)
+    if _INCLUDE_LEFT_RX.search(flat):
+        raise ValueError(f"{data.name}: не найден файл INCLUDE — колода не раскрыта целиком")
+    head, schedule = split_schedule(flat.decode("utf-8", "replace"))
+    if not schedule:
+        raise ValueError(f"{data.name}: нет секции SCHEDULE")
+    head, schedule = _compact(head), _compact(schedule)
+
+    key = hashlib.sha256(head.encode("utf-8")).hexdigest()[:32]
+    head_path = cache / f"{key}{HEAD_SUFFIX}"
+    new_head = not head_path.is_file()
+    if new_head:
+        cache.mkdir(parents=True, exist_ok=True)
+        tmp = head_path.with_name(f"{head_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(head, encoding="utf-8", newline="\n")
+        os.replace(tmp, head_path)
+
+    out = delta_path(data)
+    text = f"{MARK} {key} {cache.resolve()}\n{schedule}"
+    if not out.is_file() or out.read_text(encoding="utf-8") != text:
+        out.write_text(text, encoding="utf-8", newline="\n")
+    else:
+        os.utime(out)                       # свежее колоды — используется
+    return Prepared(out, key, len(head) + len(schedule), len(text.encode("utf-8")), new_head)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Плоские колоды: общий head в кэше + delta на кейс")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="подготовить delta для кейсов")
+    p_build.add_argument("roots", nargs="+", type=Path)
+    p_build.add_argument("--glob", default="*.DATA", help="шаблон имён колод")
+    p_build.add_argument("--cache", type=Path, required=True, help="каталог общих head")
+    p_stats = sub.add_parser("stats", help="содержимое кэша")
+    p_stats.add_argument("--cache", type=Path, required=True)
+    p_clean = sub.add_parser("clean", help="удалить delta под каталогами")
+    p_clean.add_argument("roots", nargs="+", type=Path)
+    args = ap.parse_args(argv)
+
+    if args.command == "stats":
+        heads = sorted(args.cache.glob(f"*{HEAD_SUFFIX}"))
+        bins = [p for p in args.cache.iterdir() if p.suffix == ".bin"] if args.cache.is_dir() else []
+        size = sum(p.stat().st_size for p in heads)
+        print(f"head: {len(heads)} ({size / 2**20:.1f} МБ), разобранных (.bin): {len(bins)}")
+        oks = list(args.cache.glob("*.ok")) if args.cache.is_dir() else []
+        bads = sorted(args.cache.glob("*.bad")) if args.cache.is_dir() else []
+        print(f"сверено с полным разбором: {len(oks)}, отключено (.bad): {len(bads)}")
+        for p in bads:
+            lines = p.read_text(encoding="utf-8", errors="replace").splitlines()
+            print(f"  ✗ {p.stem[:16]}: {lines[-1] if lines else 'разбор по частям отличается от полного'}")
+        return
+    if args.command == "clean":
+        n = 0
+        for root in args.roots:
+            for p in root.rglob(f"*{DELTA_SUFFIX}"):
+                p.unlink()
+                n += 1
+        print(f"Удалено delta: {n}")
+        return
+
+    cache = args.cache.resolve()
+    n = heads = failed = 0
+    src_bytes = delta_bytes = 0
+    for root in args.roots:
+        paths = [root] if root.is_file() else sorted(root.rglob(args.glob))
+        for data in paths:
+            if "!logs" in data.parts:
+                continue
+            try:
+                r = prepare(data, cache)
+            except (OSError, ValueError) as e:
+                print(f"✗ {data}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            n += 1
+            heads += r.new_head
+            src_bytes += r.flat_bytes
+            delta_bytes += r.delta_bytes
+    print(f"Кейсов: {n} (ошибок {failed}), новых head: {heads}; "
+          f"на кейс читается {delta_bytes / max(n, 1) / 2**10:.1f} КБ вместо "
+          f"{src_bytes / max(n, 1) / 2**10:.1f} КБ")
+
+
+if __name__ == "__main__":
+    main()
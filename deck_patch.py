@@ -0,0 +1,211 @@
+"""
+deck_patch.py
+-------------
+Однопроходный движок патчей .DATA:
+  • шаблон один раз режется на блоки ключевых слов (SOIL, SWAT, PRESSURE,
+    COMPDAT, WCONPROD, WCONINJE, TSTEP, DATES) со смещениями в тексте;
+  • внутри блоков запоминаются позиции всех значений («слоты»);
+  • каждый вариант кейса собирается склейкой неизменных кусков шаблона
+    и новых значений — без повторных regex-проходов по всему файлу.
+
+Пример:
+    deck = DeckTemplate.from_file(Path("Egg_Model_ECL.DATA"))
+    txt = deck.render({"soil": "0.80", "swat": "0.20", "bhp": 350})
+"""
+
+from __future__ import annotations
+
+import re
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional
+
+# массивы: блок заканчивается первым '/'
+ARRAY_KEYWORDS = {"SOIL", "SWAT", "PRESSURE", "TSTEP"}
+# списки записей: каждая запись закрывается '/', пустая запись '/' — конец блока
+RECORD_KEYWORDS = {"COMPDAT", "WCONPROD", "WCONINJE", "DATES"}
+KEYWORDS = ARRAY_KEYWORDS | RECORD_KEYWORDS
+
+# номер item'а с режимом управления скважиной
+CONTROL_ITEM = {"WCONPROD": 3, "WCONINJE": 4}
+
+KEYWORD_RX = re.compile(r"[A-Za-z][A-Za-z0-9_]*")
+TOKEN_RX = re.compile(r"'[^']*'|/|[^\s/']+")
+REPEAT_RX = re.compile(r"(\d+)\*(.*)")
+
+
+class Block(NamedTuple):
+    keyword: str
+    start: int          # начало строки с ключевым словом
+    end: int            # позиция сразу после завершающего '/'
+
+
+class Slot(NamedTuple):
+    keyword: str
+    well: Optional[str]     # имя скважины (для записей), иначе None
+    control: Optional[str]  # режим управления ('BHP', 'RATE', …) или None
+    item: int               # номер item'а в записи / номер токена в массиве (с 1)
+    start: int
+    end: int
+
+
+# именованные поля → какие слоты они заполняют
+FIELDS: Dict[str, Callable[[Slot], bool]] = {
+    "soil":     lambda s: s.keyword == "SOIL",
+    "swat":     lambda s: s.keyword == "SWAT",
+    "pressure": lambda s: s.keyword == "PRESSURE",
+    "bhp":      lambda s: s.keyword == "WCONPROD" and s.control == "BHP" and s.item == 9,
+    "orat":     lambda s: s.keyword == "WCONPROD" and s.control == "ORAT" and s.item == 4,
+    "qinj":     lambda s: s.keyword == "WCONINJE" and s.control == "RATE" and s.item == 5,
+    "skin":     lambda s: (s.keyword == "COMPDAT" and s.item == 11
+                           and s.well is not None and s.well.startswith("PROD")),
+    "tstep":    lambda s: s.keyword == "TSTEP",
+    # день, месяц, год каждой записи DATES подряд (время, item 4, не трогаем)
+    "dates":    lambda s: s.keyword == "DATES" and s.item <= 3,
+}
+
+
+def _strip_comment(line: str) -> str:
+    i = line.find("--")
+    return line if i < 0 else line[:i]
+
+
+class DeckTemplate:
+    """Разобранный один раз шаблон .DATA с заранее найденными слотами значений."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.blocks: Dict[str, List[Block]] = {}
+        self.slots: List[Slot] = []
+        self._scan()
+
+        # неизменные куски между слотами и исходные значения слотов
+        bounds = [0]
+        for s in self.slots:
+            bounds += [s.start, s.end]
+        bounds.append(len(text))
+        self._gaps = [text[bounds[i]:bounds[i + 1]] for i in range(0, len(bounds), 2)]
+        self._tokens = [text[s.start:s.end] for s in self.slots]
+        self._selected: Dict[str, List[int]] = {}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "DeckTemplate":
+        return cls(path.read_text(encoding="utf-8", errors="ignore"))
+
+    # -------------------- разбор --------------------------------------
+
+    def _scan(self) -> None:
+        kw: Optional[str] = None
+        kw_start = 0
+        record: List[tuple] = []   # (item, start, end, token) текущей записи
+        item = 0
+        pos = 0
+
+        for line in self.text.splitlines(keepends=True):
+            body = _strip_comment(line)
+            stripped = body.strip()
+
+            if KEYWORD_RX.fullmatch(stripped):
+                # новое ключевое слово закрывает незавершённый блок
+                kw = stripped.upper() if stripped.upper() in KEYWORDS else None
+                kw_start, record, item = pos, [], 0
+            elif kw is not None:
+                for m in TOKEN_RX.finditer(body):
+                    tok = m.group()
+                    if tok == "/":
+                        if kw in ARRAY_KEYWORDS or not record:
+                            self._close(kw, kw_start, pos + m.end())
+                            kw = None
+                            break
+                        self._add_record(kw, record)
+                        record, item = [], 0
+                        continue
+
+                    rep = REPEAT_RX.fullmatch(tok)
+                    if kw in ARRAY_KEYWORDS:
+                        item += 1
+                        if rep is None:
+                            self._add_slot(kw, None, None, item, pos + m.start(), pos + m.end())
+                        elif rep.group(2):
+                            off = pos + m.start() + len(rep.group(1)) + 1
+                            self._add_slot(kw, None, None, item, off, pos + m.end())
+                    elif rep is not None and not rep.group(2):
+                        item += int(rep.group(1))   # N* — N значений по умолчанию
+                    elif rep is not None:
+                        # N*value в записи — один слот на первом из N item'ов
+                        off = pos + m.start() + len(rep.group(1)) + 1
+                        record.append((item + 1, off, pos + m.end(), rep.group(2)))
+                        item += int(rep.group(1))
+                    else:
+                        item += 1
+                        record.append((item, pos + m.start(), pos + m.end(), tok))
+            pos += len(line)
+
+    def _close(self, kw: str, start: int, end: int) -> None:
+        self.blocks.setdefault(kw, []).append(Block(kw, start, end))
+
+    def _add_slot(self, kw, well, control, item, start, end) -> None:
+        self.slots.append(Slot(kw, well, control, item, start, end))
+
+    def _add_record(self, kw: str, record: List[tuple]) -> None:
+        values = {it: tok.strip("'").upper() for it, _, _, tok in record}
+        well = values.get(1) if kw != "DATES" else None
+        control = values.get(CONTROL_ITEM.get(kw, 0))
+        for it, start, end, _ in record:
+            self._add_slot(kw, well, control, it, start, end)
+
+    # -------------------- сборка --------------------------------------
+
+    def select(self, field: str) -> List[int]:
+        """
+        Индексы слотов, которые заполняет поле `field` (см. FIELDS).
+        `поле@СКВАЖИНА` (например, bhp@PROD2) — только записи этой скважины.
+        """
+        if field not in self._selected:
+            name, _, well = field.partition("@")
+            if name not in FIELDS:
+                raise KeyError(f"Неизвестное поле: {field}")
+            pred, well = FIELDS[name], well.upper()
+            self._selected[field] = [i for i, s in enumerate(self.slots)
+                                     if pred(s) and (not well or s.well == well)]
+        return self._selected[field]
+
+    def values(self, field: str) -> List[str]:
+        """Исходные значения слотов поля (как записаны в шаблоне)."""
+        return [self._tokens[i] for i in self.select(field)]
+
+    def render(self, values: Mapping[str, object]) -> str:
+        """
+        Собирает текст варианта. Значение поля — скаляр (пишется во все его слоты)
+        или последовательность (по слотам в порядке следования; короче — остаток
+        не меняется, None — оставить исходное значение).
+        """
+        tokens = list(self._tokens)
+        for field, value in values.items():
+            idx = self.select(field)
+            if not idx:
+                raise ValueError(f"В шаблоне нет значений для поля '{field}'.")
+            if isinstance(value, (list, tuple)):
+                for i, v in zip(idx, value):
+                    if v is not None:
+                        tokens[i] = str(v)
+            else:
+                v = str(value)
+                for i in idx:
+                    tokens[i] = v
+
+        parts = [""] * (len(tokens) * 2 + 1)
+        parts[0::2] = self._gaps
+        parts[1::2] = tokens
+        return "".join(parts)
+
+
+def case_values(so: float, p_init, skin, bhp, qinj) -> Dict[str, object]:
+    """Поля кейса из сеток генераторов (форматы как у прежних патчеров)."""
+    return {
+        "soil":     f"{so:.2f}",
+        "swat":     f"{1.0 - so:.2f}",
+        "pressure": p_init,
+        "skin":     skin,
+        "bhp":      bhp,
+        "qinj":     qinj,
+    }
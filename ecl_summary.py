@@ -0,0 +1,400 @@
+"""
+ecl_summary.py
+--------------
+Чтение бинарной сводки ECLIPSE (UNIFOUT: <CASE>.SMSPEC + <CASE>.UNSMRY)
+без копирования файла в память — для сверки JutulDarcy с ECLIPSE по
+целым переборам (FOPR, WOPR:PROD1, WBHP:PROD2, …).
+
+Формат — неформатированные последовательные записи Fortran, big-endian:
+заголовок (имя 8 байт, число элементов, тип 4 байта), затем данные
+блоками по 1000 чисел (CHAR / C0nn — по 105 строк) в маркерах длины.
+  • SMSPEC разбирается целиком (он маленький): KEYWORDS + WGNAMES/NAMES
+    + NUMS → ключи вида FOPR, WBHP:PROD1, BPR:1234, RPR:2;
+  • UNSMRY открывается через mmap, по заголовкам записей (данные
+    перескакиваются) запоминаются смещения данных всех PARAMS;
+  • вектор — это одно число '>f4' в каждой PARAMS: если PARAMS лежат
+    с постоянным шагом, vector() — вид NumPy прямо на mmap (без копии),
+    иначе (SEQHDR в начале каждого отчётного шага) — выборка только
+    нужных байт; читаются лишь затронутые страницы файла.
+Раздельные S0001… и форматированные FUNSMRY не поддерживаются.
+
+    python ecl_summary.py keys D:\\runs\\BHP_300\\EGG_MODEL_ECL.SMSPEC
+    python ecl_summary.py get  D:\\runs\\BHP_300 FOPR WBHP:PROD1 > bhp300.csv
+    python ecl_summary.py batch D:\\runs --keys FOPR FWPR WBHP:PROD1 --out sweep.npz
+    python ecl_summary.py --bench 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import mmap
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+HEADER = struct.Struct(">i8si4si")          # маркер, имя, число, тип, маркер
+MARKER = 4
+# тип → (байт на элемент, элементов в блоке)
+TYPES = {b"INTE": (4, 1000), b"REAL": (4, 1000), b"DOUB": (8, 1000), b"LOGI": (4, 1000),
+         b"CHAR": (8, 105), b"MESS": (0, 1)}
+NUMPY = {b"INTE": ">i4", b"REAL": ">f4", b"DOUB": ">f8", b"LOGI": ">i4"}
+DUMMY_WELL = ":+:+:+:+"
+# ключевые слова, у которых в ключ входит NUMS (блок, регион, …), а не имя
+NUM_PREFIXES = ("B", "R", "A", "N")
+
+
+class Record(NamedTuple):
+    name: str
+    count: int
+    kind: bytes
+    offset: int             # начало данных (первый маркер блока)
+    size: int               # байт данных вместе с маркерами блоков
+
+
+def _layout(kind: bytes) -> Tuple[int, int]:
+    if kind in TYPES:
+        return TYPES[kind]
+    if kind.startswith(b"C0"):                  # C0nn — строки длиной nn
+        return int(kind[2:]), 105
+    raise ValueError(f"неизвестный тип записи {kind!r}")
+
+
+def iter_records(buf, start: int = 0) -> Iterator[Record]:
+    """Заголовки записей файла; данные не читаются."""
+    pos, end = start, len(buf)
+    while pos + HEADER.size <= end:
+        m1, name, count, kind, m2 = HEADER.unpack_from(buf, pos)
+        if m1 != 16 or m2 != 16:
+            raise ValueError(f"повреждённый заголовок записи на смещении {pos}")
+        pos += HEADER.size
+        item, block = _layout(kind)
+        nblocks = -(-count // block) if item else 0
+        size = count * item + 2 * MARKER * nblocks
+        yield Record(name.decode("ascii", "replace").strip(), count, kind, pos, size)
+        pos += size
+
+
+def read_array(buf, rec: Record) -> np.ndarray:
+    """Данные записи одним массивом (маркеры блоков убраны)."""
+    item, block = _layout(rec.kind)
+    if rec.kind in NUMPY:
+        dtype = np.dtype(NUMPY[rec.kind])
+    else:
+        dtype = np.dtype(f"S{item}")
+    out = np.empty(rec.count, dtype=dtype)
+    pos = rec.offset
+    for i in range(0, rec.count, block):
+        n = min(block, rec.count - i)
+        out[i:i + n] = np.frombuffer(buf, dtype=dtype, count=n, offset=pos + MARKER)
+        pos += n * item + 2 * MARKER
+    return out
+
+
+def _strings(a: np.ndarray) -> List[str]:
+    return [s.decode("ascii", "replace").strip() for s in a.tolist()]
+
+
+# -------------------- SMSPEC ----------------------------------------
+
+class Spec(NamedTuple):
+    keys: List[str]         # ключ каждого столбца PARAMS
+    units: List[str]
+    start: Tuple[int, ...]  # STARTDAT: день, месяц, год (…)
+
+
+def vector_key(keyword: str, name: str, num: int) -> str:
+    if keyword.startswith(("W", "G")) and name and name != DUMMY_WELL:
+        return f"{keyword}:{name}"
+    if keyword.startswith(NUM_PREFIXES) and num > 0 and keyword not in ("TIME", "YEARS"):
+        return f"{keyword}:{num}"
+    return keyword
+
+
+def read_spec(path: Path) -> Spec:
+    buf = Path(path).read_bytes()
+    arrays = {r.name: read_array(buf, r) for r in iter_records(buf)}
+    if "KEYWORDS" not in arrays:
+        raise ValueError(f"{path}: нет KEYWORDS — не SMSPEC?")
+    kw = _strings(arrays["KEYWORDS"])
+    names = _strings(arrays.get("WGNAMES", arrays.get("NAMES", np.array([b""] * len(kw)))))
+    nums = arrays.get("NUMS", np.zeros(len(kw), dtype=int)).tolist()
+    units = _strings(arrays["UNITS"]) if "UNITS" in arrays else [""] * len(kw)
+    keys = [vector_key(k, n, u) for k, n, u in zip(kw, names, nums)]
+    start = tuple(arrays["STARTDAT"].tolist()) if "STARTDAT" in arrays else ()
+    return Spec(keys, units, start)
+
+
+def summary_paths(path: Path) -> Tuple[Path, Path]:
+    """SMSPEC/UNSMRY по пути к любому из них, к .DATA или к каталогу кейса."""
+    path = Path(path)
+    if path.is_dir():
+        specs = sorted(p for p in path.iterdir() if p.suffix.upper() == ".SMSPEC")
+        if not specs:
+            raise FileNotFoundError(f"{path}: нет *.SMSPEC")
+        path = specs[0]
+    for spec_ext, unsmry_ext in ((".SMSPEC", ".UNSMRY"), (".smspec", ".unsmry")):
+        spec, unsmry = path.with_suffix(spec_ext), path.with_suffix(unsmry_ext)
+        if spec.is_file() and unsmry.is_file():
+            return spec, unsmry
+    raise FileNotFoundError(f"{path.with_suffix('')}: нет пары SMSPEC + UNSMRY (нужен UNIFOUT)")
+
+
+# -------------------- UNSMRY ----------------------------------------
+
+class Summary:
+    """Сводка одного кейса; векторы — виды на mmap UNSMRY."""
+
+    def __init__(self, path: Path):
+        self.spec_path, self.path = summary_paths(path)
+        self.spec = read_spec(self.spec_path)
+        self.keys = self.spec.keys
+        self._col = {k: i for i, k in enumerate(self.keys)}
+        self._file = open(self.path, "rb")
+        size = self.path.stat().st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        params = [r for r in iter_records(self._mm) if r.name == "PARAMS"]
+        n = len(self.keys)
+        bad = [r for r in params if r.count != n or r.kind != b"REAL"]
+        if bad:
+            self.close()
+            raise ValueError(f"{self.path}: PARAMS на {bad[0].count} значений, в SMSPEC {n}")
+        self.offsets = np.array([r.offset for r in params], dtype=np.int64)
+        steps = np.diff(self.offsets)
+        self.stride = int(steps[0]) if steps.size and np.all(steps == steps[0]) else None
+
+    def __enter__(self) -> "Summary":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self._mm, mmap.mmap):
+            try:
+                self._mm.close()
+            except BufferError:
+                pass                           # на mmap остались виды — закроет сборщик
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self.offsets.size
+
+    def __contains__(self, key: str) -> bool:
+        return key.upper() in self._col
+
+    def column(self, key: str) -> int:
+        try:
+            return self._col[key.upper()]
+        except KeyError:
+            raise KeyError(f"{self.spec_path.name}: нет вектора {key}") from None
+
+    def _byte(self, col: int) -> int:
+        """Смещение числа столбца col от начала данных PARAMS (с маркерами блоков)."""
+        block, i = divmod(col, 1000)
+        return MARKER + block * (4000 + 2 * MARKER) + 4 * i
+
+    def vector(self, key: str) -> np.ndarray:
+        """Значения вектора по всем ministep'ам ('>f4'); без копии, если PARAMS равномерны."""
+        off = self._byte(self.column(key))
+        if not len(self):
+            return np.empty(0, dtype=">f4")
+        if self.stride is not None or len(self) == 1:
+            return np.ndarray((len(self),), dtype=">f4", buffer=self._mm,
+                              offset=int(self.offsets[0]) + off, strides=(self.stride or 4,))
+        return self.vectors([key])[:, 0]
+
+    def vectors(self, keys: Sequence[str]) -> np.ndarray:
+        """(ministep, ключ) float32 — выборка только нужных чисел из mmap."""
+        cols = np.array([self._byte(self.column(k)) for k in keys], dtype=np.int64)
+        if not len(self):
+            return np.empty((0, len(keys)), dtype=np.float32)
+        u8 = np.frombuffer(self._mm, dtype=np.uint8)
+        idx = (self.offsets[:, None, None] + cols[None, :, None] + np.arange(4)[None, None, :])
+        return u8[idx].view(">f4")[..., 0].astype(np.float32)
+
+    @property
+    def time(self) -> np.ndarray:
+        """TIME, сут от начала расчёта."""
+        return self.vector("TIME")
+
+
+# -------------------- перебор ---------------------------------------
+
+def find_summaries(roots: Sequence[Path]) -> List[Path]:
+    out = []
+    for root in roots:
+        root = Path(root)
+        if root.is_file():
+            out.append(root)
+            continue
+        out += sorted(p for p in root.rglob("*") if p.suffix.upper() == ".SMSPEC"
+                      and "!logs" not in p.parts)
+    return out
+
+
+def load_batch(paths: Sequence[Path], keys: Sequence[str], time: Optional[np.ndarray] = None
+               ) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Векторы keys всех кейсов на общей оси времени → (time, array[кейс, время, ключ], ошибки).
+    Ось по умолчанию — TIME первого кейса; остальные интерполируются линейно,
+    вне своего интервала расчёта — NaN; нет вектора или сводки — тоже NaN.
+    """
+    cases: List[Tuple[np.ndarray, np.ndarray]] = []
+    errors: List[str] = []
+    for p in paths:
+        try:
+            with Summary(p) as s:
+                t = s.vectors(["TIME"])[:, 0].astype(np.float64)
+                have = [j for j, k in enumerate(keys) if k in s]
+                v = np.full((t.size, len(keys)), np.nan)
+                v[:, have] = s.vectors([keys[j] for j in have])
+            missing = [k for j, k in enumerate(keys) if j not in have]
+            if missing:
+                errors.append(f"{p}: нет векторов {', '.join(missing)}")
+        except (OSError, ValueError, KeyError) as e:
+            errors.append(f"{p}: {e}")
+            cases.append((np.empty(0), np.empty((0, len(keys)))))
+            continue
+        cases.append((t, v))
+        if time is None and t.size:
+            time = t
+    if time is None:
+        time = np.empty(0)
+    out = np.full((len(paths), time.size, len(keys)), np.nan)
+    for c, (t, v) in enumerate(cases):
+        if not t.size:
+            continue
+        if t.size == time.size and np.array_equal(t, time):
+            out[c] = v
+            continue
+        for j in range(len(keys)):
+            out[c, :, j] = np.interp(time, t, v[:, j], left=np.nan, right=np.nan)
+    return time, out, errors
+
+
+# -------------------- синтетика -------------------------------------
+
+def _write_record(f, name: str, kind: bytes, data) -> None:
+    count = len(data)
+    f.write(HEADER.pack(16, name.ljust(8).encode(), count, kind, 16))
+    item, block = _layout(kind)
+    if kind in NUMPY:
+        raw = np.asarray(data, dtype=NUMPY[kind]).tobytes()
+    else:
+        raw = b"".join(str(s).ljust(item)[:item].encode() for s in data)
+    for i in range(0, count, block):
+        chunk = raw[i * item:min(count, i + block) * item]
+        f.write(struct.pack(">i", len(chunk)) + chunk + struct.pack(">i", len(chunk)))
+
+
+def write_synthetic(base: Path, steps: int, reports: int = 10, seed: int = 0) -> List[str]:
+    """Сводка как у Egg (UNIFOUT): SEQHDR перед каждым отчётным шагом."""
+    rng = np.random.default_rng(seed)
+    prods = [f"PROD{i}" for i in range(1, 5)]
+    injs = [f"INJECT{i}" for i in range(1, 9)]
+    vecs = [("TIME", DUMMY_WELL), ("FOPR", DUMMY_WELL), ("FWPR", DUMMY_WELL), ("FWIR", DUMMY_WELL)]
+    vecs += [(k, w) for k in ("WOPR", "WWPR", "WLPR", "WBHP") for w in prods]
+    vecs += [("WWIR", w) for w in injs]
+    with open(base.with_suffix(".SMSPEC"), "wb") as f:
+        _write_record(f, "DIMENS", b"INTE", [len(vecs), 60, 60, 7, 0, -1])
+        _write_record(f, "KEYWORDS", b"CHAR", [k for k, _ in vecs])
+        _write_record(f, "WGNAMES", b"CHAR", [w for _, w in vecs])
+        _write_record(f, "NUMS", b"INTE", [0] * len(vecs))
+        _write_record(f, "UNITS", b"CHAR", ["DAYS"] + ["SM3/DAY"] * (len(vecs) - 1))
+        _write_record(f, "STARTDAT", b"INTE", [15, 6, 2011])
+    t = np.cumsum(rng.uniform(1, 30, steps))
+    data = rng.uniform(0, 500, (steps, len(vecs))).astype(np.float32)
+    data[:, 0] = t
+    per_report = max(1, steps // reports)
+    with open(base.with_suffix(".UNSMRY"), "wb") as f:
+        for i in range(steps):
+            if i % per_report == 0:
+                _write_record(f, "SEQHDR", b"INTE", [0])
+            _write_record(f, "MINISTEP", b"INTE", [i])
+            _write_record(f, "PARAMS", b"REAL", data[i])
+    return [vector_key(k, w, 0) for k, w in vecs]
+
+
+def benchmark(steps: int) -> None:
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp) / "CASE"
+        keys = write_synthetic(base, steps)
+        size = base.with_suffix(".UNSMRY").stat().st_size
+        t0 = time.perf_counter()
+        with Summary(base) as s:
+            t_open = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            v = s.vectors(keys[:6])
+            t_read = time.perf_counter() - t0
+            ref = np.stack([np.asarray(s.vector(k), dtype=np.float32) for k in keys[:6]], axis=1)
+        assert np.array_equal(v, ref)
+        print(f"{steps} ministep'ов, {size / 2**20:.1f} МБ: заголовки {t_open * 1e3:.1f} мс, "
+              f"6 векторов {t_read * 1e3:.1f} мс")
+
+
+# -------------------- CLI -------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Сводка ECLIPSE (SMSPEC/UNSMRY) без загрузки файлов целиком")
+    ap.add_argument("--bench", type=int, default=None, metavar="N",
+                    help="бенчмарк на синтетической сводке из N ministep'ов")
+    sub = ap.add_subparsers(dest="command")
+    p_keys = sub.add_parser("keys", help="векторы сводки")
+    p_keys.add_argument("path", type=Path)
+    p_get = sub.add_parser("get", help="векторы одного кейса в CSV")
+    p_get.add_argument("path", type=Path)
+    p_get.add_argument("keys", nargs="+")
+    p_batch = sub.add_parser("batch", help="векторы всех кейсов перебора в один .npz")
+    p_batch.add_argument("roots", nargs="+", type=Path, help="каталоги кейсов или *.SMSPEC")
+    p_batch.add_argument("--keys", nargs="+", required=True)
+    p_batch.add_argument("--every", type=float, default=None,
+                         help="общая ось времени с шагом, сут (по умолчанию — TIME первого кейса)")
+    p_batch.add_argument("--out", type=Path, required=True)
+    args = ap.parse_args(argv)
+
+    if args.bench:
+        benchmark(args.bench)
+        return
+    if args.command is None:
+        ap.error("нужна команда или --bench")
+
+    if args.command == "keys":
+        with Summary(args.path) as s:
+            for k, u in zip(s.keys, s.spec.units):
+                print(f"{k:<20} {u}")
+            print(f"ministep'ов: {len(s)}")
+    elif args.command == "get":
+        with Summary(args.path) as s:
+            keys = ["TIME"] + [k.upper() for k in args.keys if k.upper() != "TIME"]
+            v = s.vectors(keys)
+        w = csv.writer(sys.stdout)
+        w.writerow(keys)
+        w.writerows(v.tolist())
+    else:
+        paths = find_summaries(args.roots)
+        if not paths:
+            raise SystemExit("Сводки *.SMSPEC не найдены.")
+        keys = [k.upper() for k in args.keys]
+        grid = None
+        if args.every:
+            with Summary(paths[0]) as s:
+                end = float(s.vectors(["TIME"])[-1, 0])
+            grid = np.arange(0.0, end + args.every / 2, args.every)
+        t, arr, errors = load_batch(paths, keys, grid)
+        for e in errors:
+            print(f"✗ {e}", file=sys.stderr)
+        np.savez(args.out, time=t, values=arr, keys=np.array(keys),
+                 cases=np.array([str(p) for p in paths]))
+        print(f"{args.out}: кейсов {len(paths)} (ошибок {len(errors)}), "
+              f"{t.size} моментов × {len(keys)} векторов")
+
+
+if __name__ == "__main__":
+    main()
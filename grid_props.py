@@ -0,0 +1,211 @@
+"""
+grid_props.py
+-------------
+Чтение сеточных ключевых слов ECLIPSE (ACTNUM, PERMX/PERMY/PERMZ, PORO, NTG, …)
+из *.INC / .DATA сразу в массивы NumPy:
+  • токенизация — bytes.split() одного блока, разбор чисел и повторов `N*value`
+    целиком векторно (np.char + np.repeat), без цикла Python по значениям;
+  • COPY / MULTIPLY (как в конце MDARCY.INC) применяются к прочитанным массивам;
+  • результат кэшируется в .npz рядом с файлом, ключ — sha256 содержимого;
+  • обратная запись (write_grid_file) сжимает повторы в `N*value`, так что
+    однородный слой — один токен, как `3600*400` в PRESSURE.
+
+Массивы плоские, в порядке ECLIPSE (i быстрее всех); as_grid() даёт вид (nz, ny, nx).
+
+    props = read_grid_file(Path("MDARCY.INC"))
+    permx = as_grid(props["PERMX"])          # (7, 60, 60)
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, TextIO, Tuple
+
+import numpy as np
+
+from include_store import file_digest
+
+EGG_DIMS = (60, 60, 7)     # DIMENS в Egg_Model_ECL.DATA
+
+# массивы на ячейку (размер nx*ny*nz); TOPS — верхний слой или все ячейки
+CELL_KEYWORDS = ("ACTNUM", "PERMX", "PERMY", "PERMZ", "PORO", "NTG",
+                 "DX", "DY", "DZ", "SOIL", "SWAT", "PRESSURE")
+GRID_KEYWORDS = CELL_KEYWORDS + ("TOPS",)
+INT_KEYWORDS = {"ACTNUM"}
+BOX_KEYWORDS = ("COPY", "MULTIPLY")
+
+_COMMENT_RX = re.compile(rb"--[^\n]*")
+_KEYWORD_RX = re.compile(
+    rb"^[ \t]*(" + b"|".join(k.encode() for k in GRID_KEYWORDS + BOX_KEYWORDS) + rb")[ \t]*\r?$",
+    re.M)
+_LIST_END_RX = re.compile(rb"/\s*/")
+
+
+def expand_tokens(tokens: Sequence[bytes]) -> np.ndarray:
+    """Токены ('0.2', '25200*0.2', '3*') → float64; пустые повторы `N*` → NaN."""
+    tok = np.array(tokens, dtype=np.bytes_)
+    if tok.size == 0:
+        return np.empty(0)
+    star = np.char.find(tok, b"*") >= 0
+    if not star.any():
+        return tok.astype(np.float64)
+
+    parts = np.char.partition(tok[star], b"*")
+    counts = np.ones(tok.size, dtype=np.int64)
+    counts[star] = parts[:, 0].astype(np.int64)
+    vals = tok.copy()
+    rep = parts[:, 2]
+    vals[star] = np.where(rep == b"", b"nan", rep)
+    return np.repeat(vals.astype(np.float64), counts)
+
+
+def _box(record: Sequence[bytes], first: int, dims: Tuple[int, int, int]) -> Tuple[slice, ...]:
+    """Срез (k, j, i) по item'ам I1 I2 J1 J2 K1 K2 записи (по умолчанию — вся сетка)."""
+    nx, ny, nz = dims
+    b = [int(t) for t in record[first:first + 6]]
+    i1, i2, j1, j2, k1, k2 = b + [1, nx, 1, ny, 1, nz][len(b):]
+    return slice(k1 - 1, k2), slice(j1 - 1, j2), slice(i1 - 1, i2)
+
+
+def _records(block: bytes):
+    for rec in block.split(b"/"):
+        toks = [t.strip(b"'\"") for t in rec.split()]
+        if not toks:
+            return
+        yield toks
+
+
+def parse_grid_text(data: bytes, dims: Tuple[int, int, int] = EGG_DIMS) -> Dict[str, np.ndarray]:
+    """Все сеточные ключевые слова из текста include/.DATA."""
+    nx, ny, nz = dims
+    data = _COMMENT_RX.sub(b"", data)
+    out: Dict[str, np.ndarray] = {}
+
+    for m in _KEYWORD_RX.finditer(data):
+        kw = m.group(1).decode()
+        if kw in BOX_KEYWORDS:
+            # записи до пустой записи '/'
+            end = _LIST_END_RX.search(data, m.end())
+            body = data[m.end():end.end() - 1 if end else len(data)]
+            for rec in _records(body):
+                if kw == "COPY":
+                    src, dst = rec[0].decode().upper(), rec[1].decode().upper()
+                    box = _box(rec, 2, dims)
+                    if dst not in out:
+                        out[dst] = np.zeros_like(out[src])
+                    as_grid(out[dst], dims)[box] = as_grid(out[src], dims)[box]
+                else:
+                    name = rec[0].decode().upper()
+                    as_grid(out[name], dims)[_box(rec, 2, dims)] *= float(rec[1])
+            continue
+
+        end = data.find(b"/", m.end())
+        if end < 0:
+            raise ValueError(f"{kw}: нет завершающего '/'.")
+        arr = expand_tokens(data[m.end():end].split())
+        # TOPS допустим и для верхнего слоя, и для всех ячеек
+        expected = (nx * ny, nx * ny * nz) if kw == "TOPS" else (nx * ny * nz,)
+        if arr.size not in expected:
+            raise ValueError(f"{kw}: {arr.size} значений, ожидалось {expected[-1]} для DIMENS {dims}.")
+        out[kw] = arr.astype(np.int32) if kw in INT_KEYWORDS else arr
+    return out
+
+
+def read_grid_file(path: Path, dims: Tuple[int, int, int] = EGG_DIMS,
+                   cache: bool = True) -> Dict[str, np.ndarray]:
+    """Читает файл; при cache=True использует/пишет .npz-кэш `.<имя>.<sha16>.npz`."""
+    path = Path(path)
+    sidecar: Optional[Path] = None
+    if cache:
+        sidecar = path.with_name(f".{path.name}.{file_digest(path)[:16]}.npz")
+        if sidecar.is_file():
+            with np.load(sidecar) as z:
+                return {k: z[k] for k in z.files}
+
+    props = parse_grid_text(path.read_bytes(), dims)
+
+    if sidecar is not None:
+        try:
+            for stale in path.parent.glob(f".{path.name}.*.npz"):
+                stale.unlink()
+            np.savez(sidecar, **props)
+        except OSError:
+            pass                    # каталог только для чтения — работаем без кэша
+    return props
+
+
+# -------------------- запись --------------------------------------
+
+def format_tokens(arr: np.ndarray, precision: int = 4, chunk: int = 4096) -> Iterator[np.ndarray]:
+    """
+    Токены ECLIPSE для массива с RLE-сжатием `N*value`: подряд идущие значения,
+    равные после округления до `precision` знаков, становятся одним токеном.
+    NaN (значение по умолчанию, `N*` при чтении) пишется обратно как `1*` / `N*`.
+    Выдаёт блоки по `chunk` токенов, чтобы не собирать всю строку в памяти.
+    """
+    arr = np.asarray(arr).ravel()
+    if arr.size == 0:
+        return
+    is_int = np.issubdtype(arr.dtype, np.integer)
+    vals = arr if is_int else np.round(arr.astype(np.float64), precision)
+
+    change = vals[1:] != vals[:-1]
+    if not is_int:
+        nan = np.isnan(vals)
+        change &= ~(nan[1:] & nan[:-1])        # NaN != NaN, но серия умолчаний — одна
+    starts = np.flatnonzero(np.r_[True, change])
+    counts = np.diff(np.r_[starts, vals.size])
+
+    for lo in range(0, starts.size, chunk):
+        v = vals[starts[lo:lo + chunk]]
+        c = counts[lo:lo + chunk]
+        if is_int:
+            txt = v.astype(str)
+        else:
+            txt = np.char.mod(f"%.{precision}f", v)
+            if precision > 0:
+                txt = np.char.rstrip(np.char.rstrip(txt, "0"), ".")
+            txt = np.where(txt == "-0", "0", txt)
+            txt = np.where(np.isnan(v), "", txt)
+        rep = (c > 1) | (txt == "")
+        txt = np.where(rep, np.char.add(np.char.add(c.astype(str), "*"), txt), txt)
+        yield txt
+
+
+def write_keyword(f: TextIO, keyword: str, arr: np.ndarray,
+                  precision: int = 4, per_line: int = 8) -> None:
+    """Пишет `KEYWORD / значения / '/'` в открытый текстовый файл, блоками."""
+    f.write(f"{keyword}\n")
+    for toks in format_tokens(arr, precision):
+        for lo in range(0, toks.size, per_line):
+            f.write("  " + " ".join(toks[lo:lo + per_line].tolist()) + "\n")
+    f.write("/\n\n")
+
+
+def write_grid_file(path: Path, props: Dict[str, np.ndarray],
+                    precision: int = 4, per_line: int = 8) -> None:
+    """Include-файл со всеми массивами `props` (порядок ключей сохраняется)."""
+    with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        for kw, arr in props.items():
+            write_keyword(f, kw, arr, precision, per_line)
+
+
+def as_grid(arr: np.ndarray, dims: Tuple[int, int, int] = EGG_DIMS) -> np.ndarray:
+    """Вид (nz, ny, nx) на плоский массив ECLIPSE (без копирования)."""
+    nx, ny, nz = dims
+    return arr.reshape(nz, ny, nx)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser("Сводка сеточных массивов из include-файлов")
+    ap.add_argument("files", nargs="+", type=Path)
+    ap.add_argument("--dims", type=int, nargs=3, default=EGG_DIMS, metavar=("NX", "NY", "NZ"))
+    ap.add_argument("--no-cache", action="store_true")
+    args = ap.parse_args()
+
+    for f in args.files:
+        for kw, arr in read_grid_file(f, tuple(args.dims), cache=not args.no_cache).items():
+            print(f"{f.name:>16} {kw:<8} n={arr.size:6d}  min={np.nanmin(arr):10.4g}  "
+                  f"max={np.nanmax(arr):10.4g}  mean={np.nanmean(arr):10.4g}")
@@ -1,21 +1,20 @@
-import re
 from pathlib import Path
 
+from schedule_variants import DirSink, ScheduleTemplate, write_variants
+
 
 def schedule():
     TEMPLATE = Path(r"D:\convergance_tests\orig-Copy\INCLUDE\schedule_test.inc")
     OUTPUT_DIR = Path(r"D:\convergance_tests\orig-Copy\INCLUDE\generated")
     OUTPUT_DIR.mkdir(exist_ok=True)
 
-    text = TEMPLATE.read_text(encoding="utf‑8")
-
-    for orat in range(180, 4, -5):
-        replacement = r"\g<1>{}".format(orat)
-        new_text = re.sub(r"('ORAT'\s+)\d+", replacement, text, count=1)
-        out_file = OUTPUT_DIR / f"schedule_ORAT_{orat:03}.inc"
-        out_file.write_text(new_text, encoding="utf‑8")
+    tmpl = ScheduleTemplate(TEMPLATE.read_text(encoding="utf-8"))
+    if not tmpl.select("orat"):
+        raise SystemExit(f"В шаблоне {TEMPLATE} нет управления ORAT в WCONPROD "
+                         f"(есть: {', '.join(tmpl.controls()) or 'ничего'}).")
+    n = write_variants(tmpl, ({"orat": orat} for orat in range(180, 4, -5)), DirSink(OUTPUT_DIR))
 
-    print(f"{len(list(OUTPUT_DIR.glob('schedule_ORAT_*.inc')))} файлов создано.")
+    print(f"{n} файлов создано.")
 
 
 def data():
@@ -0,0 +1,109 @@
+"""
+include_store.py
+----------------
+Общее хранилище *.INC с адресацией по содержимому:
+  • каждый уникальный файл лежит в <root>/.inc_store/<sha256>_<имя> ровно один раз;
+  • в папки кейсов кладётся жёсткая ссылка (или симлинк) на экземпляр из хранилища,
+    новая копия появляется только если содержимое include действительно другое;
+  • в конце можно вывести, сколько места и времени записи сэкономлено.
+
+Важно: жёсткие ссылки делят данные — файлы в кейсах нельзя править «на месте».
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+STORE_DIRNAME = ".inc_store"
+MODES = ("hardlink", "symlink", "copy")
+_CHUNK = 1 << 20
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class IncludeStore:
+    def __init__(self, root: Path, mode: str = "hardlink"):
+        if mode not in MODES:
+            raise ValueError(f"Неизвестный режим: {mode} (допустимо {', '.join(MODES)})")
+        self.root = Path(root) / STORE_DIRNAME
+        self.mode = mode
+        self._digests: Dict[Tuple[str, int, int], str] = {}   # (путь, size, mtime) → sha256
+
+        # статистика
+        self.linked = 0
+        self.stored = 0
+        self.bytes_saved = 0
+        self.bytes_written = 0
+        self.write_time = 0.0
+
+    def _digest(self, src: Path) -> str:
+        st = src.stat()
+        key = (str(src.resolve()), st.st_size, st.st_mtime_ns)
+        if key not in self._digests:
+            self._digests[key] = file_digest(src)
+        return self._digests[key]
+
+    def add(self, src: Path) -> Path:
+        """Кладёт файл в хранилище (если такого содержимого ещё нет) и возвращает путь к экземпляру."""
+        obj = self.root / f"{self._digest(src)[:16]}_{src.name}"
+        if not obj.is_file():
+            self.root.mkdir(parents=True, exist_ok=True)
+            t0 = time.perf_counter()
+            tmp = obj.with_suffix(obj.suffix + ".tmp")
+            shutil.copy2(src, tmp)
+            os.replace(tmp, obj)
+            self.write_time += time.perf_counter() - t0
+            self.bytes_written += obj.stat().st_size
+            self.stored += 1
+        return obj
+
+    def link(self, src: Path, dst: Path) -> Path:
+        """Размещает `src` по пути `dst` через хранилище. Возвращает `dst`."""
+        obj = self.add(src)
+        if dst.exists() or dst.is_symlink():
+            if self.mode != "copy" and dst.exists() and os.path.samefile(obj, dst):
+                self.linked += 1
+                self.bytes_saved += obj.stat().st_size
+                return dst
+            dst.unlink()
+
+        mode = self.mode
+        if mode == "hardlink":
+            try:
+                os.link(obj, dst)
+            except OSError:
+                mode = "symlink"          # другой том / ФС без жёстких ссылок
+        if mode == "symlink":
+            try:
+                os.symlink(obj.resolve(), dst)
+            except OSError:
+                mode = "copy"             # Windows без прав на симлинки
+        if mode == "copy":
+            t0 = time.perf_counter()
+            shutil.copy2(obj, dst)
+            self.write_time += time.perf_counter() - t0
+            self.bytes_written += obj.stat().st_size
+            return dst
+
+        self.linked += 1
+        self.bytes_saved += obj.stat().st_size
+        return dst
+
+    def report(self) -> str:
+        # оценка сэкономленного времени по фактической скорости записи в хранилище
+        rate = self.bytes_written / self.write_time if self.write_time > 0 else 0.0
+        t_saved = self.bytes_saved / rate if rate > 0 else 0.0
+        return (f"INC-хранилище {self.root}: уникальных файлов {self.stored}, "
+                f"ссылок {self.linked}, сэкономлено {self.bytes_saved / 2**20:.1f} МБ "
+                f"(~{t_saved:.2f} с записи)")
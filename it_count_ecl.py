@@ -1,26 +1,24 @@
+import argparse
 from pathlib import Path
-import re
+
+from prt_stats import iter_steps, summarize
 
 # ---------- ПУТЬ К PRT-ФАЙЛУ ----------
 PRT_FILE = r"D:\convergance_tests\orig-Copy\EGG_MODEL_ECL.PRT"
 # --------------------------------------
 
-re_its = re.compile(r"\b(\d+)\s+ITS\)")
-re_linit = re.compile(r"LINIT=\s*(\d+)\b")
-re_step = re.compile(r"\bSTEP\s+\d+\b")
-
-newton_iters = 0
-linear_iters = 0
-steps = 0
+ap = argparse.ArgumentParser("Подсчёт итераций по ECLIPSE PRT")
+ap.add_argument("prt", nargs="?", type=Path, default=Path(PRT_FILE), help="путь к *.PRT")
+ap.add_argument("--steps", action="store_true", help="вывести итерации по каждому STEP")
+args = ap.parse_args()
 
-for line in Path(PRT_FILE).read_text(encoding="utf-8", errors="ignore").splitlines():
-    if m := re_its.search(line):
-        newton_iters += int(m.group(1))
-    if m := re_linit.search(line):
-        linear_iters += int(m.group(1))
-    if re_step.search(line):
-        steps += 1
+if args.steps:
+    print("step,newton,linear")
+    for st in iter_steps(args.prt):
+        print(f"{st.step},{st.newton},{st.linear}")
 
-print(f"Non-linear iterations (ITS): {newton_iters}")
-print(f"Linear   iterations (LINIT): {linear_iters}")
-print(f"Time-steps (STEP lines)    : {steps}")
+s = summarize(args.prt)
+print(f"Non-linear iterations (ITS): {s.newton}")
+print(f"Linear   iterations (LINIT): {s.linear}")
+print(f"Time-steps (STEP lines)    : {s.steps}")
+print(f"Max per step  ITS / LINIT  : {s.max_newton} / {s.max_linear}")
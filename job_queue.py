@@ -0,0 +1,372 @@
+"""
+job_queue.py
+------------
+Персистентная очередь расчётов в SQLite вместо состояния в памяти
+run_bhp_parallel.jl (`run_with_retries`): убитый мастер ничего не теряет.
+
+  • у каждого кейса (*.DATA) состояние pending / running / done / failed,
+    число попыток, время запуска, heartbeat, код выхода и хвост stderr;
+  • `run` запускает симулятор отдельными процессами, не больше --workers
+    одновременно, и раз в --heartbeat секунд отмечается в базе;
+  • running с устаревшим heartbeat (мастер упал, машину перезагрузили) или
+    с мёртвым мастером на этом же хосте возвращаются в pending — при старте
+    `run` и дальше на каждом такте heartbeat; готовые не пересчитываются.
+    Процесс симулятора (pid в базе) брошенного кейса на этом хосте перед
+    возвратом в очередь завершается; на чужом хосте его не проверить —
+    там кейс возвращается только по heartbeat;
+  • сначала запускаются долгие кейсы (оценка — прошлое время этого кейса
+    или кейса с ближайшим a в той же папке), чтобы сократить «хвост».
+
+    python job_queue.py D:\\runs\\queue.sqlite add D:\\runs
+    python job_queue.py D:\\runs\\queue.sqlite run -j 6
+    python job_queue.py D:\\runs\\queue.sqlite status
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import signal
+import socket
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from case_metrics import (Monitor, case_record, default_sim, launch as launch_monitored,
+                          sim_argv, write_record)
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+STATES = ("pending", "running", "done", "failed")
+DATA_RX = re.compile(r"_TSTEP_(\d+)_(\d+)\.DATA$", re.I)
+DEFAULT_SIM = default_sim("data", "logs", "a")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id        INTEGER PRIMARY KEY,
+    data      TEXT UNIQUE NOT NULL,     -- абсолютный путь .DATA
+    folder    TEXT NOT NULL,
+    a         INTEGER,
+    b         INTEGER,
+    state     TEXT NOT NULL DEFAULT 'pending',
+    estimate  REAL NOT NULL DEFAULT 0,  -- ожидаемое время, с (порядок запуска)
+    attempts  INTEGER NOT NULL DEFAULT 0,
+    runner    TEXT,                     -- host:pid мастера
+    pid       INTEGER,                  -- процесс симулятора на хосте runner
+    started   REAL,
+    heartbeat REAL,
+    finished  REAL,
+    runtime   REAL,
+    rc        INTEGER,
+    error     TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, estimate);
+"""
+
+
+class Job(NamedTuple):
+    id: int
+    data: str
+    a: Optional[int]
+    b: Optional[int]
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    con = sqlite3.connect(path, timeout=30, isolation_level=None)   # транзакции — явно
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript(SCHEMA)
+    if "pid" not in {r[1] for r in con.execute("PRAGMA table_info(jobs)")}:
+        con.execute("ALTER TABLE jobs ADD COLUMN pid INTEGER")     # базы прежних версий
+    return con
+
+
+def logs_dir(data: Path, a: Optional[int], b: Optional[int]) -> Path:
+    """Каталог логов как в run_bhp_parallel.jl: <QINJ_XXX>/!logs/TSTEP_a_b."""
+    name = f"TSTEP_{a}_{b}" if a is not None else data.stem
+    return data.parent / "!logs" / name
+
+
+def estimate(con: sqlite3.Connection, folder: str, a: Optional[int]) -> float:
+    """Ожидаемое время кейса: готовый кейс той же папки с ближайшим a, иначе по всем."""
+    row = con.execute(
+        "SELECT runtime FROM jobs WHERE state='done' AND folder=? AND a IS NOT NULL "
+        "ORDER BY abs(a - ?) LIMIT 1", (folder, a if a is not None else 0)).fetchone()
+    if row is None:
+        row = con.execute("SELECT avg(runtime) FROM jobs WHERE state='done'").fetchone()
+    return float(row[0] or 0.0)
+
+
+def refresh_estimates(con: sqlite3.Connection, folder: str) -> None:
+    """Оценки pending-кейсов папки после готового кейса; в прочих — там, где оценки ещё нет."""
+    rows = con.execute("SELECT id, folder, a FROM jobs WHERE state='pending' "
+                       "AND coalesce(rc, -1) != 0 AND (folder=? OR estimate=0)",   # своё время важнее
+                       (folder,)).fetchall()
+    con.executemany("UPDATE jobs SET estimate=? WHERE id=?",
+                    [(estimate(con, f, a), i) for i, f, a in rows])
+
+
+# -------------------- наполнение и сброс ----------------------------
+
+def add_cases(con: sqlite3.Connection, roots: List[Path], pattern: str) -> int:
+    n = 0
+    con.execute("BEGIN IMMEDIATE")
+    for root in roots:
+        paths = [root] if root.is_file() else sorted(root.rglob(pattern))
+        for p in paths:
+            m = DATA_RX.search(p.name)
+            a, b = (int(m.group(1)), int(m.group(2))) if m else (None, None)
+            folder = str(p.parent.resolve())
+            cur = con.execute(
+                "INSERT OR IGNORE INTO jobs(data, folder, a, b, estimate) VALUES (?,?,?,?,?)",
+                (str(p.resolve()), folder, a, b, estimate(con, folder, a)))
+            n += cur.rowcount
+    con.execute("COMMIT")
+    return n
+
+
+def _alive(pid: int) -> Optional[bool]:
+    """Жив ли процесс этого хоста; None — проверить нечем (Windows без psutil)."""
+    if psutil is not None:
+        return psutil.pid_exists(pid)
+    if os.name == "nt":
+        return None                 # os.kill(pid, 0) в Windows завершает процесс
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _kill_sim(pid: int, started: Optional[float]) -> bool:
+    """
+    Завершает симулятор брошенного кейса. С psutil — только если процесс
+    создан в пределах минуты от запуска кейса (pid мог достаться другому).
+    """
+    if psutil is not None:
+        try:
+            proc = psutil.Process(pid)
+            if started is not None and not -5 <= proc.create_time() - started <= 60:
+                return False
+            for p in proc.children(recursive=True) + [proc]:
+                p.terminate()
+            return True
+        except psutil.Error:
+            return False
+    if _alive(pid):
+        try:
+            os.kill(pid, signal.SIGTERM)
+            return True
+        except OSError:
+            pass
+    return False
+
+
+def reclaim(con: sqlite3.Connection, stale_after: float, retries: int,
+            runner: str = "") -> int:
+    """
+    running без heartbeat дольше stale_after или с мёртвым мастером на этом
+    хосте → pending (или failed после retries попыток). Свои кейсы (runner)
+    не трогает; симулятор брошенного кейса этого хоста завершает.
+    """
+    host = socket.gethostname()
+    cutoff = time.time() - stale_after
+    con.execute("BEGIN IMMEDIATE")
+    rows = con.execute("SELECT id, runner, pid, started, heartbeat FROM jobs "
+                       "WHERE state='running' AND coalesce(runner, '') != ?", (runner,)).fetchall()
+    lost: List[tuple] = []
+    for jid, owner, pid, started, beat in rows:
+        o_host, _, o_pid = (owner or "").rpartition(":")
+        local = o_host == host
+        if local and o_pid.isdigit() and _alive(int(o_pid)) is False:
+            reason = "runner dead"
+        elif (beat or 0) < cutoff:
+            reason = "heartbeat lost"
+        else:
+            continue
+        if local and pid and _kill_sim(pid, started):
+            reason += f", simulator {pid} terminated"
+        lost.append((retries, reason, jid))
+    con.executemany("UPDATE jobs SET state = CASE WHEN attempts > ? THEN 'failed' ELSE 'pending' END, "
+                    "runner=NULL, pid=NULL, error=? WHERE id=?", lost)
+    con.execute("COMMIT")
+    return len(lost)
+
+
+def claim(con: sqlite3.Connection, runner: str) -> Optional[Job]:
+    """Атомарно забирает самый долгий pending-кейс."""
+    now = time.time()
+    con.execute("BEGIN IMMEDIATE")
+    row = con.execute("SELECT id, data, a, b FROM jobs WHERE state='pending' "
+                      "ORDER BY estimate DESC, id LIMIT 1").fetchone()
+    if row is not None:
+        con.execute("UPDATE jobs SET state='running', runner=?, pid=NULL, started=?, heartbeat=?, "
+                    "attempts=attempts+1, rc=NULL, error=NULL WHERE id=?", (runner, now, now, row[0]))
+    con.execute("COMMIT")
+    return Job(*row) if row is not None else None
+
+
+def finish(con: sqlite3.Connection, job: Job, runner: str, rc: int, runtime: float,
+           error: str, retries: int) -> str:
+    """Итог кейса; 'lost' — кейс уже возвращён в очередь другим мастером (reclaim)."""
+    con.execute("BEGIN IMMEDIATE")
+    row = con.execute("SELECT attempts, folder FROM jobs WHERE id=? AND state='running' "
+                      "AND runner=?", (job.id, runner)).fetchone()
+    if row is None:
+        con.execute("COMMIT")
+        return "lost"
+    state = "done" if rc == 0 else ("pending" if row[0] <= retries else "failed")
+    con.execute("UPDATE jobs SET state=?, finished=?, runtime=?, rc=?, error=?, runner=NULL, "
+                "pid=NULL WHERE id=?", (state, time.time(), runtime, rc, error or None, job.id))
+    if state == "done":
+        # время упавшей попытки — не оценка длительности кейса
+        con.execute("UPDATE jobs SET estimate=? WHERE id=?", (runtime, job.id))
+        refresh_estimates(con, row[1])
+    con.execute("COMMIT")
+    return state
+
+
+# -------------------- запуск ----------------------------------------
+
+def launch(job: Job, sim: str, initial_dt: int) -> Monitor:
+    """initial_dt — a для колод без _TSTEP_a_b в имени."""
+    data = Path(job.data)
+    logs = logs_dir(data, job.a, job.b)
+    fields = {"data": str(data), "logs": str(logs),
+              "a": job.a if job.a is not None else initial_dt, "b": job.b or 0}
+    cmd = sim_argv(sim, **fields)
+    return launch_monitored(cmd, data.parent, logs.with_suffix(".log"))
+
+
+def _tail(path: Path, n: int = 400) -> str:
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(0, f.seek(0, os.SEEK_END) - n))
+            return f.read().decode("utf-8", "replace").strip()
+    except OSError:
+        return ""
+
+
+def run(con: sqlite3.Connection, workers: int, sim: str, heartbeat: float,
+        stale_after: float, retries: int, initial_dt: int = 365) -> None:
+    runner = f"{socket.gethostname()}:{os.getpid()}"
+    active: Dict[int, tuple] = {}             # id → (Job, Monitor)
+    last_beat = 0.0
+    t_start = time.perf_counter()
+    done = failed = 0
+    try:
+        while True:
+            now = time.time()
+            if now - last_beat >= heartbeat:
+                if active:
+                    ids = list(active)
+                    con.execute(f"UPDATE jobs SET heartbeat=? WHERE runner=? AND id IN "
+                                f"({','.join('?' * len(ids))})", (now, runner, *ids))
+                n = reclaim(con, stale_after, retries, runner)
+                if n:
+                    print(f"Возвращено в очередь прерванных кейсов: {n}")
+                last_beat = now
+
+            while len(active) < workers:
+                job = claim(con, runner)
+                if job is None:
+                    break
+                mon = launch(job, sim, initial_dt)
+                con.execute("UPDATE jobs SET pid=? WHERE id=?", (mon.proc.pid, job.id))
+                active[job.id] = (job, mon)
+                print(f"▶ {job.data}")
+
+            if not active:
+                break
+
+            for jid, (job, mon) in list(active.items()):
+                rc = mon.poll()
+                if rc is None:
+                    continue
+                del active[jid]
+                data = Path(job.data)
+                logs = logs_dir(data, job.a, job.b)
+                res = mon.resources()
+                write_record(logs, case_record(data, logs, logs.with_suffix(".log"), rc, res))
+                err = "" if rc == 0 else _tail(logs.with_suffix(".log"))
+                state = finish(con, job, runner, rc, res.wall, err, retries)
+                done += state == "done"
+                failed += state == "failed"
+                print(f"{'✓' if state == 'done' else '✗'} {data.parent.name}/{data.name} "
+                      f"({res.wall:.0f} с, {res.peak_rss / 2**20:.0f} МБ, {state})")
+
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        # процессы останавливаются, кейсы возвращаются в pending без штрафа
+        for job, mon in active.values():
+            mon.proc.terminate()
+        con.execute("UPDATE jobs SET state='pending', runner=NULL, pid=NULL, attempts=attempts-1 "
+                    "WHERE runner=? AND state='running'", (runner,))
+        print("Прервано: незавершённые кейсы возвращены в очередь.", file=sys.stderr)
+        raise SystemExit(130)
+    print(f"Готово: {done}, с ошибкой: {failed} за {time.perf_counter() - t_start:.0f} с")
+
+
+def print_status(con: sqlite3.Connection) -> None:
+    counts = dict(con.execute("SELECT state, count(*) FROM jobs GROUP BY state").fetchall())
+    print("  ".join(f"{s}: {counts.get(s, 0)}" for s in STATES))
+    left = con.execute("SELECT sum(estimate) FROM jobs WHERE state IN ('pending','running')"
+                       ).fetchone()[0]
+    if left:
+        print(f"Оценка оставшегося времени (последовательно): {left / 3600:.1f} ч")
+    for data, err in con.execute("SELECT data, error FROM jobs WHERE state='failed' LIMIT 10"):
+        lines = (err or "").splitlines()
+        print(f"  ✗ {data}: {lines[-1] if lines else ''}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Персистентная очередь расчётов (SQLite)")
+    ap.add_argument("db", type=Path, help="файл базы очереди")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p_add = sub.add_parser("add", help="добавить кейсы (.DATA) из каталогов")
+    p_add.add_argument("roots", nargs="+", type=Path)
+    p_add.add_argument("--glob", default="*_TSTEP_*.DATA", help="шаблон имён колод")
+
+    p_run = sub.add_parser("run", help="выполнять очередь")
+    p_run.add_argument("--workers", "-j", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    p_run.add_argument("--sim", default=DEFAULT_SIM,
+                       help="команда симулятора; подстановки {data} {logs} {a} {b}")
+    p_run.add_argument("--heartbeat", type=float, default=15.0, help="период heartbeat, с")
+    p_run.add_argument("--stale", type=float, default=120.0,
+                       help="через сколько секунд без heartbeat кейс считается брошенным")
+    p_run.add_argument("--retries", type=int, default=1,
+                       help="повторов кейса после падения/ошибки")
+    p_run.add_argument("--initial-dt", type=int, default=365,
+                       help="initial_dt, сут, для колод без _TSTEP_a_b в имени")
+
+    p_reset = sub.add_parser("reset", help="вернуть кейсы в pending")
+    p_reset.add_argument("--state", nargs="+", default=["failed"], choices=STATES)
+
+    sub.add_parser("status", help="сводка по состояниям")
+    args = ap.parse_args(argv)
+
+    con = connect(args.db)
+    if args.command == "add":
+        print(f"Добавлено кейсов: {add_cases(con, args.roots, args.glob)}")
+    elif args.command == "run":
+        run(con, args.workers, args.sim, args.heartbeat, args.stale, args.retries,
+            args.initial_dt)
+    elif args.command == "reset":
+        marks = ",".join("?" * len(args.state))
+        n = con.execute(f"UPDATE jobs SET state='pending', attempts=0, runner=NULL "
+                        f"WHERE state IN ({marks})", args.state).rowcount
+        print(f"Возвращено в pending: {n}")
+    else:
+        print_status(con)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+jutul_logs.py
+-------------
+Чтение логов Jutul (`!logs/.../jutul_N.jld2`) без Julia. JLD2 — это HDF5,
+поэтому файл открывается через h5py и читается только `report` (и `step`),
+а состояния (основной объём файла) читаются лишь по запросу (iter_substates):
+  • Dict в JLD2 хранится как вектор пар (first, second), значения — ссылки;
+    разыменовываются только нужные ключи (:ministeps, :dt, :success, :stats);
+  • на выходе — попытки ministep'ов по одной (генератор) или столбцами NumPy.
+
+Попытки группируются в ministep'ы так же, как в counter.jl: до success=true.
+
+    for a in iter_attempts(Path("jutul_12.jld2")):
+        print(a.dt, a.success, a.newtons)
+    batch = read_logs_dir(Path(r"QINJ_120\\!logs"))      # структурированный массив
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Sequence
+
+import numpy as np
+
+LOG_RX = re.compile(r"jutul_(\d+)\.jld2$", re.I)
+DAY = 86400.0
+
+# поле stats → столбец (имена как в Jutul / counter.jl)
+STAT_FIELDS = {
+    "newtons": "newtons",
+    "linearizations": "linearizations",
+    "linear_iterations": "linear_iterations",
+    "linear_solve_precond_iterations": "precond",
+}
+
+ATTEMPT_DTYPE = np.dtype([
+    ("log_idx", "i4"), ("step", "i4"), ("ministep", "i4"), ("attempt", "i4"),
+    ("dt", "f8"), ("success", "?"),
+    ("newtons", "i4"), ("linearizations", "i4"), ("linear_iterations", "i4"), ("precond", "i4"),
+])
+
+
+class Attempt(NamedTuple):
+    log_idx: int            # N из jutul_N.jld2
+    step: int               # внутренний номер шага (ключ "step" файла)
+    ministep: int           # номер ministep'а в шаге (с 1), попытки до success=true
+    attempt: int            # номер попытки в ministep'е (с 1)
+    dt: float               # секунды
+    success: bool
+    newtons: int
+    linearizations: int
+    linear_iterations: int
+    precond: int
+
+
+def _h5py():
+    try:
+        import h5py
+    except ImportError:
+        raise SystemExit("Для чтения JLD2 нужен h5py (pip install h5py).")
+    return h5py
+
+
+# -------------------- разбор JLD2 -----------------------------------
+
+def _text(v) -> str:
+    if isinstance(v, bytes):
+        return v.decode("utf-8", "replace")
+    if isinstance(v, np.ndarray) and v.dtype.kind in "iu":
+        return bytes(v.astype(np.uint8)).decode("utf-8", "replace")   # Symbol как вектор байт
+    return str(v)
+
+
+def _deref(f, v):
+    """Значение по ссылке HDF5 (или само значение); пустая ссылка → None."""
+    h5py = _h5py()
+    if isinstance(v, h5py.Reference):
+        if not v:
+            return None
+        v = f[v]
+    if isinstance(v, h5py.Dataset):
+        v = v[()]
+    return v
+
+
+def _pairs(f, v) -> Iterator[tuple]:
+    """Пары (ключ, сырое значение) сериализованного Dict — значения не разыменовываются."""
+    v = _deref(f, v)
+    if isinstance(v, np.ndarray) and v.dtype.names and "first" in v.dtype.names:
+        for rec in v:
+            yield _text(_deref(f, rec["first"])).lstrip(":"), rec["second"]
+    elif isinstance(v, np.void) and v.dtype.names:
+        # NamedTuple / структура: поля хранятся прямо в записи
+        for name in v.dtype.names:
+            yield name, v[name]
+
+
+def _get(f, v, key: str, default=None):
+    for k, raw in _pairs(f, v):
+        if k == key:
+            return _deref(f, raw)
+    return default
+
+
+def _items(f, v) -> Iterator:
+    """Элементы Vector{Any} (ссылки) без загрузки всего вектора в Python-объекты."""
+    v = _deref(f, v)
+    if v is None:
+        return
+    for raw in np.atleast_1d(v):
+        yield _deref(f, raw)
+
+
+def _number(f, v, default=0):
+    v = _deref(f, v)
+    try:
+        x = np.asarray(v).item()
+    except (TypeError, ValueError):
+        return default
+    return x if isinstance(x, (bool, int, float)) else default    # nothing / структура
+
+
+def _stats(f, ms) -> dict:
+    out = dict.fromkeys(STAT_FIELDS.values(), 0)
+    st = _get(f, ms, "stats")
+    if st is None:
+        return out
+    for k, raw in _pairs(f, st):
+        if k in STAT_FIELDS:
+            out[STAT_FIELDS[k]] = int(round(_number(f, raw)))
+    return out
+
+
+# -------------------- чтение ----------------------------------------
+
+def list_log_files(logs_dir: Path) -> List[Path]:
+    """jutul_N.jld2 по возрастанию N (как list_log_files в run_bhp_parallel.jl)."""
+    files = [p for p in Path(logs_dir).iterdir() if LOG_RX.search(p.name)]
+    return sorted(files, key=lambda p: int(LOG_RX.search(p.name).group(1)))
+
+
+def iter_attempts(path: Path) -> Iterator[Attempt]:
+    """Попытки ministep'ов одного файла; читается только report (и step)."""
+    h5py = _h5py()
+    path = Path(path)
+    m = LOG_RX.search(path.name)
+    log_idx = int(m.group(1)) if m else 0
+    with h5py.File(path, "r") as f:
+        step = int(_number(f, f["step"], log_idx)) if "step" in f else log_idx
+        if "report" not in f:
+            return
+        ministeps = _get(f, f["report"], "ministeps")
+        ministep, attempt = 1, 0
+        for ms in _items(f, ministeps):
+            attempt += 1
+            success = bool(_number(f, _get(f, ms, "success", False), False))
+            dt = float(_number(f, _get(f, ms, "dt"), np.nan))
+            yield Attempt(log_idx, step, ministep, attempt, dt, success, **_stats(f, ms))
+            if success:
+                ministep, attempt = ministep + 1, 0
+
+
+def read_attempts(paths: Iterable[Path]) -> np.ndarray:
+    """Попытки из нескольких файлов одним структурированным массивом ATTEMPT_DTYPE."""
+    rows = [tuple(a) for p in paths for a in iter_attempts(p)]
+    return np.array(rows, dtype=ATTEMPT_DTYPE)
+
+
+def read_logs_dir(logs_dir: Path) -> np.ndarray:
+    return read_attempts(list_log_files(logs_dir))
+
+
+def _state_arrays(f, state, variables: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Переменные резервуара из состояния Jutul (MultiModel — подсловарь :Reservoir)."""
+    res = _get(f, state, "Reservoir")
+    out = {}
+    for k, raw in _pairs(f, state if res is None else res):
+        if k in variables:
+            a = np.asarray(_deref(f, raw), dtype=np.float64)
+            out[k] = a.T if a.ndim > 1 else a     # порядок осей как в Julia: (фаза, ячейка)
+    return out
+
+
+def iter_substates(path: Path, variables: Sequence[str] = ("Pressure", "Saturations")
+                   ) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Сошедшиеся состояния принятых ministep'ов файла (output_substates=true);
+    без substates — одно итоговое состояние шага.
+    """
+    h5py = _h5py()
+    with h5py.File(path, "r") as f:
+        if "substates" in f:
+            for st in _items(f, f["substates"]):
+                yield _state_arrays(f, st, variables)
+        elif "state" in f:
+            yield _state_arrays(f, f["state"], variables)
+
+
+def accepted_dt_days(path: Path) -> List[float]:
+    """dt принятых ministep'ов в сутках — аналог read_ministeps из run_bhp_parallel.jl."""
+    return [a.dt / DAY for a in iter_attempts(path) if a.success]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser("Попытки ministep'ов из логов Jutul (*.jld2) без Julia")
+    ap.add_argument("logs", type=Path, help="каталог с jutul_N.jld2 или один файл")
+    ap.add_argument("--npy", type=Path, default=None, help="сохранить попытки в .npy")
+    args = ap.parse_args()
+
+    files = [args.logs] if args.logs.is_file() else list_log_files(args.logs)
+    batch = read_attempts(files)
+    ok = batch["success"]
+    # сводка как в counter.jl: только попытки ministep'ов, закончившихся success=true;
+    # срезанные попытки в конце файла (расчёт упал / остановлен) идут отдельно
+    accepted = {(r["log_idx"], r["ministep"]) for r in batch[ok]}
+    closed = np.array([(r["log_idx"], r["ministep"]) in accepted for r in batch], dtype=bool)
+    n_steps, n_ms = len(files), int(ok.sum())
+    print(f"Файлов (шагов): {n_steps}, ministep'ов: {n_ms}, попыток: {int(closed.sum())}")
+    for col in ("newtons", "linearizations", "linear_iterations", "precond"):
+        total = int(batch[col][closed].sum())
+        print(f"  {col:<18}: total {total} (wasted {total - int(batch[col][ok].sum())}) | "
+              f"avg/step {total / max(n_steps, 1):.3f}  avg/ministep {total / max(n_ms, 1):.4f}")
+    tail = ~closed
+    if tail.any():
+        print(f"Не вошли в сводку (как и в counter.jl): {int(tail.sum())} попыток без принятия "
+              f"в конце файла, линеаризаций {int(batch['linearizations'][tail].sum())}")
+    print("Порядок файлов — по N (counter.jl сортирует имена как строки); на итоги не влияет.")
+    if args.npy is not None:
+        np.save(args.npy, batch)
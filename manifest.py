@@ -0,0 +1,200 @@
+"""
+manifest.py
+-----------
+Инкрементальная перегенерация кейсов. В корне вывода лежит .manifest.json:
+для каждого кейса — входы (хэш шаблона, параметры, версия генератора)
+и записанные файлы (sha256, size, mtime).
+
+  • кейс с теми же входами и нетронутыми файлами пропускается целиком;
+  • иначе файл пишется, только если его содержимое действительно изменилось —
+    mtime остальных не меняется, rsync и кэши ниже по цепочке их не трогают;
+  • в конце — сводка added / changed / unchanged и список устаревших кейсов,
+    которые можно удалить (--prune).
+
+Один корень могут делить несколько генераторов (new_sub_data.py пишет
+в каталоги new_data_bhp.py): устаревшими считаются и удаляются только
+кейсы того же генератора (имя до '/' в GENERATOR), записи остальных
+переносятся в манифест без изменений.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+MANIFEST_NAME = ".manifest.json"
+
+
+def add_manifest_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--prune", action="store_true",
+                    help="удалить кейсы, которых больше нет в переборе")
+    ap.add_argument("--force", action="store_true",
+                    help="не пропускать кейсы по манифесту (файлы всё равно сравниваются)")
+
+
+class CaseResult(NamedTuple):
+    case: str
+    files: Dict[str, dict]      # путь относительно корня → {sha, size, mtime_ns}
+    written: List[str]          # какие файлы реально перезаписаны
+    msg: str
+
+
+def text_bytes(text: str) -> bytes:
+    # как Path.write_text: '\n' → os.linesep
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    return text.encode("utf-8")
+
+
+def write_if_changed(path: Path, data: bytes, old: Optional[dict] = None) -> tuple:
+    """Пишет `data`, только если содержимое файла другое. Возвращает (запись, записан ли)."""
+    sha = hashlib.sha256(data).hexdigest()
+    if path.is_file():
+        st = path.stat()
+        same = (old is not None and old["sha"] == sha
+                and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns)
+        if same or (st.st_size == len(data) and path.read_bytes() == data):
+            return {"sha": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns}, False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    st = path.stat()
+    return {"sha": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns}, True
+
+
+def write_case(root: Path, case: str, texts: Dict[str, str],
+               old: Optional[Dict[str, dict]], msg: str) -> CaseResult:
+    """Записывает файлы кейса (пути относительно root) с проверкой по содержимому."""
+    old = old or {}
+    files, written = {}, []
+    for rel, text in texts.items():
+        rec, changed = write_if_changed(root / rel, text_bytes(text), old.get(rel))
+        files[rel] = rec
+        if changed:
+            written.append(rel)
+    return CaseResult(case, files, written, msg)
+
+
+def _family(generator: str) -> str:
+    return generator.split("/", 1)[0]
+
+
+class Manifest:
+    def __init__(self, root: Path, generator: str):
+        self.root = Path(root)
+        self.path = self.root / MANIFEST_NAME
+        self.generator = generator
+        self.old: Dict[str, dict] = {}
+        if self.path.is_file():
+            try:
+                self.old = json.loads(self.path.read_text(encoding="utf-8")).get("cases", {})
+            except (OSError, ValueError):
+                self.old = {}
+        self.new: Dict[str, dict] = {}
+        self.pending: Dict[str, dict] = {}     # входы кейсов, отправленных в пул
+        self.counts = {"added": 0, "changed": 0, "unchanged": 0}
+
+    def inputs(self, template_sha: str, params: dict) -> dict:
+        return {"generator": self.generator, "template": template_sha, "params": params}
+
+    def known(self, case: str) -> Optional[Dict[str, dict]]:
+        entry = self.old.get(case)
+        return entry["files"] if entry else None
+
+    def fresh(self, case: str, inputs: dict) -> bool:
+        """Те же входы и все файлы на месте с прежними size/mtime."""
+        entry = self.old.get(case)
+        if entry is None or entry["inputs"] != inputs:
+            return False
+        for rel, rec in entry["files"].items():
+            try:
+                st = (self.root / rel).stat()
+            except OSError:
+                return False
+            if st.st_size != rec["size"] or st.st_mtime_ns != rec["mtime_ns"]:
+                return False
+        return True
+
+    def keep(self, case: str) -> None:
+        self.new[case] = self.old[case]
+        self.counts["unchanged"] += 1
+
+    def plan(self, case: str, inputs: dict, force: bool = False) -> bool:
+        """Нужно ли генерировать кейс; если нет — он сразу учтён как unchanged."""
+        if not force and self.fresh(case, inputs):
+            self.keep(case)
+            return False
+        self.pending[case] = inputs
+        return True
+
+    def collect(self, res: CaseResult) -> None:
+        """on_result для run_jobs: учесть кейс и напечатать, если что-то записано."""
+        status = self.update(self.pending.pop(res.case), res)
+        if status != "unchanged" and res.msg:
+            print(res.msg)
+
+    def update(self, inputs: dict, res: CaseResult) -> str:
+        """Запоминает результат кейса, возвращает его статус."""
+        if res.case not in self.old:
+            status = "added"
+        elif res.written:
+            status = "changed"
+        else:
+            status = "unchanged"
+        self.new[res.case] = {"inputs": inputs, "files": res.files}
+        self.counts[status] += 1
+        return status
+
+    def mine(self, case: str) -> bool:
+        """Кейс из старого манифеста записан этим генератором (любой версии)."""
+        gen = self.old[case].get("inputs", {}).get("generator", "")
+        return _family(gen) == _family(self.generator)
+
+    def stale(self) -> List[str]:
+        return sorted(c for c in set(self.old) - set(self.new) if self.mine(c))
+
+    def foreign(self) -> List[str]:
+        return sorted(c for c in set(self.old) - set(self.new) if not self.mine(c))
+
+    def prune(self) -> int:
+        """Удаляет устаревшие кейсы (папку кейса или его файлы)."""
+        n = 0
+        for case in self.stale():
+            target = (self.root / case).resolve()
+            if self.root.resolve() not in target.parents:
+                continue
+            if target.is_dir():
+                shutil.rmtree(target)
+            else:
+                for rel in self.old[case]["files"]:
+                    (self.root / rel).unlink(missing_ok=True)
+            n += 1
+        return n
+
+    def save(self, keep_stale: bool = True) -> None:
+        cases = dict(self.new)
+        for case in self.foreign():
+            cases[case] = self.old[case]
+        if keep_stale:
+            for case in self.stale():
+                cases[case] = self.old[case]
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"cases": cases}, ensure_ascii=False, indent=1),
+                       encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def finish(self, prune: bool) -> None:
+        """Сводка, при необходимости удаление устаревших кейсов, запись манифеста."""
+        stale = self.stale()
+        print(f"Кейсы: добавлено {self.counts['added']}, изменено {self.counts['changed']}, "
+              f"без изменений {self.counts['unchanged']}, устаревших {len(stale)}")
+        if stale and prune:
+            print(f"Удалено устаревших кейсов: {self.prune()}")
+        elif stale:
+            print("  (удалить устаревшие: --prune) " + ", ".join(stale[:10])
+                  + (" …" if len(stale) > 10 else ""))
+        self.save(keep_stale=not prune)
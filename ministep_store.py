@@ -0,0 +1,394 @@
+"""
+ministep_store.py
+-----------------
+Единое длинное (long-format) хранилище статистики ministep'ов вместо
+разрозненных CSV: jutul_ministeps_all.csv (counter.jl), «рваного»
+tstep_all_logs_parallel.csv (run_bhp_parallel.jl, dt1..dt15) и
+tstep_summary.csv (dt1..dt30).
+
+Одна строка — одна попытка, ключ (sweep, case, a, b, initial_dt, log_idx,
+ministep, attempt).
+На диске — каталог:
+    index.json        словари sweep/case, список частей;
+    part_00000.npy    структурированный массив STORE_DTYPE (читается через mmap).
+Добавление перебора пишет новую часть и переписывает только index.json.
+
+Источники (add):
+  • каталоги логов с jutul_N.jld2 — все попытки со статистикой (jutul_logs);
+  • jutul_ministeps_all.csv — принятая попытка + одна «потерянная» строка
+    с суммой неудачных попыток (attempt = 0), так итоги совпадают;
+  • широкие CSV с dt1..dtN — только dt принятых шагов, статистика = -1.
+dt и initial_dt хранятся в сутках. initial_dt — начальный шаг расчёта:
+для TSTEP_a_b это a (так запускают run_bhp_parallel.jl / run_tstep_case.jl),
+в tstep_summary.csv — своя колонка (a = b = -1), иначе NaN.
+
+    python ministep_store.py D:\\stats add inj_one_year D:\\convergance_tests\\inj_check_one_year -j 8
+    python ministep_store.py D:\\stats query --by case_num a --sum newtons --failed
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from case_pipeline import add_pool_args, run_jobs
+
+INDEX_NAME = "index.json"
+PART_ROWS = 1 << 21            # примерно столько строк в одной части
+STATS = ("newtons", "linearizations", "linear_iterations", "precond")
+STORE_DTYPE = np.dtype([
+    ("sweep", "i2"), ("case", "i4"), ("case_num", "i4"),
+    ("a", "i4"), ("b", "i4"), ("log_idx", "i4"), ("ministep", "i4"), ("attempt", "i4"),
+    ("initial_dt", "f8"), ("dt", "f8"), ("success", "?"),
+] + [(s, "i4") for s in STATS])
+_SCHEMA = [list(d) for d in STORE_DTYPE.descr]      # как в index.json
+
+DAY = 86400.0
+LOGS_DIRNAME = "!logs"
+_TSTEP_DIR_RX = re.compile(r"^TSTEP_(\d+)_(\d+)$")
+_LOG_RX = re.compile(r"jutul_(\d+)\.jld2$", re.I)
+_NUM_RX = re.compile(r"(\d+)$")
+
+
+def case_number(case: str) -> int:
+    """Число в конце имени кейса (QINJ_120 → 120, BHP_300 → 300), иначе -1."""
+    m = _NUM_RX.search(case.rsplit("/", 1)[-1])
+    return int(m.group(1)) if m else -1
+
+
+def locate(path: Path, root: Path) -> Tuple[str, int, int]:
+    """(case, a, b) по пути внутри перебора: <case>/!logs/TSTEP_a_b/… ."""
+    rel = path.relative_to(root).parts
+    if LOGS_DIRNAME in rel:
+        i = rel.index(LOGS_DIRNAME)
+        case = "/".join(rel[:i]) or root.name
+        m = _TSTEP_DIR_RX.match(rel[i + 1]) if i + 1 < len(rel) - 1 else None
+        return case, (int(m.group(1)) if m else -1), (int(m.group(2)) if m else -1)
+    return "/".join(rel[:-1]) or root.name, -1, -1
+
+
+# -------------------- разбор источников -----------------------------
+
+class Rows(NamedTuple):
+    cases: List[str]            # case как строка; в хранилище — id словаря
+    data: np.ndarray            # STORE_DTYPE без sweep/case
+
+
+def _empty(n: int) -> np.ndarray:
+    out = np.zeros(n, dtype=STORE_DTYPE)
+    for s in STATS:
+        out[s] = -1
+    out["initial_dt"] = np.nan
+    return out
+
+
+def _initial_dt(a: int) -> float:
+    """initial_dt кейса TSTEP_a_b (= a сут в раннерах), неизвестно — NaN."""
+    return float(a) if a >= 0 else np.nan
+
+
+def read_jld2_dir(logs_dir: Path, root: Path) -> Rows:
+    from jutul_logs import list_log_files, read_attempts
+
+    att = read_attempts(list_log_files(logs_dir))
+    case, a, b = locate(logs_dir / "x", root)
+    out = _empty(att.size)
+    for c in ("log_idx", "ministep", "attempt", "success") + STATS:
+        out[c] = att[c]
+    out["dt"] = att["dt"] / DAY
+    out["a"], out["b"], out["case_num"] = a, b, case_number(case)
+    out["initial_dt"] = _initial_dt(a)
+    return Rows([case] * att.size, out)
+
+
+def read_counter_csv(path: Path, root: Path) -> Rows:
+    """jutul_ministeps_all.csv: строка на ministep с колонками *_acc / *_wasted."""
+    case, a, b = locate(path, root)
+    cols = {"newtons": "newton", "linearizations": "linearizations",
+            "linear_iterations": "linear", "precond": "precond"}
+    acc, lost = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            m = _LOG_RX.search(r["file"])
+            log_idx = int(m.group(1)) if m else int(r["step"])
+            ms, n = int(r["ministep"]), int(r["attempts"])
+            acc.append((log_idx, ms, n, float(r["dt"]) / DAY, True,
+                        *(int(r[f"{c}_acc"]) for c in cols.values())))
+            if n > 1:
+                lost.append((log_idx, ms, 0, np.nan, False,
+                             *(int(r[f"{c}_wasted"]) for c in cols.values())))
+    rows = acc + lost
+    out = _empty(len(rows))
+    names = ("log_idx", "ministep", "attempt", "dt", "success") + tuple(cols)
+    for j, name in enumerate(names):
+        out[name] = [r[j] for r in rows]
+    out["a"], out["b"], out["case_num"] = a, b, case_number(case)
+    out["initial_dt"] = _initial_dt(a)
+    order = np.lexsort((out["attempt"], out["ministep"], out["log_idx"]))
+    return Rows([case] * out.size, out[order])
+
+
+def read_wide_csv(path: Path, root: Path) -> Rows:
+    """CSV с dt1..dtN: tstep_all_logs_parallel.csv или tstep_summary.csv."""
+    cases, rows = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        dt_cols = [i for i, h in enumerate(header) if re.fullmatch(r"dt\d+", h)]
+        pos = {h: i for i, h in enumerate(header)}
+        case_col = pos.get("bhp_dir", pos.get("run_dir", 0))
+        skipped = 0
+        for r in reader:
+            if not r:
+                continue
+            if "log_idx" in pos and not r[pos["log_idx"]].isdigit():
+                skipped += 1                       # FAIL_CASE / FAIL_WORKER
+                continue
+            case = r[case_col]
+            if "a" in pos:
+                a, b = int(r[pos["a"]]), int(r[pos["b"]])
+                initial_dt = _initial_dt(a)
+            else:
+                # tstep_summary.csv: расчёт задан initial_dt, a/b нет
+                a, b, initial_dt = -1, -1, float(r[pos["initial_dt"]])
+            log_idx = int(r[pos["log_idx"]]) if "log_idx" in pos else 0
+            for k, i in enumerate(dt_cols, 1):
+                if i < len(r) and r[i] != "":
+                    cases.append(case)
+                    rows.append((case_number(case), a, b, initial_dt, log_idx, k, 1,
+                                 float(r[i]), True))
+    if skipped:
+        print(f"{path.name}: пропущено строк с ошибками расчёта: {skipped}", file=sys.stderr)
+    out = _empty(len(rows))
+    for j, name in enumerate(("case_num", "a", "b", "initial_dt", "log_idx", "ministep", "attempt",
+                              "dt", "success")):
+        out[name] = [r[j] for r in rows]
+    return Rows(cases, out)
+
+
+def read_source(job: Tuple[Path, Path]) -> Rows:
+    path, root = job
+    if path.is_dir():
+        return read_jld2_dir(path, root)
+    with open(path, encoding="utf-8") as f:
+        header = f.readline()
+    if header.startswith("step,file,"):
+        return read_counter_csv(path, root)
+    return read_wide_csv(path, root)
+
+
+def find_sources(src: Path) -> Iterator[Path]:
+    """Каталоги с jutul_N.jld2 и CSV под src (или сам файл)."""
+    if src.is_file():
+        yield src
+        return
+    jld2_dirs = sorted({p.parent for p in src.rglob("jutul_*.jld2")})
+    yield from jld2_dirs
+    covered = set(jld2_dirs)
+    for p in sorted(src.rglob("*.csv")):
+        # counter.jl пишет CSV рядом с логами — если есть сами логи, берём их
+        if p.name == "jutul_ministeps_all.csv" and p.parent in covered:
+            continue
+        if p.name in ("jutul_ministeps_all.csv", "tstep_all_logs_parallel.csv", "tstep_summary.csv"):
+            yield p
+
+
+# -------------------- хранилище -------------------------------------
+
+class MinistepStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.index_path = self.root / INDEX_NAME
+        if self.index_path.is_file():
+            self.index = json.loads(self.index_path.read_text(encoding="utf-8"))
+            if self.index.get("dtype") != _SCHEMA:
+                raise SystemExit(f"{self.index_path}: другая схема хранилища "
+                                 f"(соберите хранилище заново в другом каталоге командой add).")
+        else:
+            self.index = {"dtype": _SCHEMA, "sweeps": [], "cases": [], "parts": []}
+        self._case_ids = {c: i for i, c in enumerate(self.index["cases"])}
+
+    # ---- запись ----
+
+    def _save_index(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.index, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    def _case_id(self, case: str) -> int:
+        i = self._case_ids.get(case)
+        if i is None:
+            i = self._case_ids[case] = len(self.index["cases"])
+            self.index["cases"].append(case)
+        return i
+
+    def drop_sweep(self, sweep: str) -> None:
+        keep = []
+        for part in self.index["parts"]:
+            if part["sweep"] == sweep:
+                (self.root / part["file"]).unlink(missing_ok=True)
+            else:
+                keep.append(part)
+        self.index["parts"] = keep
+        self._save_index()
+
+    def append(self, sweep: str, rows: Rows, source: str = "") -> int:
+        """Новая часть для перебора `sweep`; существующие части не переписываются."""
+        if not rows.data.size:
+            return 0
+        if sweep not in self.index["sweeps"]:
+            self.index["sweeps"].append(sweep)
+        data = rows.data.copy()
+        data["sweep"] = self.index["sweeps"].index(sweep)
+        uniq, inv = np.unique(np.array(rows.cases, dtype=object), return_inverse=True)
+        data["case"] = np.array([self._case_id(c) for c in uniq], dtype=np.int32)[inv]
+
+        seq = max([int(p["file"][5:10]) for p in self.index["parts"]] + [-1]) + 1
+        name = f"part_{seq:05d}.npy"
+        self.root.mkdir(parents=True, exist_ok=True)
+        np.save(self.root / name, data)
+        self.index["parts"].append({"file": name, "sweep": sweep, "rows": int(data.size),
+                                    "source": source})
+        self._save_index()
+        return int(data.size)
+
+    # ---- чтение ----
+
+    def parts(self, sweeps: Optional[Sequence[str]] = None) -> Iterator[np.ndarray]:
+        for part in self.index["parts"]:
+            if sweeps is None or part["sweep"] in sweeps:
+                yield np.load(self.root / part["file"], mmap_mode="r")
+
+    def column(self, name: str, sweeps: Optional[Sequence[str]] = None) -> np.ndarray:
+        cols = [p[name] for p in self.parts(sweeps)]
+        return np.concatenate(cols) if cols else np.empty(0, dtype=STORE_DTYPE[name])
+
+    def rows(self) -> int:
+        return sum(p["rows"] for p in self.index["parts"])
+
+    def group_sum(self, by: Sequence[str], value: str, failed: bool = False,
+                  sweeps: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Суммы `value` по группам `by`: (ключи [n_groups, len(by)], суммы). failed — только неудачные попытки."""
+        keys = [self.column(k, sweeps) for k in by]
+        if value == "rows":
+            vals = np.ones(keys[0].size, dtype=np.int64)
+        else:
+            vals = self.column(value, sweeps).astype(np.int64)
+        mask = vals >= 0                                   # -1 — статистика неизвестна
+        if failed:
+            mask &= ~self.column("success", sweeps)
+        codes, levels = [], []
+        for k in keys:
+            lv, inv = np.unique(k[mask], return_inverse=True)
+            levels.append(lv)
+            codes.append(inv)
+        flat = np.ravel_multi_index(codes, [max(lv.size, 1) for lv in levels])
+        groups, inv = np.unique(flat, return_inverse=True)
+        sums = np.bincount(inv, weights=vals[mask], minlength=groups.size).astype(np.int64)
+        idx = np.unravel_index(groups, [max(lv.size, 1) for lv in levels])
+        # object: целые ключи не приводятся к float рядом с initial_dt
+        return np.column_stack([lv[i].astype(object) for lv, i in zip(levels, idx)]), sums
+
+    def export_parquet(self, out: Path) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Для Parquet нужен pyarrow (pip install pyarrow).")
+        cases = np.array(self.index["cases"], dtype=object)
+        for part in self.index["parts"]:
+            arr = np.load(self.root / part["file"], mmap_mode="r")
+            cols = {n: np.asarray(arr[n]) for n in STORE_DTYPE.names}
+            cols["sweep"] = np.full(arr.size, part["sweep"], dtype=object)
+            cols["case"] = cases[cols["case"]]
+            pq.write_to_dataset(pa.table(cols), out, partition_cols=["sweep"])
+
+
+# -------------------- CLI -------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Хранилище статистики ministep'ов (long format)")
+    ap.add_argument("store", type=Path, help="каталог хранилища")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p_add = sub.add_parser("add", help="добавить перебор")
+    p_add.add_argument("sweep", help="имя перебора")
+    p_add.add_argument("sources", nargs="+", type=Path, help="корни переборов / CSV")
+    p_add.add_argument("--replace", action="store_true", help="заменить уже добавленный перебор")
+    add_pool_args(p_add)
+
+    sub.add_parser("info", help="перечень переборов и частей")
+
+    p_q = sub.add_parser("query", help="суммы по группам")
+    p_q.add_argument("--by", nargs="+", default=["case_num", "a"], choices=STORE_DTYPE.names)
+    p_q.add_argument("--sum", default="newtons", choices=STATS + ("rows",))
+    p_q.add_argument("--failed", action="store_true", help="только неудачные попытки (потерянная работа)")
+    p_q.add_argument("--sweep", nargs="*", default=None)
+
+    p_x = sub.add_parser("export", help="выгрузить в Parquet (по разделам sweep)")
+    p_x.add_argument("out", type=Path)
+
+    args = ap.parse_args(argv)
+    store = MinistepStore(args.store)
+
+    if args.command == "add":
+        if args.sweep in store.index["sweeps"]:
+            if not args.replace:
+                raise SystemExit(f"Перебор {args.sweep} уже в хранилище (--replace для замены).")
+            store.drop_sweep(args.sweep)
+        jobs = [(p, src.resolve() if src.is_dir() else src.resolve().parent)
+                for src in args.sources for p in find_sources(src.resolve())]
+        total = 0
+        buf: List[Rows] = []
+
+        def flush() -> None:
+            nonlocal total
+            if buf:
+                total += store.append(args.sweep, Rows([c for r in buf for c in r.cases],
+                                                       np.concatenate([r.data for r in buf])))
+                buf.clear()
+
+        def collect(rows: Rows) -> None:
+            # мелкие источники копятся в одну часть, чтобы не плодить файлы
+            buf.append(rows)
+            if sum(r.data.size for r in buf) >= PART_ROWS:
+                flush()
+
+        run_jobs(read_source, jobs, workers=args.workers, inflight=args.inflight,
+                 dry_run=args.dry_run, describe=lambda j: str(j[0]), on_result=collect)
+        if not args.dry_run:
+            flush()
+            print(f"{args.sweep}: добавлено строк {total}, всего в хранилище {store.rows()}")
+
+    elif args.command == "info":
+        by_sweep: Dict[str, List[int]] = {}
+        for part in store.index["parts"]:
+            by_sweep.setdefault(part["sweep"], []).append(part["rows"])
+        for sweep, parts in by_sweep.items():
+            print(f"{sweep:<24} частей {len(parts):5d}  строк {sum(parts):12d}")
+        print(f"Всего: {store.rows()} строк, кейсов {len(store.index['cases'])}")
+
+    elif args.command == "query":
+        keys, sums = store.group_sum(args.by, args.sum, args.failed, args.sweep)
+        w = csv.writer(sys.stdout)
+        w.writerow(list(args.by) + [f"{args.sum}_{'wasted' if args.failed else 'total'}"])
+        names = {"sweep": store.index["sweeps"], "case": store.index["cases"]}
+        for k, s in zip(keys.tolist(), sums.tolist()):
+            w.writerow([names[c][v] if c in names else v for c, v in zip(args.by, k)] + [s])
+
+    else:
+        store.export_parquet(args.out)
+        print(f"Parquet: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,19 +3,26 @@ make_bhp_case_set.py
 --------------------
 Создаёт кейсы BHP_XXX:
   • правит .DATA (INCLUDE → 'INCLUDE/…');
-  • копирует только mDARCY.INC и ACTIVE.INC в подпапку INCLUDE;
+  • кладёт mDARCY.INC и ACTIVE.INC в подпапку INCLUDE жёсткими ссылками
+    на общий экземпляр из хранилища (см. include_store.py);
   • генерирует schedule_BHP_XXX.inc из шаблона schedule_test.inc, меняя только BHP.
 """
 
 import argparse
 import pathlib
 import re
-import shutil
 import sys
-from typing import List
+from typing import Dict, List, NamedTuple, Optional
+
+from case_pipeline import add_pool_args, run_jobs
+from include_store import MODES, IncludeStore, file_digest
+from manifest import CaseResult, Manifest, add_manifest_args, write_case
+from schedule_variants import ScheduleTemplate
+from sweep import Sweep
 
 EXTRA_DEFAULT = ["mDARCY.INC", "ACTIVE.INC"]  
 TARGET_INCLUDE = "schedule_test.inc"          # что ищем в .DATA
+GENERATOR = "new_data_bhp/2"                  # смена версии → перепроверка всех кейсов
 
 # -------------------- функции -------------------------------------------
 
@@ -49,25 +56,44 @@ def patch_data(lines: List[str], num: int, prefix: str) -> List[str]:
     return patched
 
 
-def write_schedule_from_template(tmpl_text: str, num: int, dst: pathlib.Path) -> None:
-    """
-    В шаблоне schedule_test.inc заменяем ПЕРВОЕ число после 'BHP' на `num`.
-    Пример шаблона (фрагмент):
-        WCONPROD
-            'PROD1' 'OPEN' 'BHP' 5* 450 /
-        /
-    Регулярка ниже заменит только первое вхождение.
-    """
-    replacement = rf"\g<1>{num}"
-    content = re.sub(r"('BHP'\s+\d*\*?\s*)\d+", replacement, tmpl_text, count=1, flags=re.I)
-    # Если у вас формат типа:  'BHP' 5* 450  — тоже сработает (захватывает '5* ' как опциональный блок).
-    dst.write_text(content, encoding="utf-8")
-
-
-def copy_file(src: pathlib.Path, dst_dir: pathlib.Path) -> None:
+def copy_file(src: pathlib.Path, dst_dir: pathlib.Path, store: IncludeStore) -> None:
     if not src.is_file():
         sys.exit(f"Не найден файл: {src}")
-    shutil.copy2(src, dst_dir)
+    store.link(src, dst_dir / src.name)
+
+
+# -------------------- задание пула --------------------------------------
+
+class BhpJob(NamedTuple):
+    num: int
+    out_root: pathlib.Path
+    case: str                                   # BHP_XXX
+    old: Optional[Dict[str, dict]] = None       # записи манифеста о файлах кейса
+
+
+# общие для всех заданий данные; в процессах пула задаются init_worker
+_data_lines: List[str] = []
+_data_name = ""
+_schedule: Optional[ScheduleTemplate] = None
+_prefix = "BHP"
+
+
+def init_worker(data_lines: List[str], data_name: str, tmpl_text: str, prefix: str) -> None:
+    global _data_lines, _data_name, _schedule, _prefix
+    # шаблон schedule разбирается один раз на процесс, а не regex на каждый кейс
+    _data_lines, _data_name, _prefix = data_lines, data_name, prefix
+    _schedule = ScheduleTemplate(tmpl_text)
+
+
+def make_case(job: BhpJob) -> CaseResult:
+    texts = {
+        # 1) .DATA (подмена schedule и нормализация INCLUDE путей)
+        f"{job.case}/{_data_name}": "".join(patch_data(_data_lines, job.num, _prefix)),
+        # 2) schedule_BHP_XXX.inc из шаблона, меняем только BHP (item 9 WCONPROD)
+        f"{job.case}/INCLUDE/schedule_{_prefix}_{job.num:03d}.inc": _schedule.render({"bhp": job.num}),
+    }
+    # пишутся только файлы, содержимое которых изменилось
+    return write_case(job.out_root, job.case, texts, job.old, f"✓ {job.case}")
 
 # -------------------- основной код --------------------------------------
 
@@ -97,10 +123,18 @@ def main() -> None:
     ap.add_argument(
         "--prefix", "-p", default="BHP", help="префикс папок и schedule‑файлов"
     )
+    ap.add_argument(
+        "--inc-mode", choices=MODES, default="hardlink",
+        help="как класть *.INC в кейсы: ссылкой на хранилище или копией",
+    )
     # Диапазон BHP по умолчанию: 390..399 с шагом 1
     ap.add_argument("--start", type=int, default=300)
     ap.add_argument("--stop",  type=int, default=390)
     ap.add_argument("--step",  type=int, default=10)
+    ap.add_argument("--spec", type=pathlib.Path, default=None,
+                    help="спецификация перебора с параметром bhp (вместо --start/--stop/--step)")
+    add_pool_args(ap)
+    add_manifest_args(ap)
     args = ap.parse_args()
 
     base_data = args.data.resolve()
@@ -111,6 +145,8 @@ def main() -> None:
     if not tmpl_path.is_file():
         sys.exit(f"Шаблон schedule_test.inc не найден: {tmpl_path}")
     tmpl_text = tmpl_path.read_text(encoding="utf-8")
+    if not ScheduleTemplate(tmpl_text).select("bhp"):
+        sys.exit(f"В шаблоне {tmpl_path} нет WCONPROD с управлением по BHP.")
 
     out_root = (args.out or base_data.parent).resolve()
     extra_dir = (args.extra or base_data.parent).resolve()
@@ -120,27 +156,40 @@ def main() -> None:
         if not p.is_file():
             sys.exit(f"Нет файла {p}")
 
+    store = None if args.dry_run else IncludeStore(out_root, args.inc_mode)
     data_lines = base_data.read_text(encoding="utf-8", errors="ignore").splitlines(keepends=True)
 
-    for num in range(args.start, args.stop + 1, args.step):
-        tag = f"{args.prefix}_{num:03d}"
-        case_dir = out_root / tag
-        include_dir = case_dir / "INCLUDE"
-        include_dir.mkdir(parents=True, exist_ok=True)
-
-        # 1) .DATA (подмена schedule и нормализация INCLUDE путей)
-        patched = patch_data(data_lines, num, args.prefix)
-        (case_dir / base_data.name).write_text("".join(patched), encoding="utf-8")
-
-        # 2) копируем только необходимые *.INC
-        for p in extra_paths:
-            copy_file(p, include_dir)
-
-        # 3) генерируем schedule_BHP_XXX.inc из шаблона, меняем только BHP
-        sched_file = include_dir / f"schedule_{args.prefix}_{num:03d}.inc"
-        write_schedule_from_template(tmpl_text, num, sched_file)
-
-        print(f"✓ {tag}")
+    if args.spec is not None:
+        sweep = Sweep.from_file(args.spec)
+        bhp_values = (int(v) for (v,) in sweep.tuples(("bhp",)))
+    else:
+        bhp_values = range(args.start, args.stop + 1, args.step)
+
+    manifest = Manifest(out_root, GENERATOR)
+    template_sha = file_digest(base_data) + file_digest(tmpl_path)
+
+    def jobs():
+        for num in bhp_values:
+            case = f"{args.prefix}_{num:03d}"
+            if store is not None:
+                # только необходимые *.INC — через общее хранилище (в главном процессе)
+                include_dir = out_root / case / "INCLUDE"
+                include_dir.mkdir(parents=True, exist_ok=True)
+                for p in extra_paths:
+                    copy_file(p, include_dir, store)
+            inputs = manifest.inputs(template_sha, {"bhp": num, "prefix": args.prefix})
+            if manifest.plan(case, inputs, args.force):
+                yield BhpJob(num, out_root, case, manifest.known(case))
+
+    run_jobs(make_case, jobs(), workers=args.workers, inflight=args.inflight,
+             dry_run=args.dry_run, describe=lambda j: f"{j.out_root / j.case}: BHP={j.num}",
+             initializer=init_worker,
+             initargs=(data_lines, base_data.name, tmpl_text, args.prefix),
+             on_result=manifest.collect)
+    if not args.dry_run:
+        manifest.finish(args.prune)
+    if store is not None:
+        print(store.report())
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,13 @@
 from pathlib import Path
-import re
 import argparse
-from typing import Optional, List, Tuple
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 
-# Ищем блок:
-# TSTEP
-#     X Y Z /
-TSTEP_RX = re.compile(r"(TSTEP\s*\n\s*)(\d+)\s+(\d+)(\s+\d+\s*/)", re.I)
+from case_pipeline import add_pool_args, run_jobs
+from deck_patch import DeckTemplate
+from include_store import file_digest
+from manifest import CaseResult, Manifest, add_manifest_args, write_case
+
+GENERATOR = "new_sub_data/1"
 
 
 def find_base_data_file(folder: Path) -> Optional[Path]:
@@ -21,60 +22,91 @@ def find_base_data_file(folder: Path) -> Optional[Path]:
     return candidates[0] if candidates else None
 
 
-def build_variations(template_text: str, total: int,
-                     a_min: int, a_max: int, a_step: int) -> List[Tuple[int, int, str]]:
-    """
-    Возвращает список (a, b, modified_text) для всех a ∈ [a_min, a_max] с шагом a_step,
-    при b = total - a. Меняется только первая строка после TSTEP, остальные данные неизменны.
-    """
+def tstep_windows(total: int, a_min: int, a_max: int, a_step: int) -> List[Tuple[int, int]]:
+    """Пары (a, b) для всех a ∈ [a_min, a_max] с шагом a_step, при b = total - a."""
     if a_step <= 0:
         raise ValueError("Шаг перебора a_step должен быть положительным.")
     if total <= 1:
         raise ValueError("Параметр total должен быть > 1.")
 
-    m = TSTEP_RX.search(template_text)
-    if not m:
-        raise ValueError("В файле не найден корректный блок TSTEP с тремя числами.")
-
     # Нормализуем границы: 1 ≤ a ≤ total-1
     a_min = max(1, a_min)
     a_max = min(total - 1, a_max)
-    if a_min > a_max:
-        return []
-
-    prefix, _, _, suffix = m.groups()
-    out: List[Tuple[int, int, str]] = []
-    for a in range(a_min, a_max + 1, a_step):
-        b = total - a
-        if a <= 0 or b <= 0:
-            continue
-        replacement = f"{prefix}{a} {b}{suffix}"
-        modified = TSTEP_RX.sub(replacement, template_text, count=1)
-        out.append((a, b, modified))
-    return out
-
-
-def process_folder(folder: Path, total_days: int,
-                   a_min: int, a_max: int, a_step: int, out_subdir: str) -> None:
-    """Создаёт набор .DATA-файлов с TSTEP=(a,b), где a∈[a_min..a_max] с шагом a_step и a+b=total_days."""
+    return [(a, total - a) for a in range(a_min, a_max + 1, a_step)]
+
+
+def parse_template(template_text: str) -> DeckTemplate:
+    # Ищем блок:
+    # TSTEP
+    #     X Y Z /
+    deck = DeckTemplate(template_text)
+    if len(deck.select("tstep")) < 3:
+        raise ValueError("В файле не найден корректный блок TSTEP с тремя числами.")
+    return deck
+
+
+def build_variations(template_text: str, total: int,
+                     a_min: int, a_max: int, a_step: int) -> List[Tuple[int, int, str]]:
+    """
+    Возвращает список (a, b, modified_text) для всех a ∈ [a_min, a_max] с шагом a_step,
+    при b = total - a. Меняется только первая строка после TSTEP, остальные данные неизменны.
+    """
+    windows = tstep_windows(total, a_min, a_max, a_step)
+    deck = parse_template(template_text)
+    return [(a, b, deck.render({"tstep": (a, b)})) for a, b in windows]
+
+
+# -------------------- задания пула --------------------------------------
+
+class TstepJob(NamedTuple):
+    root: Path
+    case: str           # путь выходного .DATA относительно root
+    src: Path
+    a: int
+    b: int
+    done_msg: str       # печатается после последнего файла папки
+    old: Optional[Dict[str, dict]] = None
+
+
+_decks: Dict[Path, DeckTemplate] = {}   # разобранные шаблоны (кэш процесса)
+
+
+def write_variant(job: TstepJob) -> CaseResult:
+    deck = _decks.get(job.src)
+    if deck is None:
+        deck = _decks[job.src] = parse_template(
+            job.src.read_text(encoding="utf-8", errors="ignore"))
+    text = deck.render({"tstep": (job.a, job.b)})
+    return write_case(job.root, job.case, {job.case: text}, job.old, job.done_msg)
+
+
+def folder_jobs(folder: Path, total_days: int, a_min: int, a_max: int, a_step: int,
+                out_subdir: str, dry_run: bool = False,
+                manifest: Optional[Manifest] = None, force: bool = False) -> Iterator[TstepJob]:
+    """
+    Задания на .DATA-файлы с TSTEP=(a,b), где a∈[a_min..a_max] с шагом a_step и a+b=total_days.
+    С манифестом файлы с теми же входами (шаблон, a, b) и нетронутые на диске пропускаются.
+    """
     src = find_base_data_file(folder)
     if not src:
         print(f"[Пропуск] {folder}: .DATA не найден.")
         return
 
-    text = src.read_text(encoding="utf-8", errors="ignore")
-    var_list = build_variations(text, total_days, a_min, a_max, a_step)
-
+    windows = tstep_windows(total_days, a_min, a_max, a_step)
     out_dir = folder / out_subdir if out_subdir else folder
-    out_dir.mkdir(exist_ok=True)
+    if not dry_run:
+        out_dir.mkdir(exist_ok=True)
 
-    n = 0
-    for a, b, new_text in var_list:
+    root = manifest.root if manifest is not None else folder
+    template_sha = file_digest(src) if manifest is not None else ""
+    for k, (a, b) in enumerate(windows, 1):
         out_file = out_dir / f"{src.stem}_TSTEP_{a:03}_{b:03}{src.suffix}"
-        out_file.write_text(new_text, encoding="utf-8")
-        n += 1
-
-    print(f"[OK] {folder.name}: создано {n} файлов в {out_dir}")
+        case = out_file.relative_to(root).as_posix()
+        done = f"[OK] {folder.name}: создано {k} файлов в {out_dir}" if k == len(windows) else ""
+        if manifest is None:
+            yield TstepJob(root, case, src, a, b, done)
+        elif manifest.plan(case, manifest.inputs(template_sha, {"a": a, "b": b}), force):
+            yield TstepJob(root, case, src, a, b, done, manifest.known(case))
 
 
 def main() -> None:
@@ -89,6 +121,8 @@ def main() -> None:
     ap.add_argument("--a-step", type=int, default=20, help="Шаг перебора первого числа (окна)")
     ap.add_argument("--out-subdir", default="",
                     help="Подкаталог для сохранения файлов (пусто = класть рядом с базовым .DATA)")
+    add_pool_args(ap)
+    add_manifest_args(ap)
 
     args = ap.parse_args()
 
@@ -99,12 +133,24 @@ def main() -> None:
     if not base_dir.is_dir():
         raise SystemExit(f"Каталог не найден: {base_dir}")
 
-    for bhp in range(args.bhp_start, args.bhp_stop + 1):
-        folder = base_dir / f"QINJ_{bhp:03d}"
-        if folder.is_dir():
-            process_folder(folder, args.total_days, args.a_min, args.a_max, args.a_step, args.out_subdir)
-        else:
-            print(f"[Пропуск] {folder}: папка отсутствует.")
+    manifest = Manifest(base_dir, GENERATOR)
+
+    def jobs():
+        # полный перебор BHP × окна TSTEP одной очередью на пул
+        for bhp in range(args.bhp_start, args.bhp_stop + 1):
+            folder = base_dir / f"QINJ_{bhp:03d}"
+            if folder.is_dir():
+                yield from folder_jobs(folder, args.total_days, args.a_min, args.a_max,
+                                       args.a_step, args.out_subdir, args.dry_run,
+                                       manifest, args.force)
+            else:
+                print(f"[Пропуск] {folder}: папка отсутствует.")
+
+    run_jobs(write_variant, jobs(), workers=args.workers, inflight=args.inflight,
+             dry_run=args.dry_run, describe=lambda j: f"{j.case}: a={j.a}, b={j.b}",
+             on_result=manifest.collect)
+    if not args.dry_run:
+        manifest.finish(args.prune)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,300 @@
+"""
+predictor_eval.py
+-----------------
+Офлайн-оценка стратегий начального приближения (src/simulator_linear_comb.jl)
+по сохранённым состояниям вместо полных перерасчётов.
+
+Сошедшиеся состояния принятых ministep'ов (output_substates=true) читаются
+из !logs/.../jutul_N.jld2 в массивы (T, …) по переменным (Pressure,
+Saturations); как и буфер :ministates в Julia, история идёт подряд через
+границы отчётных шагов. Каждая стратегия применяется сразу ко всем окнам
+из MAX_MINISTEP_HISTORY = 3 состояний:
+  • previous — последнее состояние (обычное приближение Jutul);
+  • lr, sma, broyden — веса из simulator_linear_comb.jl; aitken — Δ²;
+  • кандидаты: quadratic, regression (МНК-прямая по 3 точкам),
+    linear_dt и regression_dt — с учётом фактических dt ministep'ов;
+  • fitted — веса (сумма = 1), подобранные МНК по всем окнам
+    (нормальные уравнения 2×2 на приращениях, отдельно по переменным).
+
+Ошибка — относительно фактического следующего состояния: rel = ‖e‖ / ‖x_next − x_prev‖
+(< 1 — лучше, чем previous), RMSE, максимум |e| и доля окон, где стратегия
+точнее previous.
+
+    python predictor_eval.py D:\\runs\\QINJ_120 --json predictors.json
+    python predictor_eval.py D:\\runs --cache            # substates.npz рядом с логами
+    python predictor_eval.py --bench 5000               # синтетика, замер скорости
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+HISTORY = 3                              # MAX_MINISTEP_HISTORY
+VARIABLES = ("Pressure", "Saturations")
+CACHE_NAME = "substates.npz"
+EPS = np.finfo(np.float64).eps           # eps() в aitken_initial_guess
+
+# веса (x_{t-3}, x_{t-2}, x_{t-1}) как в nested_state_combination
+FIXED_WEIGHTS = {
+    "previous":   (0.0, 0.0, 1.0),
+    "lr":         (-0.5, 0.0, 1.5),
+    "sma":        (0.1, 0.3, 0.6),
+    "broyden":    (0.0, -1.0, 2.0),
+    "quadratic":  (1.0, -3.0, 3.0),
+    "regression": (-2 / 3, 1 / 3, 4 / 3),
+}
+
+
+class Case(NamedTuple):
+    name: str
+    dt: np.ndarray                   # (T,) сут — dt ministep'а, давшего состояние t
+    states: Dict[str, np.ndarray]    # переменная → (T, m) построчно развёрнутые состояния
+
+
+# -------------------- загрузка --------------------------------------
+
+def load_case(logs: Path, variables: Sequence[str] = VARIABLES, cache: bool = False) -> Case:
+    """Состояния всех принятых ministep'ов каталога логов одного кейса."""
+    from jutul_logs import accepted_dt_days, iter_substates, list_log_files
+
+    files = list_log_files(logs)
+    npz = logs / CACHE_NAME
+    if npz.is_file() and files and npz.stat().st_mtime >= max(p.stat().st_mtime for p in files):
+        z = np.load(npz)
+        states = {v: z[v] for v in variables if v in z.files}
+        if len(states) == len(variables):
+            return Case(str(logs), z["dt"], states)
+
+    rows: Dict[str, List[np.ndarray]] = {v: [] for v in variables}
+    dts: List[float] = []
+    for p in files:
+        subs = list(iter_substates(p, variables))
+        dt = accepted_dt_days(p)
+        if len(dt) != len(subs):
+            dt = [np.nan] * len(subs)        # только итоговые состояния шагов — без dt
+        for st in subs:
+            for v in variables:
+                rows[v].append(st[v].ravel())
+        dts += dt
+    states = {v: np.vstack(r) for v, r in rows.items() if r}
+    case = Case(str(logs), np.asarray(dts, dtype=np.float64), states)
+    if cache and states:
+        np.savez(npz, dt=case.dt, **states)
+    return case
+
+
+def find_logs(roots: Sequence[Path]) -> List[Path]:
+    dirs = set()
+    for root in roots:
+        dirs.update(p.parent for p in Path(root).rglob("jutul_*.jld2"))
+    return sorted(dirs)
+
+
+# -------------------- стратегии -------------------------------------
+
+def _windows(x: np.ndarray) -> tuple:
+    """x (T, m) → x1, x2, x3 (история) и цель x_next, все (T−3, m)."""
+    return x[:-3], x[1:-2], x[2:-1], x[3:]
+
+
+def _combine(w: np.ndarray, x1, x2, x3) -> np.ndarray:
+    if w.ndim == 1:
+        return w[0] * x1 + w[1] * x2 + w[2] * x3
+    return w[:, 0, None] * x1 + w[:, 1, None] * x2 + w[:, 2, None] * x3
+
+
+def aitken(x1, x2, x3) -> np.ndarray:
+    d1 = x2 - x1
+    d2 = x3 - x2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return x3 - d2 ** 2 / (d2 - d1 + EPS)
+
+
+def linear_dt_weights(dt: np.ndarray) -> np.ndarray:
+    """x3 + r (x3 − x2), r = dt_next / dt_prev."""
+    r = dt[3:] / dt[2:-1]
+    return np.stack([np.zeros_like(r), -r, 1 + r], axis=1)
+
+
+def regression_dt_weights(dt: np.ndarray) -> np.ndarray:
+    """МНК-прямая через (t1, x1), (t2, x2), (t3, x3) в момент t3 + dt_next."""
+    t1 = np.zeros(dt.size - 3)
+    t2 = dt[1:-2]
+    t3 = t2 + dt[2:-1]
+    tn = t3 + dt[3:]
+    t = np.stack([t1, t2, t3], axis=1)
+    tm = t.mean(axis=1, keepdims=True)
+    sxx = ((t - tm) ** 2).sum(axis=1, keepdims=True)
+    # прогноз = Σ_i x_i [1/3 + (t_i − t̄)(t_n − t̄)/Sxx]
+    return 1 / 3 + (t - tm) * (tn[:, None] - tm) / sxx
+
+
+Predictor = Callable[[np.ndarray, np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+
+def predictors(dt: np.ndarray) -> Dict[str, Predictor]:
+    out: Dict[str, Predictor] = {
+        name: (lambda x1, x2, x3, w=np.array(w): _combine(w, x1, x2, x3))
+        for name, w in FIXED_WEIGHTS.items()
+    }
+    out["aitken"] = aitken
+    if dt.size > HISTORY and np.all(np.isfinite(dt)) and np.all(dt > 0):
+        for name, w in (("linear_dt", linear_dt_weights(dt)),
+                        ("regression_dt", regression_dt_weights(dt))):
+            out[name] = lambda x1, x2, x3, w=w: _combine(w, x1, x2, x3)
+    return out
+
+
+# -------------------- накопление ошибок -----------------------------
+
+class Acc:
+    """Суммы по окнам всех кейсов для пары (стратегия, переменная)."""
+
+    __slots__ = ("sse", "ssd", "n", "max", "wins", "windows", "bad")
+
+    def __init__(self):
+        self.sse = self.ssd = 0.0
+        self.n = self.windows = self.wins = self.bad = 0
+        self.max = 0.0
+
+    def add(self, e: np.ndarray, d: np.ndarray) -> None:
+        bad = ~np.isfinite(e)
+        if bad.any():                        # Inf/NaN (aitken при d2 ≈ d1) — как previous
+            self.bad += int(bad.sum())
+            e = np.where(bad, -d, e)
+        se = np.einsum("ij,ij->i", e, e)
+        sd = np.einsum("ij,ij->i", d, d)
+        self.sse += float(se.sum())
+        self.ssd += float(sd.sum())
+        self.n += e.size
+        self.windows += e.shape[0]
+        self.wins += int((se < sd).sum())
+        self.max = max(self.max, float(np.abs(e).max(initial=0.0)))
+
+    def row(self) -> Dict[str, float]:
+        return {"rel": float(np.sqrt(self.sse / self.ssd)) if self.ssd > 0 else float("nan"),
+                "rmse": float(np.sqrt(self.sse / self.n)) if self.n else float("nan"),
+                "max_abs": self.max,
+                "wins": self.wins / self.windows if self.windows else float("nan"),
+                "windows": self.windows,
+                "nonfinite": self.bad / self.n if self.n else 0.0}
+
+
+class Fit:
+    """Нормальные уравнения для x_next − x3 = a (x3 − x2) + b (x2 − x1)."""
+
+    def __init__(self):
+        self.g = np.zeros((2, 2))
+        self.b = np.zeros(2)
+        self.yy = 0.0
+        self.n = 0
+
+    def add(self, x1, x2, x3, xn) -> None:
+        u, v, y = (x3 - x2).ravel(), (x2 - x1).ravel(), (xn - x3).ravel()
+        self.g += [[u @ u, u @ v], [u @ v, v @ v]]
+        self.b += [u @ y, v @ y]
+        self.yy += y @ y
+        self.n += y.size
+
+    def solve(self) -> tuple:
+        """→ веса (w1, w2, w3) и rel-ошибка на тех же окнах."""
+        ab = np.linalg.lstsq(self.g, self.b, rcond=None)[0]
+        sse = self.yy - 2 * ab @ self.b + ab @ self.g @ ab
+        a, b = ab
+        rel = float(np.sqrt(max(sse, 0.0) / self.yy)) if self.yy > 0 else float("nan")
+        return (-b, b - a, 1 + a), rel
+
+
+def evaluate(cases: Iterator[Case]) -> tuple:
+    acc: Dict[str, Dict[str, Acc]] = {}
+    fits: Dict[str, Fit] = {}
+    ncases = 0
+    for case in cases:
+        if not case.states or next(iter(case.states.values())).shape[0] <= HISTORY:
+            continue
+        ncases += 1
+        preds = predictors(case.dt)
+        for var, x in case.states.items():
+            x1, x2, x3, xn = _windows(x)
+            d = xn - x3
+            for name, fn in preds.items():
+                acc.setdefault(name, {}).setdefault(var, Acc()).add(fn(x1, x2, x3) - xn, d)
+            fits.setdefault(var, Fit()).add(x1, x2, x3, xn)
+    return acc, fits, ncases
+
+
+def report(acc, fits, ncases: int) -> dict:
+    out: dict = {"cases": ncases, "predictors": {}, "fitted": {}}
+    for name, per_var in acc.items():
+        out["predictors"][name] = {v: a.row() for v, a in per_var.items()}
+    for var, fit in fits.items():
+        w, rel = fit.solve()
+        out["fitted"][var] = {"weights": [float(x) for x in w], "rel": rel}
+    return out
+
+
+def print_report(rep: dict, variables: Sequence[str]) -> None:
+    key = variables[0]
+    rows = sorted(rep["predictors"].items(),
+                  key=lambda kv: kv[1].get(key, {}).get("rel", np.inf))
+    print(f"Кейсов: {rep['cases']}; rel < 1 — точнее предыдущего состояния")
+    head = "".join(f"{v + ' rel':>18}{'точнее':>8}" for v in variables)
+    print(f"{'стратегия':<14}{head}")
+    for name, per_var in rows:
+        cells = "".join(f"{per_var[v]['rel']:>18.4f}{per_var[v]['wins']:>8.0%}"
+                        if v in per_var else f"{'—':>18}{'':>8}" for v in variables)
+        bad = max(r["nonfinite"] for r in per_var.values())
+        print(f"{name:<14}{cells}" + (f"  (Inf/NaN в {bad:.2%} значений)" if bad else ""))
+    for var, f in rep["fitted"].items():
+        w = ", ".join(f"{x:.3f}" for x in f["weights"])
+        print(f"fitted {var}: веса [{w}], rel {f['rel']:.4f}")
+
+
+def synthetic_cases(n_states: int, n_cells: int = 2000, seed: int = 0) -> Iterator[Case]:
+    """Гладкие траектории с шумом — для замера скорости."""
+    rng = np.random.default_rng(seed)
+    dt = rng.uniform(5, 60, n_states)
+    t = np.cumsum(dt)[:, None] / 365
+    base = rng.uniform(200, 400, n_cells)
+    p = base + 30 * np.log1p(t) * rng.uniform(0.5, 1.5, n_cells) + rng.normal(0, 0.05, (n_states, n_cells))
+    sw = np.clip(0.1 + 0.7 * (1 - np.exp(-t * rng.uniform(0.1, 2, n_cells))), 0, 1)
+    yield Case("synthetic", dt, {"Pressure": p, "Saturations": np.hstack([sw, 1 - sw])})
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Офлайн-оценка стратегий начального приближения")
+    ap.add_argument("roots", nargs="*", type=Path, help="каталоги логов или корни с !logs")
+    ap.add_argument("--vars", nargs="+", default=list(VARIABLES), help="переменные состояния")
+    ap.add_argument("--cache", action="store_true",
+                    help="сохранять/использовать substates.npz рядом с логами")
+    ap.add_argument("--json", type=Path, default=None, help="отчёт в JSON")
+    ap.add_argument("--bench", type=int, default=0, metavar="N",
+                    help="синтетика из N состояний × 2000 ячеек")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    if args.bench:
+        cases = synthetic_cases(args.bench)
+        variables = list(VARIABLES)
+    else:
+        logs = find_logs(args.roots)
+        if not logs:
+            raise SystemExit("Логи jutul_N.jld2 не найдены.")
+        variables = args.vars
+        cases = (load_case(d, variables, args.cache) for d in logs)
+    acc, fits, n = evaluate(cases)
+    rep = report(acc, fits, n)
+    print_report(rep, variables)
+    print(f"за {time.perf_counter() - t0:.2f} с")
+    if args.json is not None:
+        args.json.write_text(json.dumps(rep, ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
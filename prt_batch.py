@@ -0,0 +1,125 @@
+"""
+prt_batch.py
+------------
+Сводка сходимости ECLIPSE по целому дереву кейсов:
+  • находит все *.PRT под корнем (run_XXX, edge_cases, BHP_XXX, …);
+  • разбирает их параллельно на пуле процессов (prt_stats.summarize);
+  • пишет одну таблицу: CSV + .npy (структурированный массив), по желанию Parquet;
+  • файлы с неизменными size/mtime берутся из предыдущей таблицы без разбора.
+
+    python prt_batch.py D:\\convergance_tests -j 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from case_pipeline import add_pool_args, run_jobs
+from prt_stats import summarize
+
+COLUMNS = ["case", "prt", "steps", "newton", "linear",
+           "max_newton", "max_linear", "size", "mtime_ns"]
+INT_COLUMNS = COLUMNS[2:]
+
+
+class PrtJob(NamedTuple):
+    path: Path
+    case: str
+    size: int
+    mtime_ns: int
+
+
+def parse_prt(job: PrtJob) -> Dict[str, object]:
+    s = summarize(job.path)
+    return {"case": job.case, "prt": job.path.name, **s._asdict(),
+            "size": job.size, "mtime_ns": job.mtime_ns}
+
+
+def load_table(csv_path: Path) -> Dict[str, Dict[str, object]]:
+    """Предыдущая сводка: ключ — путь PRT относительно корня."""
+    if not csv_path.is_file():
+        return {}
+    rows = {}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            for c in INT_COLUMNS:
+                r[c] = int(r[c])
+            rows[f"{r['case']}/{r['prt']}"] = r
+    return rows
+
+
+def write_table(rows: List[Dict[str, object]], csv_path: Path, parquet: bool) -> None:
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=COLUMNS)
+        w.writeheader()
+        w.writerows(rows)
+
+    width = max([len(str(r["case"])) for r in rows] + [1])
+    pwidth = max([len(str(r["prt"])) for r in rows] + [1])
+    dtype = [("case", f"U{width}"), ("prt", f"U{pwidth}")] + [(c, "i8") for c in INT_COLUMNS]
+    arr = np.array([tuple(r[c] for c in COLUMNS) for r in rows], dtype=dtype)
+    np.save(csv_path.with_suffix(".npy"), arr)
+
+    if parquet:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("pyarrow не установлен — Parquet пропущен.", file=sys.stderr)
+            return
+        table = pa.table({c: [r[c] for r in rows] for c in COLUMNS})
+        pq.write_table(table, csv_path.with_suffix(".parquet"))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Сводка итераций по всем *.PRT под корнем")
+    ap.add_argument("root", type=Path, help="корень со sweep-папками")
+    ap.add_argument("--out", "-o", type=Path, default=None,
+                    help="CSV сводки (по умолчанию <root>/prt_summary.csv)")
+    ap.add_argument("--parquet", action="store_true", help="дополнительно записать .parquet")
+    ap.add_argument("--force", action="store_true", help="разобрать все файлы заново")
+    add_pool_args(ap)
+    args = ap.parse_args(argv)
+
+    root = args.root.resolve()
+    if not root.is_dir():
+        sys.exit(f"Каталог не найден: {root}")
+    out_csv = (args.out or root / "prt_summary.csv").resolve()
+
+    cached = {} if args.force else load_table(out_csv)
+    rows: Dict[str, Dict[str, object]] = {}
+    jobs: List[PrtJob] = []
+    for path in sorted(p for p in root.rglob("*") if p.suffix.upper() == ".PRT" and p.is_file()):
+        rel = path.relative_to(root)
+        case = rel.parent.as_posix() if rel.parent != Path(".") else path.stem
+        st = path.stat()
+        key = f"{case}/{path.name}"
+        old = cached.get(key)
+        if old is not None and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            rows[key] = old
+        else:
+            jobs.append(PrtJob(path, case, st.st_size, st.st_mtime_ns))
+
+    print(f"PRT найдено: {len(rows) + len(jobs)}, без изменений: {len(rows)}, к разбору: {len(jobs)}")
+
+    def collect(r: Dict[str, object]) -> None:
+        rows[f"{r['case']}/{r['prt']}"] = r
+
+    run_jobs(parse_prt, jobs, workers=args.workers, inflight=args.inflight,
+             dry_run=args.dry_run, describe=lambda j: str(j.path), on_result=collect)
+    if args.dry_run:
+        return
+
+    ordered = [rows[k] for k in sorted(rows)]
+    write_table(ordered, out_csv, args.parquet)
+    print(f"Сводка: {out_csv} ({len(ordered)} строк)")
+
+
+if __name__ == "__main__":
+    main()
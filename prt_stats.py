@@ -0,0 +1,171 @@
+"""
+prt_stats.py
+------------
+Потоковый разбор ECLIPSE *.PRT:
+  • файл читается крупными бинарными блоками, память не зависит от размера PRT;
+  • строки без 'ITS)', 'LINIT=' и 'STEP' отсекаются одним проходом маркерной
+    регулярки по блоку — точные регулярки применяются только к найденным строкам;
+  • кроме общих сумм выдаются итерации по каждому шагу STEP.
+
+Строки LINIT, напечатанные до строки STEP, относятся к этому шагу
+(ECLIPSE печатает итерации шага перед его итоговой строкой).
+
+    python prt_stats.py --bench 200     # сравнение со старым it_count_ecl.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+CHUNK = 1 << 24
+
+re_its = re.compile(rb"\b(\d+)\s+ITS\)")
+re_linit = re.compile(rb"LINIT=\s*(\d+)\b")
+re_step = re.compile(rb"\bSTEP\s+(\d+)\b")
+re_marker = re.compile(rb"ITS\)|LINIT=|STEP")
+
+
+class StepStats(NamedTuple):
+    step: int       # номер из строки STEP
+    newton: int     # ITS
+    linear: int     # сумма LINIT за шаг
+
+
+class PrtSummary(NamedTuple):
+    steps: int
+    newton: int
+    linear: int
+    max_newton: int     # максимум за один STEP
+    max_linear: int
+
+
+def iter_lines(path: Path, chunk_size: int = CHUNK) -> Iterator[bytes]:
+    """Строки PRT, содержащие хотя бы один из маркеров ITS) / LINIT= / STEP."""
+    with open(path, "rb") as f:
+        tail = b""
+        while True:
+            buf = f.read(chunk_size)
+            if buf:
+                data = tail + buf
+                cut = data.rfind(b"\n") + 1
+                data, tail = data[:cut], data[cut:]
+            else:
+                data, tail = tail, b""
+
+            end = 0
+            for m in re_marker.finditer(data):
+                if m.start() < end:
+                    continue                    # второй маркер в той же строке
+                start = data.rfind(b"\n", 0, m.start()) + 1
+                end = data.find(b"\n", m.start())
+                if end < 0:
+                    end = len(data)
+                yield data[start:end]
+
+            if not buf:
+                return
+
+
+def iter_steps(path: Path, chunk_size: int = CHUNK) -> Iterator[StepStats]:
+    """Итерации по шагам STEP в порядке следования в файле."""
+    newton = linear = 0
+    for line in iter_lines(path, chunk_size):
+        if b"LINIT=" in line and (m := re_linit.search(line)):
+            linear += int(m.group(1))
+        if b"ITS)" in line and (m := re_its.search(line)):
+            newton += int(m.group(1))
+        if b"STEP" in line and (m := re_step.search(line)):
+            yield StepStats(int(m.group(1)), newton, linear)
+            newton = linear = 0
+
+
+def summarize(path: Path, chunk_size: int = CHUNK) -> PrtSummary:
+    """Общие суммы и максимумы по шагам (итерации после последнего STEP входят в суммы)."""
+    steps = newton = linear = max_newton = max_linear = 0
+    tail_newton = tail_linear = 0
+    for line in iter_lines(path, chunk_size):
+        if b"LINIT=" in line and (m := re_linit.search(line)):
+            tail_linear += int(m.group(1))
+        if b"ITS)" in line and (m := re_its.search(line)):
+            tail_newton += int(m.group(1))
+        if b"STEP" in line and re_step.search(line):
+            steps += 1
+            max_newton = max(max_newton, tail_newton)
+            max_linear = max(max_linear, tail_linear)
+            newton += tail_newton
+            linear += tail_linear
+            tail_newton = tail_linear = 0
+    return PrtSummary(steps, newton + tail_newton, linear + tail_linear, max_newton, max_linear)
+
+
+# -------------------- бенчмарк --------------------------------------
+
+def _count_legacy(path: Path) -> tuple:
+    """Прежний it_count_ecl.py: read_text + splitlines + три регулярки на строку."""
+    its_rx = re.compile(r"\b(\d+)\s+ITS\)")
+    linit_rx = re.compile(r"LINIT=\s*(\d+)\b")
+    step_rx = re.compile(r"\bSTEP\s+\d+\b")
+    newton = linear = steps = 0
+    for line in path.read_text(encoding="utf-8", errors="ignore").splitlines():
+        if m := its_rx.search(line):
+            newton += int(m.group(1))
+        if m := linit_rx.search(line):
+            linear += int(m.group(1))
+        if step_rx.search(line):
+            steps += 1
+    return newton, linear, steps
+
+
+def write_synthetic_prt(path: Path, size_mb: int, seed: int = 0) -> None:
+    rnd = random.Random(seed)
+    filler = [
+        " PAV=   400.0  BARSA  WCT=0.000 GOR=   0.00000 SM3/SM3 WGR=   0.0000 SM3/SM3",
+        " @--MESSAGE  AT TIME        0.0   DAYS    (15-JUN-2011):",
+        "  FIELD   TOTALS   1234.5   6789.0   0.0  0.0  0.0  0.0   12345678.9   0.0  0.0",
+        " :  PROD1    :    16, 43  :  OIL  :   123.4   56.7   0.0   0.0   0.0  395.0 :",
+    ]
+    limit = size_mb * 2**20
+    step = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while f.tell() < limit:
+            for it in range(rnd.randint(2, 6)):
+                f.write(f"  {it}  0  0.1E-02  0.3E-03 0.4E-02  0.1E-01  "
+                        f"LINIT=  {rnd.randint(3, 20)} NLINSMIN=  5 NLINSMAX=  7\n")
+            step += 1
+            f.write(f" STEP {step:4d} TIME=   {step:8.2f}  DAYS (  +1.0  DAYS INIT  "
+                    f"{rnd.randint(2, 9)} ITS) (16-JUN-2011)\n")
+            for _ in range(40):
+                f.write(rnd.choice(filler) + "\n")
+
+
+def benchmark(size_mb: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        prt = Path(tmp) / "SYNTH.PRT"
+        write_synthetic_prt(prt, size_mb)
+        print(f"Синтетический PRT: {os.path.getsize(prt) / 2**20:.0f} МБ")
+
+        t0 = time.perf_counter()
+        legacy = _count_legacy(prt)
+        t_legacy = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        s = summarize(prt)
+        t_stream = time.perf_counter() - t0
+
+    assert (s.newton, s.linear, s.steps) == legacy, (s, legacy)
+    print(f"  read_text/splitlines : {t_legacy:7.2f} с")
+    print(f"  потоковый разбор     : {t_stream:7.2f} с  (x{t_legacy / t_stream:.1f})")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser("Бенчмарк потокового разбора PRT")
+    ap.add_argument("--bench", type=int, default=200, metavar="MB",
+                    help="размер синтетического PRT, МБ")
+    benchmark(ap.parse_args().bench)
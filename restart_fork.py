@@ -0,0 +1,232 @@
+"""
+restart_fork.py
+---------------
+Перебор с общим началом расписания: кейсы BHP_XXX (new_data_bhp.py)
+совпадают до смены управления `DATES 15 JUN 2012` в schedule_test.inc,
+а run_bhp_parallel.jl считает этот первый год заново в каждом кейсе.
+
+  • колода раскладывается на отчётные шаги: часть до SCHEDULE (хэш) и для
+    каждого шага — хэш ключевых слов управления до него вместе с самим
+    продвижением времени (запись DATES или значение TSTEP). DATES на уже
+    достигнутую дату шага не образует, как и в симуляторе;
+  • кейсы с одинаковой частью до SCHEDULE и одинаковым initial_dt образуют
+    группу; ведущий кейс группы считается целиком, остальные — рестартом
+    Jutul со своего шага k + 1, где k — число общих шагов с ведущим:
+    логи jutul_1..k ведущего копируются в каталог кейса
+    (run_tstep_case.jl <DATA> <logs> <a> <логи ведущего> <k>), поэтому
+    сводки counter.jl / wasted_work совпадают с полным расчётом;
+  • упал ведущий — его группа считается полными расчётами.
+
+    python restart_fork.py D:\\runs\\bhp_sweep --dry-run        # группы и экономия
+    python restart_fork.py D:\\runs\\bhp_sweep -j 6
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from case_metrics import DATA_RX, case_record, default_sim, run_monitored, sim_argv, write_record
+from case_pipeline import add_pool_args, run_jobs
+from job_queue import logs_dir
+from result_cache import flatten_deck, split_schedule
+from schedule_variants import MONTHS
+
+DEFAULT_SIM = default_sim("data", "logs", "a", "prefix", "k")
+
+_START_RX = re.compile(r"\bSTART\s+(\d+)\s+'?([A-Za-z]{3})'?\s+(\d{4})", re.I)
+_KEYWORD_RX = re.compile(r"[A-Za-z][A-Za-z0-9_]*")
+_TOKEN_RX = re.compile(r"'[^']*'|/|[^\s/']+")
+_REPEAT_RX = re.compile(r"(\d+)\*(.+)")
+_MONTH = {m: i + 1 for i, m in enumerate(MONTHS)} | {"JLY": 7}
+
+
+class DeckSteps(NamedTuple):
+    head: str               # sha256 части колоды до SCHEDULE
+    steps: List[str]        # sha256 каждого отчётного шага
+    days: List[float]       # длительность шагов, сут
+
+
+def deck_date(tokens: Sequence[str]) -> dt.date:
+    """Дата записи DATES / START: `15 'JUN' 2012`."""
+    day, mon, year = (t.strip("'") for t in tokens[:3])
+    return dt.date(int(year), _MONTH[mon.upper()], int(day))
+
+
+def start_date(head_text: str) -> Optional[dt.date]:
+    m = _START_RX.search(head_text)
+    return deck_date(m.groups()) if m else None
+
+
+def deck_steps(path: Path) -> DeckSteps:
+    """Отчётные шаги колоды (INCLUDE подставлены, комментарии убраны)."""
+    text = flatten_deck(path.read_bytes(), path.parent).decode("utf-8", "replace")
+    head_text, schedule = split_schedule(text)
+    if not schedule:
+        raise ValueError(f"{path.name}: нет секции SCHEDULE")
+    head = hashlib.sha256(" ".join(head_text.split()).encode()).hexdigest()
+    now = start_date(head_text)
+
+    steps: List[str] = []
+    days: List[float] = []
+    chunk: List[str] = []
+    kw: Optional[str] = None
+    record: List[str] = []
+
+    def advance(token: str, length: float) -> None:
+        nonlocal chunk
+        chunk.append(token)
+        steps.append(hashlib.sha256("\0".join(chunk).encode()).hexdigest())
+        days.append(length)
+        chunk = []
+
+    for line in schedule.splitlines()[1:]:
+        stripped = line.strip()
+        if _KEYWORD_RX.fullmatch(stripped):
+            kw = stripped.upper()
+            chunk.append(kw)
+            record = []
+            continue
+        for tok in _TOKEN_RX.findall(line):
+            if kw == "DATES":
+                if tok != "/":
+                    record.append(tok)
+                    continue
+                if not record:                       # пустая запись — конец DATES
+                    kw = None
+                    continue
+                d = deck_date(record)
+                record = []
+                if now is None or d > now:
+                    advance(f"@{d.isoformat()}", (d - now).days if now else 0.0)
+                    now = d
+                else:
+                    chunk.append(f"={d.isoformat()}")   # дата уже достигнута
+            elif kw == "TSTEP":
+                if tok == "/":
+                    kw = None
+                    continue
+                rep = _REPEAT_RX.fullmatch(tok)
+                n, v = (int(rep.group(1)), float(rep.group(2))) if rep else (1, float(tok))
+                for _ in range(n):
+                    advance(f"+{v:g}", v)
+                    if now is not None:
+                        now += dt.timedelta(days=v)
+            else:
+                chunk.append(tok)
+    return DeckSteps(head, steps, days)
+
+
+def common_steps(a: Sequence[str], b: Sequence[str]) -> int:
+    k = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        k += 1
+    return k
+
+
+# -------------------- план ------------------------------------------
+
+class Fork(NamedTuple):
+    data: Path
+    a: int                  # initial_dt, сут
+    logs: Path
+    leader: Optional[Path]  # логи ведущего кейса; None — полный расчёт
+    k: int                  # общих шагов с ведущим
+    days: float             # всего суток расчёта
+    saved: float            # суток, взятых у ведущего
+
+
+def plan_forks(decks: Sequence[Path], initial_dt: int, min_steps: int = 1) -> List[Fork]:
+    """Ведущие и независимые кейсы — первыми, ведомые — после них."""
+    groups: Dict[tuple, List[tuple]] = {}
+    for data in sorted(decks):
+        m = DATA_RX.search(data.name)
+        a, b = (int(m.group(1)), int(m.group(2))) if m else (initial_dt, None)
+        st = deck_steps(data)
+        groups.setdefault((st.head, a), []).append((data, logs_dir(data, a if m else None, b), st))
+
+    leaders: List[Fork] = []
+    followers: List[Fork] = []
+    for (_, a), members in groups.items():
+        lead_data, lead_logs, lead = members[0]
+        leaders.append(Fork(lead_data, a, lead_logs, None, 0, sum(lead.days), 0.0))
+        for data, logs, st in members[1:]:
+            k = common_steps(lead.steps, st.steps)
+            if k < min_steps:
+                leaders.append(Fork(data, a, logs, None, 0, sum(st.days), 0.0))
+            else:
+                followers.append(Fork(data, a, logs, lead_logs, k, sum(st.days), sum(st.days[:k])))
+    return leaders + followers
+
+
+def run_fork(job: Fork, sim: str) -> Dict[str, object]:
+    leader, k = job.leader, job.k
+    if leader is not None and not all((leader / f"jutul_{i}.jld2").is_file()
+                                      for i in range(1, k + 1)):
+        leader, k = None, 0                # ведущий не досчитал — полный расчёт
+    fields = {"data": str(job.data), "logs": str(job.logs), "a": job.a,
+              "prefix": str(leader) if leader is not None else "", "k": k or ""}
+    cmd = sim_argv(sim, **fields)         # без ведущего prefix и k пустые — аргументов нет
+    log_path = job.logs.with_suffix(".log")
+    rc, res = run_monitored(cmd, job.data.parent, log_path)
+    rec = case_record(job.data, job.logs, log_path, rc, res,
+                      restart_from=str(leader) if leader is not None else "", restart_step=k)
+    write_record(job.logs, rec)
+    return rec
+
+
+def _run(job: tuple) -> Dict[str, object]:
+    return run_fork(*job)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Перебор с рестартом от общего начала расписания")
+    ap.add_argument("roots", nargs="+", type=Path, help="каталоги с кейсами или .DATA")
+    ap.add_argument("--glob", default="*.DATA", help="шаблон имён колод")
+    ap.add_argument("--initial-dt", type=int, default=365,
+                    help="initial_dt, сут, для колод без _TSTEP_a_b в имени")
+    ap.add_argument("--min-steps", type=int, default=1,
+                    help="рестарт, только если общих шагов не меньше")
+    ap.add_argument("--sim", default=DEFAULT_SIM,
+                    help="команда симулятора; подстановки {data} {logs} {a} {prefix} {k} "
+                         "(для полного расчёта prefix и k пустые и выпадают)")
+    add_pool_args(ap)
+    args = ap.parse_args(argv)
+
+    decks = []
+    for root in args.roots:
+        paths = [root] if root.is_file() else root.rglob(args.glob)
+        decks += [p.resolve() for p in paths if "!logs" not in p.parts]
+    if not decks:
+        raise SystemExit("Колоды не найдены.")
+    plan = plan_forks(decks, args.initial_dt, args.min_steps)
+    leaders = [f for f in plan if f.leader is None]
+    followers = [f for f in plan if f.leader is not None]
+    total = sum(f.days for f in plan)
+    saved = sum(f.saved for f in plan)
+    print(f"Кейсов: {len(plan)}, полных расчётов: {len(leaders)}, с рестартом: {len(followers)}; "
+          f"сэкономлено {saved:.0f} из {total:.0f} суток расчёта ({saved / max(total, 1):.0%})")
+
+    describe = (lambda f: f"{f.data.parent.name}/{f.data.name}" +
+                (f" ← шаг {f.k} из {f.leader}" if f.leader is not None else " (полный)"))
+
+    def report(rec: dict) -> None:
+        tag = f"рестарт с шага {rec['restart_step']}" if rec["restart_step"] else "полный"
+        print(f"{'✓' if rec['rc'] == 0 else '✗'} {rec['case']}/{rec['data']} "
+              f"({rec['wall']:.0f} с, {tag})")
+
+    # ведомым нужны логи ведущих — два этапа
+    for phase in (leaders, followers):
+        run_jobs(_run, [(f, args.sim) for f in phase], workers=args.workers,
+                 inflight=args.inflight, dry_run=args.dry_run,
+                 describe=lambda j: describe(j[0]), on_result=report, quiet=True)
+
+
+if __name__ == "__main__":
+    main()
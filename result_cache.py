@@ -0,0 +1,342 @@
+"""
+result_cache.py
+---------------
+Кэш результатов расчётов (логи Jutul *.jld2 и т.п.) по содержимому колоды:
+одинаковые .DATA из разных перекрывающихся переборов считаются один раз.
+
+Ключ — sha256 нормализованной колоды:
+  • комментарии `--…` и разница в пробелах/переводах строк не влияют;
+  • путь в INCLUDE заменяется хэшем содержимого включаемого файла, поэтому
+    'INCLUDE/ACTIVE.INC' (rewrite_include_line) и ACTIVE.INC дают один ключ,
+    а разные schedule_*.inc — разные;
+  • `tag` — версия настроек симулятора (смена настроек → новые ключи).
+
+Записи лежат в <cache>/<kk>/<key>/, время последнего использования — mtime
+каталога записи; при превышении --max-gb удаляются самые давно использованные.
+
+Связка с run_bhp_parallel.jl:
+    python result_cache.py restore D:\\runs --cache D:\\jutul_cache   # попадания → !logs/TSTEP_a_b
+    julia run_bhp_parallel.jl                                       # считает только промахи
+    python result_cache.py store   D:\\runs --cache D:\\jutul_cache
+
+В кэш попадают только завершённые расчёты: отметку .done (sha256 .DATA)
+пишет Julia после возврата simulate_reservoir (run_marks.jl); упавшие,
+недосчитанные и остановленные кейсы её не имеют. restore кладёт в
+.cache_key ключ и sha256 .DATA — Julia пересчитывает кейс, если колода
+после восстановления изменилась.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+CACHE_MARK = ".cache_key"            # в каталоге логов: логи восстановлены из кэша
+DONE_MARK = ".done"                  # в каталоге логов: расчёт завершён (run_marks.jl)
+META_NAME = "meta.json"
+DEFAULT_TAG = "jutul/1"
+DATA_RX = re.compile(r"_TSTEP_(\d+)_(\d+)\.DATA$", re.I)
+
+_COMMENT_RX = re.compile(rb"--[^\n]*")
+_INCLUDE_RX = re.compile(
+    rb"^[ \t]*INCLUDE\s+(?:'([^']*)'|\"([^\"]*)\"|([^\s'\"/]+(?:/[^\s'\"/]+)*))\s*/?",
+    re.M | re.I)
+_SCHEDULE_RX = re.compile(r"^[ \t]*SCHEDULE\b", re.M | re.I)
+_MAX_DEPTH = 8
+
+
+class Entry(NamedTuple):
+    key: str
+    path: Path
+    size: int
+    used: float          # mtime каталога записи
+
+
+# -------------------- ключ колоды -----------------------------------
+
+def _resolve_include(name: str, base: Path) -> Optional[Path]:
+    """Файл INCLUDE: как записан, затем по имени рядом с колодой и в INCLUDE/."""
+    rel = Path(name.replace("\\", "/"))
+    for cand in (base / rel, base / rel.name, base / "INCLUDE" / rel.name):
+        if cand.is_file():
+            return cand
+    # Windows-колоды не различают регистр (MDARCY.INC ↔ mDARCY.INC)
+    for folder in (base, base / "INCLUDE"):
+        if folder.is_dir():
+            for cand in folder.iterdir():
+                if cand.name.lower() == rel.name.lower() and cand.is_file():
+                    return cand
+    return None
+
+
+def normalize_deck(data: bytes, base: Path, _seen: Optional[Dict[Path, bytes]] = None,
+                   _depth: int = 0) -> bytes:
+    """Колода без комментариев, с одиночными пробелами и хэшами вместо путей INCLUDE."""
+    seen = {} if _seen is None else _seen
+    data = _COMMENT_RX.sub(b"", data)
+
+    def include(m: re.Match) -> bytes:
+        name = next(g for g in m.groups() if g is not None).decode("utf-8", "replace")
+        path = _resolve_include(name, base)
+        if path is None or _depth >= _MAX_DEPTH:
+            # файла нет — остаётся хотя бы имя без префикса каталога
+            return b"INCLUDE " + Path(name.replace("\\", "/")).name.upper().encode() + b" /"
+        path = path.resolve()
+        if path not in seen:
+            inner = normalize_deck(path.read_bytes(), path.parent, seen, _depth + 1)
+            seen[path] = hashlib.sha256(inner).hexdigest().encode()
+        return b"INCLUDE " + seen[path] + b" /"
+
+    data = _INCLUDE_RX.sub(include, data)
+    return b" ".join(data.split())
+
+
+def flatten_deck(data: bytes, base: Path, _depth: int = 0) -> bytes:
+    """Колода без комментариев, с подставленным содержимым INCLUDE (разбор по шагам)."""
+    data = _COMMENT_RX.sub(b"", data)
+
+    def include(m: re.Match) -> bytes:
+        name = next(g for g in m.groups() if g is not None).decode("utf-8", "replace")
+        path = _resolve_include(name, base)
+        if path is None or _depth >= _MAX_DEPTH:
+            return m.group(0)
+        return b"\n" + flatten_deck(path.read_bytes(), path.parent, _depth + 1) + b"\n"
+
+    return _INCLUDE_RX.sub(include, data)
+
+
+def rebase_includes(data: bytes, base: Path, dest: Path) -> bytes:
+    """
+    Пути INCLUDE колоды из каталога base — относительно каталога dest
+    (колода пишется в другое место). Ненайденный файл — ValueError.
+    """
+    def include(m: re.Match) -> bytes:
+        name = next(g for g in m.groups() if g is not None).decode("utf-8", "replace")
+        path = _resolve_include(name, base)
+        if path is None:
+            raise ValueError(f"не найден файл INCLUDE {name} (от {base})")
+        path = path.resolve()
+        try:
+            rel = os.path.relpath(path, dest.resolve())
+        except ValueError:
+            rel = str(path)                     # другой диск (Windows)
+        tail = b" /" if m.group(0).rstrip().endswith(b"/") else b""
+        return b"INCLUDE\n  '" + rel.replace("\\", "/").encode() + b"'" + tail
+
+    return _INCLUDE_RX.sub(include, data)
+
+
+def split_schedule(text: str) -> Tuple[str, str]:
+    """Плоская колода → (часть до SCHEDULE, секция SCHEDULE с ключевым словом)."""
+    m = _SCHEDULE_RX.search(text)
+    if m is None:
+        return text, ""
+    return text[:m.start()], text[m.start():]
+
+
+def deck_key(path: Path, tag: str = DEFAULT_TAG) -> str:
+    path = Path(path)
+    norm = normalize_deck(path.read_bytes(), path.parent)
+    h = hashlib.sha256(tag.encode() + b"\0")
+    h.update(norm)
+    return h.hexdigest()
+
+
+def deck_sha(path: Path) -> str:
+    """sha256 файла .DATA как есть (deck_sha в run_marks.jl)."""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def finished(logs: Path, deck: Path) -> bool:
+    """В logs — логи завершённого расчёта именно этой колоды."""
+    try:
+        return (logs / DONE_MARK).read_text(encoding="utf-8").strip() == deck_sha(deck)
+    except OSError:
+        return False
+
+
+def logs_dir_for(deck: Path) -> Optional[Path]:
+    """Каталог логов кейса, как в run_bhp_parallel.jl: <QINJ_XXX>/!logs/TSTEP_a_b."""
+    m = DATA_RX.search(deck.name)
+    if not m:
+        return None
+    return deck.parent / "!logs" / f"TSTEP_{int(m.group(1))}_{int(m.group(2))}"
+
+
+# -------------------- хранилище -------------------------------------
+
+def _tree_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _copy_files(src: Path, dst: Path) -> None:
+    dst.mkdir(parents=True, exist_ok=True)
+    for p in sorted(src.iterdir()):
+        if p.is_file() and p.name not in (CACHE_MARK, DONE_MARK, META_NAME):
+            shutil.copy2(p, dst / p.name)
+
+
+class ResultCache:
+    def __init__(self, root: Path, max_bytes: Optional[int] = None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> Optional[Path]:
+        """Каталог записи или None; попадание обновляет время использования (LRU)."""
+        path = self._entry(key)
+        if not (path / META_NAME).is_file():
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def restore(self, key: str, dst: Path, sha: str = "") -> bool:
+        """
+        Копирует результаты записи в dst (содержимое dst заменяется).
+        sha — sha256 .DATA, для которой восстановлены логи (см. run_marks.jl).
+        """
+        path = self.get(key)
+        if path is None:
+            return False
+        if dst.is_dir():
+            shutil.rmtree(dst)
+        _copy_files(path, dst)
+        (dst / CACHE_MARK).write_text(f"{key}\n{sha}\n", encoding="utf-8")
+        (dst / DONE_MARK).write_text(sha + "\n", encoding="utf-8")
+        return True
+
+    def put(self, key: str, src: Path, meta: Optional[dict] = None) -> Path:
+        """Кладёт файлы каталога src под ключом (атомарно: tmp + rename)."""
+        final = self._entry(key)
+        if (final / META_NAME).is_file():
+            return final
+        tmp = self.root / f".tmp_{key[:16]}_{os.getpid()}"
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        _copy_files(src, tmp)
+        info = {"key": key, "created": time.time(), "size": _tree_size(tmp), **(meta or {})}
+        (tmp / META_NAME).write_text(json.dumps(info, ensure_ascii=False), encoding="utf-8")
+        final.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(tmp, final)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)     # параллельный put успел раньше
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+        return final
+
+    def entries(self) -> Iterator[Entry]:
+        if not self.root.is_dir():
+            return
+        for meta in self.root.glob(f"??/*/{META_NAME}"):
+            try:
+                size = json.loads(meta.read_text(encoding="utf-8"))["size"]
+                used = meta.parent.stat().st_mtime
+            except (OSError, ValueError, KeyError):
+                continue
+            yield Entry(meta.parent.name, meta.parent, size, used)
+
+    def evict(self, max_bytes: int) -> Tuple[int, int]:
+        """Удаляет давно не использованные записи, пока объём > max_bytes. → (записей, байт)."""
+        entries = sorted(self.entries(), key=lambda e: e.used)
+        total = sum(e.size for e in entries)
+        n = freed = 0
+        for e in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(e.path, ignore_errors=True)
+            total -= e.size
+            freed += e.size
+            n += 1
+        return n, freed
+
+
+# -------------------- CLI -------------------------------------------
+
+def find_decks(root: Path) -> List[Path]:
+    return sorted(p for p in root.rglob("*.DATA") if DATA_RX.search(p.name))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Кэш результатов расчётов по содержимому колоды")
+    ap.add_argument("command", choices=("key", "lookup", "restore", "store", "stats", "evict"))
+    ap.add_argument("paths", nargs="*", type=Path,
+                    help="колоды .DATA (key/lookup) или корни переборов (restore/store)")
+    ap.add_argument("--cache", type=Path, default=Path.home() / ".jutul_result_cache",
+                    help="каталог кэша")
+    ap.add_argument("--max-gb", type=float, default=None, help="предельный объём кэша")
+    ap.add_argument("--tag", default=DEFAULT_TAG, help="версия настроек симулятора (входит в ключ)")
+    ap.add_argument("--misses", action="store_true", help="lookup: печатать только промахи")
+    args = ap.parse_args(argv)
+
+    max_bytes = None if args.max_gb is None else int(args.max_gb * 1024 ** 3)
+    cache = ResultCache(args.cache, max_bytes)
+
+    if args.command == "key":
+        for p in args.paths:
+            print(f"{deck_key(p, args.tag)}  {p}")
+
+    elif args.command == "lookup":
+        for p in args.paths:
+            hit = cache.get(deck_key(p, args.tag)) is not None
+            if not args.misses:
+                print(f"{'hit ' if hit else 'miss'}  {p}")
+            elif not hit:
+                print(p)
+
+    elif args.command == "restore":
+        for root in args.paths:
+            for deck in find_decks(root):
+                logs = logs_dir_for(deck)
+                if cache.restore(deck_key(deck, args.tag), logs, deck_sha(deck)):
+                    continue
+                # промах: логов из кэша здесь быть не должно — пусть считается заново
+                if logs.is_dir() and (logs / CACHE_MARK).is_file():
+                    (logs / CACHE_MARK).unlink()
+        print(f"Кэш: попаданий {cache.hits}, промахов (к расчёту) {cache.misses}")
+
+    elif args.command == "store":
+        n = skipped = 0
+        for root in args.paths:
+            for deck in find_decks(root):
+                logs = logs_dir_for(deck)
+                if not (logs.is_dir() and any(logs.glob("*.jld2"))):
+                    continue
+                if not finished(logs, deck):
+                    skipped += 1            # упал, не досчитан или колода с тех пор изменилась
+                    continue
+                key = deck_key(deck, args.tag)
+                if cache.get(key) is None:
+                    cache.put(key, logs, {"deck": deck.name, "case": deck.parent.name})
+                    n += 1
+        print(f"Добавлено в кэш: {n}; без отметки завершения {DONE_MARK} пропущено: {skipped}")
+
+    elif args.command == "evict":
+        if max_bytes is None:
+            raise SystemExit("Для evict нужен --max-gb.")
+        n, freed = cache.evict(max_bytes)
+        print(f"Удалено записей: {n}, освобождено {freed / 1e6:.1f} МБ")
+
+    else:
+        entries = list(cache.entries())
+        size = sum(e.size for e in entries)
+        print(f"{cache.root}: записей {len(entries)}, {size / 1e6:.1f} МБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -32,6 +32,9 @@ end
 
     using Jutul, JutulDarcy
     using JLD2, Printf, Dates
+    include(joinpath(@__DIR__, "deck_cache.jl"))   # setup_case_cached (deck_cache.py)
+    include(joinpath(@__DIR__, "telemetry.jl"))    # ENV JUTUL_TELEMETRY (telemetry_monitor.py)
+    include(joinpath(@__DIR__, "run_marks.jl"))    # .done / .cache_key (result_cache.py)
 
     const RUN_RX  = r"^QINJ_(\d{3})$"
     const DATA_RX = r"_TSTEP_(\d+)_(\d+)\.DATA$"
@@ -70,25 +73,39 @@ end
         rd, data_path, a, b = task.qinj_dir, task.data_path, task.a, task.b
         logs_dir = joinpath(rd, "!logs", "TSTEP_$(a)_$(b)")
         isdir(logs_dir) || mkpath(logs_dir)
-        for f in readdir(logs_dir; join=true)
-            isfile(f) && rm(f; force=true)
+        cached = cache_valid(logs_dir, data_path)   # из кэша и для этой же колоды
+        if !cached
+            for f in readdir(logs_dir; join=true)
+                isfile(f) && rm(f; force=true)
+            end
         end
 
         rows = Vector{Vector{String}}()
         try
-            case = setup_case_from_data_file(data_path)
-            simulate_reservoir(case;
-                info_level               = 0,
-                output_substates         = true,
-                output_path              = logs_dir,
-                timesteps                = :none,
-                initial_dt               = a*day,
-                max_nonlinear_iterations = 15,
-                timestep_max_increase    = 100.0,
-                timestep_max_decrease    = 0.01,
-                max_timestep             = 365day*5,
-                min_timestep             = 1e-6
-            )
+            if !cached
+                case = setup_case_cached(data_path)
+                tel = telemetry_open(joinpath(basename(rd), basename(data_path)))
+                try
+                    simulate_reservoir(case;
+                        info_level               = 0,
+                        output_substates         = true,
+                        output_path              = logs_dir,
+                        timesteps                = :none,
+                        initial_dt               = a*day,
+                        max_nonlinear_iterations = 15,
+                        timestep_max_increase    = 100.0,
+                        timestep_max_decrease    = 0.01,
+                        max_timestep             = 365day*5,
+                        min_timestep             = 1e-6,
+                        post_ministep_hook       = telemetry_hook(tel)
+                    )
+                catch err
+                    telemetry_close(tel, false, sprint(showerror, err))
+                    rethrow()
+                end
+                telemetry_close(tel, true)
+                mark_done(logs_dir, data_path)
+            end
 
             logs = list_log_files(logs_dir)
             for lf in logs
@@ -0,0 +1,30 @@
+# ============================================================
+# run_marks.jl
+# Отметки в каталоге логов кейса (result_cache.py):
+#   .done       — simulate_reservoir вернулся без исключения; внутри
+#                 sha256 .DATA, по которой считались логи;
+#   .cache_key  — логи восстановлены из кэша: ключ кэша и sha256
+#                 .DATA на момент восстановления.
+# result_cache.py store берёт в кэш только каталоги с .done от
+# текущей колоды; логи из кэша считаются готовыми, только если
+# sha256 в .cache_key совпадает с нынешней .DATA.
+# ============================================================
+using SHA
+
+const DONE_MARK  = ".done"
+const CACHE_MARK = ".cache_key"
+
+deck_sha(data_path::AbstractString) = bytes2hex(open(sha256, data_path))
+
+function mark_done(logs_dir::AbstractString, data_path::AbstractString)
+    write(joinpath(logs_dir, DONE_MARK), deck_sha(data_path) * "\n")
+    return nothing
+end
+
+# логи в logs_dir восстановлены из кэша для этой же колоды
+function cache_valid(logs_dir::AbstractString, data_path::AbstractString)
+    mark = joinpath(logs_dir, CACHE_MARK)
+    isfile(mark) || return false
+    lines = split(strip(read(mark, String)), '\n')
+    return length(lines) >= 2 && strip(lines[2]) == deck_sha(data_path)
+end
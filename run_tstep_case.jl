@@ -0,0 +1,87 @@
+# ============================================================
+# run_tstep_case.jl
+# Один кейс *_TSTEP_a_b.DATA с теми же настройками, что
+# simulate_one_case в run_bhp_parallel.jl. Вызывается из
+# tstep_search.py (и других Python-драйверов) как процесс:
+#   julia run_tstep_case.jl <DATA> <logs_dir> <a>
+# Логи jutul_N.jld2 → <logs_dir>; код выхода 0 = успех, тогда же
+# в <logs_dir> пишется .done (run_marks.jl).
+# Время фаз печатается строками `@phase <имя> <с>` (case_metrics.py).
+# ENV MS_GUESS (original | lr | sma | broyden | aitken) подключает
+# JutulMiniStepPatch с этой стратегией; пусто / baseline — чистый Jutul.
+# ENV JUTUL_TELEMETRY — поток попыток ministep'ов (telemetry.jl).
+# Рестарт (restart_fork.py):
+#   julia run_tstep_case.jl <DATA> <logs_dir> <a> <prefix_logs> <k>
+# jutul_1..k берутся из логов кейса с тем же началом расписания,
+# расчёт продолжается с шага k + 1.
+# ============================================================
+const T_START = time()
+
+using Pkg
+Pkg.activate(joinpath(@__DIR__, "original_env"); shared=false)
+
+using Jutul, JutulDarcy
+include(joinpath(@__DIR__, "deck_cache.jl"))   # setup_case_cached (deck_cache.py)
+include(joinpath(@__DIR__, "telemetry.jl"))    # ENV JUTUL_TELEMETRY (telemetry_monitor.py)
+include(joinpath(@__DIR__, "run_marks.jl"))    # .done (result_cache.py)
+
+const GUESS = get(ENV, "MS_GUESS", "baseline")
+if GUESS != "baseline" && GUESS != ""
+    include(joinpath(@__DIR__, "src", "simulator_linear_comb.jl"))
+    using .JutulMiniStepPatch
+end
+
+phase(name, t) = (println("@phase ", name, " ", round(t; digits=3)); flush(stdout))
+phase("load", time() - T_START)
+
+const day = si_unit(:day)
+
+function main(args)
+    length(args) in (3, 5) ||
+        error("usage: julia run_tstep_case.jl <DATA> <logs_dir> <a> [<prefix_logs> <k>]")
+    data_path, logs_dir = args[1], args[2]
+    a = parse(Int, args[3])
+
+    isdir(logs_dir) || mkpath(logs_dir)
+    for f in readdir(logs_dir; join=true)
+        isfile(f) && rm(f; force=true)
+    end
+
+    restart = false
+    if length(args) == 5
+        prefix_logs, k = args[4], parse(Int, args[5])
+        # копии, не жёсткие ссылки: перезапуск ведущего не должен менять логи кейса
+        for i in 1:k
+            cp(joinpath(prefix_logs, "jutul_$(i).jld2"), joinpath(logs_dir, "jutul_$(i).jld2"); force=true)
+        end
+        restart = k + 1
+    end
+
+    t_setup = @elapsed case = setup_case_cached(data_path)
+    phase("setup", t_setup)
+    tel = telemetry_open(joinpath(basename(dirname(abspath(data_path))), basename(data_path)))
+    t_sim = try
+        @elapsed simulate_reservoir(case;
+            info_level               = 0,
+            output_substates         = true,
+            output_path              = logs_dir,
+            restart                  = restart,
+            timesteps                = :none,
+            initial_dt               = a*day,
+            max_nonlinear_iterations = 15,
+            timestep_max_increase    = 100.0,
+            timestep_max_decrease    = 0.01,
+            max_timestep             = 365day*5,
+            min_timestep             = 1e-6,
+            post_ministep_hook       = telemetry_hook(tel)
+        )
+    catch err
+        telemetry_close(tel, false, sprint(showerror, err))
+        rethrow()
+    end
+    telemetry_close(tel, true)
+    mark_done(logs_dir, data_path)
+    phase("simulate", t_sim)
+end
+
+main(ARGS)
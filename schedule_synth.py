@@ -0,0 +1,281 @@
+"""
+schedule_synth.py
+-----------------
+Полный SCHEDULE с изменением управления скважинами во времени вместо одного
+блока DATES + WCONPROD в schedule_test.inc (и подбора разбиения TSTEP,
+чтобы имитировать смены режимов).
+
+Управление задаётся компактной таблицей «даты × скважины» (ControlTable):
+режим (BHP, ORAT, …, RATE для нагнетательных), значение и ограничение
+по BHP. Источник — длинный CSV, где указываются только изменения:
+
+    date,well,control,value,limit
+    2012-06-15,PROD1,BHP,395,
+    2012-06-15,INJECT1,RATE,79.5,420
+    2013-01-01,PROD1,ORAT,120,380
+
+Незаданные ячейки наследуют предыдущее значение скважины. В колоду попадают
+только даты, на которых что-то изменилось, и только изменившиеся скважины:
+DATES, затем WCONPROD и/или WCONINJE — каждое ключевое слово один раз на
+дату, без повторов неизменных записей. Последняя дата таблицы сохраняется
+всегда (длина расчёта), --report-all оставляет все даты отчётными шагами
+(подряд идущие даты без изменений — одним DATES).
+
+    python schedule_synth.py controls.csv -o INCLUDE\\schedule_multi.inc
+    python schedule_synth.py controls.npz -o schedule.inc --report-all
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import re
+from pathlib import Path
+from typing import Dict, IO, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from schedule_variants import MONTHS, WRITE_BUFFER
+
+# режимы управления: добывающие (WCONPROD, item 3) и нагнетательные (WCONINJE, item 4)
+PROD_CONTROLS = ("BHP", "ORAT", "WRAT", "GRAT", "LRAT", "RESV")
+INJ_CONTROLS = ("RATE", "RESV", "BHP")
+CONTROLS = ("BHP", "ORAT", "WRAT", "GRAT", "LRAT", "RESV", "RATE")
+# номер item'а с целевым значением режима; BHP-ограничение — item 9 / item 7
+PROD_ITEM = {"ORAT": 4, "WRAT": 5, "GRAT": 6, "LRAT": 7, "RESV": 8, "BHP": 9}
+INJ_ITEM = {"RATE": 5, "RESV": 6, "BHP": 7}
+PROD_BHP_ITEM, INJ_BHP_ITEM = 9, 7
+
+
+class ControlTable(NamedTuple):
+    dates: np.ndarray       # datetime64[D], (n,) по возрастанию
+    wells: List[str]
+    mode: np.ndarray        # int8 (n, w): индекс в CONTROLS, -1 — не задано
+    value: np.ndarray       # float64 (n, w)
+    limit: np.ndarray       # float64 (n, w): BHP-ограничение, NaN — по умолчанию
+
+
+def read_csv(path: Path) -> ControlTable:
+    """Длинный CSV date,well,control,value[,limit] → разреженная таблица."""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise ValueError(f"{path}: пустая таблица управления.")
+    dates = np.unique(np.array([r["date"].strip() for r in rows], dtype="datetime64[D]"))
+    wells = list(dict.fromkeys(r["well"].strip().upper() for r in rows))
+    col = {w: j for j, w in enumerate(wells)}
+    n, w = len(dates), len(wells)
+    mode = np.full((n, w), -1, np.int8)
+    value = np.full((n, w), np.nan)
+    limit = np.full((n, w), np.nan)
+
+    row_idx = np.searchsorted(dates, np.array([r["date"].strip() for r in rows],
+                                              dtype="datetime64[D]"))
+    for i, r in zip(row_idx, rows):
+        ctrl = r["control"].strip().upper()
+        if ctrl not in CONTROLS:
+            raise ValueError(f"{path}: неизвестный режим {ctrl} ({r['well']}, {r['date']})")
+        j = col[r["well"].strip().upper()]
+        mode[i, j] = CONTROLS.index(ctrl)
+        value[i, j] = float(r["value"])
+        if (r.get("limit") or "").strip():
+            limit[i, j] = float(r["limit"])
+    return ControlTable(dates, wells, mode, value, limit)
+
+
+def load(path: Path) -> ControlTable:
+    if path.suffix.lower() == ".npz":
+        z = np.load(path, allow_pickle=False)
+        return ControlTable(z["dates"].astype("datetime64[D]"), [str(s) for s in z["wells"]],
+                            z["mode"].astype(np.int8), z["value"], z["limit"])
+    return read_csv(path)
+
+
+def save_npz(table: ControlTable, path: Path) -> None:
+    np.savez_compressed(path, dates=table.dates, wells=np.array(table.wells),
+                        mode=table.mode, value=table.value, limit=table.limit)
+
+
+def forward_fill(table: ControlTable) -> ControlTable:
+    """Незаданные ячейки (mode = -1) наследуют последнее заданное управление скважины."""
+    n, w = table.mode.shape
+    spec = table.mode >= 0
+    src = np.where(spec, np.arange(n)[:, None], -1)
+    np.maximum.accumulate(src, axis=0, out=src)
+    cols = np.broadcast_to(np.arange(w), (n, w))
+    known = src >= 0
+    take = np.where(known, src, 0)
+    mode = np.where(known, table.mode[take, cols], -1).astype(np.int8)
+    value = np.where(known, table.value[take, cols], np.nan)
+    limit = np.where(known, table.limit[take, cols], np.nan)
+    return table._replace(mode=mode, value=value, limit=limit)
+
+
+def _differs(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a != b) & ~(np.isnan(a) & np.isnan(b))
+
+
+def changes(table: ControlTable) -> np.ndarray:
+    """bool (n, w): на этой дате у скважины новое управление (таблица — после forward_fill)."""
+    ch = table.mode >= 0
+    ch[1:] &= ((table.mode[1:] != table.mode[:-1])
+               | _differs(table.value[1:], table.value[:-1])
+               | _differs(table.limit[1:], table.limit[:-1]))
+    return ch
+
+
+# -------------------- запись ----------------------------------------
+
+def _num(v: float) -> str:
+    return f"{v:.10g}"
+
+
+def format_record(items: Dict[int, str]) -> str:
+    """{1: "'P1'", 3: "'BHP'", 9: '395'} → "'P1' 1* 'BHP' 5* 395 /" (пропуски — N*)."""
+    out, pos = [], 1
+    for it in sorted(items):
+        if it > pos:
+            out.append(f"{it - pos}*")
+        out.append(items[it])
+        pos = it + 1
+    return " ".join(out) + " /"
+
+
+def prod_record(well: str, ctrl: str, value: float, limit: float) -> str:
+    items = {1: f"'{well}'", 2: "'OPEN'", 3: f"'{ctrl}'", PROD_ITEM[ctrl]: _num(value)}
+    if ctrl != "BHP" and not np.isnan(limit):
+        items[PROD_BHP_ITEM] = _num(limit)
+    return format_record(items)
+
+
+def inj_record(well: str, ctrl: str, value: float, limit: float, fluid: str) -> str:
+    items = {1: f"'{well}'", 2: f"'{fluid}'", 3: "'OPEN'", 4: f"'{ctrl}'",
+             INJ_ITEM[ctrl]: _num(value)}
+    if ctrl != "BHP" and not np.isnan(limit):
+        items[INJ_BHP_ITEM] = _num(limit)
+    return format_record(items)
+
+
+def _date(d: np.datetime64) -> str:
+    y, m, day = str(d).split("-")
+    return f" {int(day)} {MONTHS[int(m) - 1]} {y} /\n"
+
+
+class SynthStats(NamedTuple):
+    dates: int              # дат в таблице
+    emitted_dates: int      # дат в колоде
+    records: int            # записей WCONPROD/WCONINJE
+    dense_records: int      # записей при выводе каждой скважины на каждой дате
+
+
+def write_schedule(table: ControlTable, out: IO[str], injectors: str = r"^INJ",
+                   fluid: str = "WATER", report_all: bool = False,
+                   start: Optional[np.datetime64] = None) -> SynthStats:
+    """
+    SCHEDULE-секция в поток `out`. `injectors` — regex имён нагнетательных
+    скважин; `start` — дата START колоды: управление на эту дату пишется без DATES.
+    """
+    table = forward_fill(table)
+    ch = changes(table)
+    n = len(table.dates)
+    is_inj = np.array([re.search(injectors, w, re.I) is not None for w in table.wells], bool)
+    for j, w in enumerate(table.wells):
+        allowed = INJ_CONTROLS if is_inj[j] else PROD_CONTROLS
+        used = {CONTROLS[m] for m in np.unique(table.mode[:, j]) if m >= 0}
+        if used - set(allowed):
+            kind = "нагнетательной" if is_inj[j] else "добывающей"
+            raise ValueError(f"Режим {', '.join(sorted(used - set(allowed)))} недопустим "
+                             f"для {kind} скважины {w}.")
+
+    emit = ch.any(axis=1)
+    if n:
+        emit[-1] = True                     # длина расчёта
+    if report_all:
+        emit[:] = True
+
+    pending: List[str] = []                 # даты без изменений — копятся в один DATES
+    records = emitted = 0
+    for i in np.flatnonzero(emit):
+        d = table.dates[i]
+        if not (start is not None and d == start):
+            pending.append(_date(d))
+        row = np.flatnonzero(ch[i])
+        if not len(row) and i != n - 1:
+            continue
+        if pending:
+            out.write("DATES\n" + "".join(pending) + "/\n\n")
+            emitted += len(pending)
+            pending = []
+        prod = [j for j in row if not is_inj[j]]
+        inj = [j for j in row if is_inj[j]]
+        if prod:
+            out.write("WCONPROD\n" + "".join(
+                f"    {prod_record(table.wells[j], CONTROLS[table.mode[i, j]], table.value[i, j], table.limit[i, j])}\n"
+                for j in prod) + "/\n\n")
+        if inj:
+            out.write("WCONINJE\n" + "".join(
+                f"    {inj_record(table.wells[j], CONTROLS[table.mode[i, j]], table.value[i, j], table.limit[i, j], fluid)}\n"
+                for j in inj) + "/\n\n")
+        records += len(row)
+    dense = int((table.mode >= 0).sum())
+    return SynthStats(n, emitted, records, dense)
+
+
+def synthetic_table(n_dates: int, wells: Sequence[str], change_prob: float = 0.05,
+                    seed: int = 0) -> ControlTable:
+    """Случайная таблица для замеров: редкие смены BHP / RATE."""
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64("2012-01-01") + np.arange(n_dates) * 7
+    w = len(wells)
+    inj = np.array([name.upper().startswith("INJ") for name in wells])
+    mode = np.where(rng.random((n_dates, w)) < change_prob, 0, -1).astype(np.int8)
+    mode[0] = 0
+    mode[:, inj] = np.where(mode[:, inj] >= 0, CONTROLS.index("RATE"), -1)
+    value = np.where(inj, rng.uniform(50, 120, (n_dates, w)).round(1),
+                     rng.uniform(350, 420, (n_dates, w)).round(0))
+    value[mode < 0] = np.nan
+    return ControlTable(dates, list(wells), mode, value, np.full((n_dates, w), np.nan))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("SCHEDULE из таблицы управления скважинами")
+    ap.add_argument("table", type=Path, nargs="?", help="CSV (date,well,control,value[,limit]) или .npz")
+    ap.add_argument("--out", "-o", type=Path, default=None, help="schedule .inc (по умолчанию рядом с таблицей)")
+    ap.add_argument("--injectors", default=r"^INJ", help="regex имён нагнетательных скважин")
+    ap.add_argument("--fluid", default="WATER", help="закачиваемый флюид WCONINJE")
+    ap.add_argument("--start", default=None, help="дата START колоды (YYYY-MM-DD)")
+    ap.add_argument("--report-all", action="store_true", help="оставить все даты таблицы")
+    ap.add_argument("--npz", type=Path, default=None, help="сохранить таблицу в .npz")
+    ap.add_argument("--bench", type=int, default=0, metavar="N",
+                    help="замер на синтетической таблице из N дат × 12 скважин")
+    args = ap.parse_args(argv)
+
+    if args.bench:
+        import io
+        import time
+
+        wells = [f"PROD{i}" for i in range(1, 5)] + [f"INJECT{i}" for i in range(1, 9)]
+        table = synthetic_table(args.bench, wells)
+        t0 = time.perf_counter()
+        buf = io.StringIO()
+        st = write_schedule(table, buf)
+        dt = time.perf_counter() - t0
+        print(f"{st.dates} дат × {len(wells)} скважин: {st.emitted_dates} дат, {st.records} записей "
+              f"(плотно {st.dense_records}), {len(buf.getvalue()) / 2**10:.0f} КБ за {dt:.3f} с")
+        return
+    if args.table is None:
+        ap.error("нужна таблица управления (или --bench)")
+
+    table = load(args.table)
+    if args.npz is not None:
+        save_npz(table, args.npz)
+    out = args.out or args.table.with_name(f"schedule_{args.table.stem}.inc")
+    start = np.datetime64(args.start, "D") if args.start else None
+    with open(out, "w", encoding="utf-8", newline="\n", buffering=WRITE_BUFFER) as f:
+        st = write_schedule(table, f, args.injectors, args.fluid, args.report_all, start)
+    print(f"{out}: дат {st.emitted_dates} из {st.dates}, записей {st.records} "
+          f"(при полном выводе {st.dense_records})")
+
+
+if __name__ == "__main__":
+    main()
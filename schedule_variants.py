@@ -0,0 +1,268 @@
+"""
+schedule_variants.py
+--------------------
+Варианты schedule-файла (schedule_test.inc) за один разбор шаблона вместо
+re.sub по всему тексту на каждое значение (help.schedule, new_data_bhp):
+  • шаблон разбирается один раз (DeckTemplate): BHP и ORAT в WCONPROD,
+    RATE в WCONINJE (поле qinj), даты DATES; `поле@СКВАЖИНА` — цель
+    одной скважины (bhp@PROD2);
+  • варианты — перебор одного поля (--field, --start/--stop/--step или
+    --values) либо спецификация sweep.py по нескольким полям;
+  • запись потоком: файлы в каталог (один буферизованный write на файл,
+    число файлов считается при записи) или все варианты в один zip —
+    без тысяч мелких файлов на общем диске.
+
+Даты задаются строкой: '2012-06-15' или '15 JUN 2012'; несколько записей
+DATES — через ';' (по порядку записей в шаблоне).
+
+    python schedule_variants.py INCLUDE\\schedule_test.inc --field orat --start 180 --stop 5 --step -5 -o INCLUDE\\generated
+    python schedule_variants.py schedule_test.inc --spec sweeps\\bhp_wells.toml --archive schedules.zip
+    python schedule_variants.py schedule_test.inc --list
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import os
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from deck_patch import FIELDS, DeckTemplate
+
+# поля, которые имеют смысл в schedule-файле
+SCHEDULE_FIELDS = ("bhp", "orat", "qinj", "dates")
+MONTHS = ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC")
+WRITE_BUFFER = 1 << 20
+
+
+def date_tokens(value: object) -> List[str]:
+    """'2012-06-15; 15 DEC 2012' → ['15', 'JUN', '2012', '15', 'DEC', '2012']."""
+    if isinstance(value, (dt.date, dt.datetime)):
+        value = value.isoformat()[:10]
+    out: List[str] = []
+    for part in str(value).split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            d = dt.date.fromisoformat(part)
+            out += [str(d.day), MONTHS[d.month - 1], str(d.year)]
+        else:
+            day, mon, year = part.replace("'", "").split()
+            if mon.upper() not in MONTHS + ("JLY",):
+                raise ValueError(f"Неизвестный месяц в дате: {part}")
+            out += [str(int(day)), mon.upper(), str(int(year))]
+    return out
+
+
+class ScheduleTemplate(DeckTemplate):
+    """DeckTemplate schedule-файла; даты DATES принимаются строками (date_tokens)."""
+
+    def render(self, values: Mapping[str, object]) -> str:
+        vals = {k: (date_tokens(v) if k.partition("@")[0] == "dates" else v)
+                for k, v in values.items()}
+        return super().render(vals)
+
+    def controls(self) -> Dict[str, List[str]]:
+        """Поле (и поле@скважина) → текущие значения в шаблоне."""
+        out: Dict[str, List[str]] = {}
+        for name in SCHEDULE_FIELDS:
+            idx = self.select(name)
+            if not idx:
+                continue
+            out[name] = [self._tokens[i] for i in idx]
+            wells = dict.fromkeys(self.slots[i].well for i in idx if self.slots[i].well)
+            if len(wells) > 1:
+                for w in wells:
+                    out[f"{name}@{w}"] = [self._tokens[i] for i in self.select(f"{name}@{w}")]
+        return out
+
+
+def variant_name(values: Mapping[str, object], prefix: str = "schedule") -> str:
+    """{'orat': 120} → schedule_ORAT_120.inc (как у прежних генераторов)."""
+    parts = []
+    for field, v in values.items():
+        name, _, well = field.partition("@")
+        label = name.upper() + (f"-{well.upper()}" if well else "")
+        if name == "dates":
+            v = "_".join(str(x).strip().replace(" ", "") for x in str(v).split(";"))
+        elif isinstance(v, int) or (isinstance(v, float) and v.is_integer()):
+            v = f"{int(v):03d}"
+        parts.append(f"{label}_{v}")
+    return f"{prefix}_{'_'.join(parts)}.inc"
+
+
+def render_variants(tmpl: ScheduleTemplate, variants: Iterable[Mapping[str, object]],
+                    prefix: str = "schedule") -> Iterator[Tuple[str, str]]:
+    """Ленивый поток (имя файла, текст); шаблон уже разобран."""
+    for values in variants:
+        yield variant_name(values, prefix), tmpl.render(values)
+
+
+# -------------------- запись ----------------------------------------
+
+class Sink:
+    """Приёмник вариантов: write(имя, текст), считает файлы и байты."""
+
+    count = 0
+    bytes = 0
+
+    def write(self, name: str, text: str) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def abort(self) -> None:
+        """Запись прервана исключением; по умолчанию — как close()."""
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class DirSink(Sink):
+    """Каждый вариант — отдельный файл в каталоге."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def write(self, name: str, text: str) -> None:
+        data = text.encode("utf-8")
+        with open(self.root / name, "wb", buffering=WRITE_BUFFER) as f:
+            f.write(data)
+        self.count += 1
+        self.bytes += len(data)
+
+
+class ZipSink(Sink):
+    """Все варианты — члены одного zip; архив появляется целиком в конце (tmp → replace)."""
+
+    def __init__(self, path: Path, compress: bool = True):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._zip = zipfile.ZipFile(self._tmp, "w",
+                                    zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED)
+
+    def write(self, name: str, text: str) -> None:
+        data = text.encode("utf-8")
+        self._zip.writestr(name, data)
+        self.count += 1
+        self.bytes += len(data)
+
+    def close(self) -> None:
+        if self._zip is None:
+            return
+        self._zip.close()
+        self._zip = None
+        os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        """Недописанный архив удаляется, прежний self.path не трогается."""
+        if self._zip is None:
+            return
+        self._zip.close()
+        self._zip = None
+        self._tmp.unlink(missing_ok=True)
+
+
+def write_variants(tmpl: ScheduleTemplate, variants: Iterable[Mapping[str, object]],
+                   sink: Sink, prefix: str = "schedule") -> int:
+    with sink:
+        for name, text in render_variants(tmpl, variants, prefix):
+            sink.write(name, text)
+    return sink.count
+
+
+def read_variant(archive: Path, name: str) -> str:
+    """Один вариант из архива (для генераторов кейсов / распаковки на узле)."""
+    with zipfile.ZipFile(archive) as zf:
+        return zf.read(name).decode("utf-8")
+
+
+def _number(text: str) -> object:
+    for conv in (int, float):
+        try:
+            return conv(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _range(start: float, stop: float, step: float) -> List[float]:
+    """start..stop включительно, шаг может быть отрицательным."""
+    if step == 0:
+        raise SystemExit("--step не может быть 0.")
+    n = int((stop - start) / step + 1e-9) + 1
+    return [start + i * step for i in range(max(n, 0))]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Варианты schedule-файла из шаблона")
+    ap.add_argument("template", type=Path, help="шаблон schedule_test.inc")
+    ap.add_argument("--field", default="bhp",
+                    help=f"поле ({', '.join(SCHEDULE_FIELDS)}), можно поле@СКВАЖИНА")
+    ap.add_argument("--start", type=float, default=None)
+    ap.add_argument("--stop", type=float, default=None, help="включительно")
+    ap.add_argument("--step", type=float, default=1)
+    ap.add_argument("--values", nargs="+", default=None, help="явный список значений поля")
+    ap.add_argument("--spec", type=Path, default=None,
+                    help="спецификация перебора sweep.py (имена параметров — поля)")
+    ap.add_argument("--out", "-o", type=Path, default=None, help="каталог для файлов")
+    ap.add_argument("--archive", type=Path, default=None, help="писать все варианты в один zip")
+    ap.add_argument("--store", action="store_true", help="zip без сжатия")
+    ap.add_argument("--prefix", default="schedule", help="префикс имён файлов")
+    ap.add_argument("--list", action="store_true", help="показать управляемые поля шаблона")
+    args = ap.parse_args(argv)
+
+    tmpl = ScheduleTemplate(args.template.read_text(encoding="utf-8", errors="ignore"))
+    if args.list:
+        for field, vals in tmpl.controls().items():
+            print(f"{field:<14} {' '.join(vals)}")
+        return
+
+    if args.spec is not None:
+        from sweep import Sweep
+
+        sweep = Sweep.from_file(args.spec)
+        variants: Iterable[Mapping[str, object]] = sweep
+        fields = sweep.names
+    else:
+        if args.values is not None:
+            vals: List[object] = [_number(v) for v in args.values]
+        elif args.start is not None and args.stop is not None:
+            vals = [int(v) if float(v).is_integer() else round(v, 6)
+                    for v in _range(args.start, args.stop, args.step)]
+        else:
+            raise SystemExit("Нужны --values, --start/--stop или --spec.")
+        variants = ({args.field: v} for v in vals)
+        fields = [args.field]
+    for f in fields:
+        if f.partition("@")[0] not in FIELDS:
+            raise SystemExit(f"Неизвестное поле: {f}")
+        if not tmpl.select(f):
+            raise SystemExit(f"В шаблоне нет значений для поля '{f}' "
+                             f"(есть: {', '.join(tmpl.controls()) or 'ничего'}).")
+
+    if args.archive is not None:
+        sink: Sink = ZipSink(args.archive, compress=not args.store)
+        where = args.archive
+    else:
+        where = args.out or args.template.parent / "generated"
+        sink = DirSink(where)
+    n = write_variants(tmpl, variants, sink, args.prefix)
+    print(f"{n} файлов создано ({sink.bytes / 2**20:.1f} МБ) → {where}")
+
+
+if __name__ == "__main__":
+    main()
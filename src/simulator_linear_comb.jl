@@ -16,6 +16,12 @@ import Jutul: simulator_storage, solve_ministep,
 
 const MAX_MINISTEP_HISTORY = 3
 
+# Стратегия начального приближения: ENV["MS_GUESS"] при загрузке модуля
+# (original | lr | sma | broyden | aitken), по умолчанию broyden — лучшая
+# в таблице README. Можно менять и на лету: GUESS_STRATEGY[] = :sma.
+const GUESS_STRATEGIES = (:original, :lr, :sma, :broyden, :aitken)
+const GUESS_STRATEGY = Ref(Symbol(get(ENV, "MS_GUESS", "broyden")))
+
 
 function nested_state_combination(hist::Vector{Dict{Symbol,Any}},
     w::AbstractVector)
@@ -60,6 +66,19 @@ using LinearAlgebra
 is_numeric(x) = x isa Number ||
                 (x isa AbstractArray && eltype(x) <: Number)
 
+function initial_guess(hist::Vector{Dict{Symbol,Any}}, strategy::Symbol)
+    if strategy == :lr
+        return nested_state_combination(hist, [-0.5, 0.0, 1.5])
+    elseif strategy == :sma
+        return nested_state_combination(hist, [0.1, 0.3, 0.6])
+    elseif strategy == :broyden
+        return nested_state_combination(hist, [0.0, -1.0, 2.0])
+    elseif strategy == :aitken
+        return aitken_initial_guess(hist)
+    end
+    error("Unknown MS_GUESS strategy $strategy; expected one of $(GUESS_STRATEGIES)")
+end
+
 # 4. Aitken’s Δ²‐acceleration
 function aitken_initial_guess(hist::Vector{Dict{Symbol,Any}})
     s1, s2, s3 = hist
@@ -181,20 +200,8 @@ function solve_ministep(sim, dt, forces, max_iter, cfg;
     end
 
     # ─────────────────────────────────────────────────────────────────────
-    if length(hist) == MAX_MINISTEP_HISTORY
-        # w_lr = [-0.5, 0.0, 1.5] 
-        # guess_state = nested_state_combination(hist, w_lr)
-
-        w_diff = [0.0, -1.0, 2.0] #broyden (best)
-        guess_state = nested_state_combination(hist, w_diff)
-
-        # w_sma = [0.1, 0.3, 0.6]
-        # guess_state = nested_state_combination(hist, w_sma)
-
-        # guess_state = aitken_initial_guess(hist)
-
-        # guess_state = broyden_initial_guess(hist)
-
+    if length(hist) == MAX_MINISTEP_HISTORY && GUESS_STRATEGY[] != :original
+        guess_state = initial_guess(hist, GUESS_STRATEGY[])
 
         last_state = hist[end]
         key = :Pressure
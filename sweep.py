@@ -0,0 +1,239 @@
+"""
+sweep.py
+--------
+Декларативное описание перебора параметров (TOML, или YAML при наличии PyYAML)
+вместо сеток, зашитых в скрипты-генераторы.
+
+Планы (design):
+  • factorial — полный перебор `values` всех параметров;
+  • oat       — база + отклонения по одному параметру (ends_only = только min/max);
+  • lhs       — латинский гиперкуб на [min, max];
+  • sobol     — последовательность Соболя (нужен SciPy).
+
+Кейсы выдаются лениво (генератор), одинаковые наборы параметров
+отбрасываются до записи файлов: factorial повторов не даёт (уровни
+параметра очищаются от дублей), для остальных планов и проекций tuples()
+просмотренные точки хранятся 8-байтными хэшами — в памяти до _SEEN_LIMIT,
+дальше во временной SQLite на диске. lhs держит перестановки n × d (int32),
+т. е. O(n·d) памяти; sobol — O(d) на блок. Готовые спецификации — в sweeps/. Пример:
+
+    design = "factorial"
+    [params.bhp]
+    values = [350, 440]
+    [params.so]
+    min = 0.80
+    max = 0.98
+    step = 0.02
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import sqlite3
+import tempfile
+import tomllib
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+DESIGNS = ("factorial", "oat", "lhs", "sobol")
+# порядок полей в кортежах генераторов сеток (см. case_pipeline.build_grid_cases)
+GRID_ORDER = ("bhp", "skin", "qinj", "so", "p_init")
+_BATCH = 4096
+_SEEN_LIMIT = 1 << 20        # хэшей в памяти, дальше — на диске
+
+
+class Param(NamedTuple):
+    name: str
+    values: List[object]        # дискретные уровни (factorial / oat)
+    base: Optional[object]      # базовое значение (oat)
+    lo: Optional[float]         # диапазон (lhs / sobol)
+    hi: Optional[float]
+    step: Optional[float]       # квантование диапазона
+    digits: int                 # округление, если step не задан
+
+
+def _param(name: str, d: dict) -> Param:
+    values = list(d.get("values", []))
+    if not values and "min" in d and "max" in d and "step" in d:
+        # уровни из диапазона: min, min+step, …, max
+        n = int(round((d["max"] - d["min"]) / d["step"])) + 1
+        values = [_snap(d["min"] + i * d["step"], d["min"], d["step"], d.get("digits", 6))
+                  for i in range(n)]
+    lo = d.get("min", min(values) if values else None)
+    hi = d.get("max", max(values) if values else None)
+    if lo is None or hi is None:
+        raise ValueError(f"Параметр {name}: нужны values или min/max.")
+    return Param(name, values, d.get("base"), lo, hi, d.get("step"), d.get("digits", 6))
+
+
+def _snap(v: float, lo, step, digits: int):
+    if isinstance(lo, int) and isinstance(step, int):
+        return int(round(v))
+    return round(float(v), digits)
+
+
+def load_spec(path: Path) -> dict:
+    path = Path(path)
+    if path.suffix.lower() in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise SystemExit("Для YAML-спецификаций нужен PyYAML (pip install pyyaml).")
+        return yaml.safe_load(path.read_text(encoding="utf-8"))
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+class _Seen:
+    """Множество просмотренных точек: хэши в памяти, сверх limit — в SQLite на диске."""
+
+    def __init__(self, limit: int = _SEEN_LIMIT):
+        self.limit = limit
+        self.mem = set()
+        self.db: Optional[sqlite3.Connection] = None
+        self._dir: Optional[tempfile.TemporaryDirectory] = None
+
+    def add(self, point: tuple) -> bool:
+        """True, если точка новая."""
+        h = int.from_bytes(hashlib.blake2b(repr(point).encode(), digest_size=8).digest(),
+                           "big", signed=True)
+        if h in self.mem:
+            return False
+        if len(self.mem) < self.limit:
+            self.mem.add(h)
+            return True
+        if self.db is None:
+            self._dir = tempfile.TemporaryDirectory(prefix="sweep_seen_")
+            self.db = sqlite3.connect(Path(self._dir.name) / "seen.sqlite")
+            self.db.execute("CREATE TABLE seen (h INTEGER PRIMARY KEY)")
+        return self.db.execute("INSERT OR IGNORE INTO seen VALUES (?)", (h,)).rowcount == 1
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
+            self._dir.cleanup()
+            self.db = None
+
+
+class Sweep:
+    """Ленивый перебор кейсов по спецификации; `duplicates` — сколько повторов отброшено."""
+
+    def __init__(self, spec: dict):
+        self.design = spec.get("design", "factorial")
+        if self.design not in DESIGNS:
+            raise ValueError(f"Неизвестный design: {self.design} (допустимо {', '.join(DESIGNS)})")
+        self.params = [_param(name, d) for name, d in spec.get("params", {}).items()]
+        if not self.params:
+            raise ValueError("В спецификации нет параметров [params.*].")
+        self.samples = int(spec.get("samples", 0))
+        self.seed = spec.get("seed")
+        self.ends_only = bool(spec.get("ends_only", False))
+        self.duplicates = 0
+
+        if self.design in ("factorial", "oat"):
+            for p in self.params:
+                if not p.values:
+                    raise ValueError(f"Параметр {p.name}: для {self.design} нужны values.")
+        if self.design == "oat":
+            for p in self.params:
+                if p.base is None and len(p.values) != 1:
+                    raise ValueError(f"Параметр {p.name}: для oat нужен base.")
+        if self.design in ("lhs", "sobol") and self.samples <= 0:
+            raise ValueError(f"Для {self.design} нужен samples > 0.")
+
+    @classmethod
+    def from_file(cls, path: Path) -> "Sweep":
+        return cls(load_spec(path))
+
+    @property
+    def names(self) -> List[str]:
+        return [p.name for p in self.params]
+
+    def __iter__(self) -> Iterator[Dict[str, object]]:
+        self.duplicates = 0
+        points = getattr(self, f"_{self.design}")()
+        if self.design == "factorial":            # повторов нет — без учёта просмотренных
+            for point in points:
+                yield dict(zip(self.names, point))
+            return
+        seen = _Seen()
+        try:
+            for point in points:
+                if not seen.add(point):
+                    self.duplicates += 1
+                    continue
+                yield dict(zip(self.names, point))
+        finally:
+            seen.close()
+
+    def tuples(self, order: Sequence[str] = GRID_ORDER) -> Iterator[tuple]:
+        missing = set(order) - set(self.names)
+        if missing:
+            raise ValueError(f"В спецификации нет параметров: {', '.join(sorted(missing))}")
+        full = sorted(order) == sorted(self.names)
+        # проекция на часть параметров тоже может давать повторы
+        seen = None if full and self.design == "factorial" else _Seen()
+        try:
+            for case in self:
+                t = tuple(case[k] for k in order)
+                if seen is not None and not seen.add(t):
+                    self.duplicates += 1
+                    continue
+                yield t
+        finally:
+            if seen is not None:
+                seen.close()
+
+    # -------------------- планы --------------------------------------
+
+    def _factorial(self) -> Iterator[tuple]:
+        # повторы уровней убираются заранее — произведение их уже не даёт
+        levels = [list(dict.fromkeys(p.values)) for p in self.params]
+        self.duplicates = (int(np.prod([len(p.values) for p in self.params]))
+                           - int(np.prod([len(v) for v in levels])))
+        return itertools.product(*levels)
+
+    def _oat(self) -> Iterator[tuple]:
+        base = tuple(p.values[0] if p.base is None else p.base for p in self.params)
+        yield base
+        for i, p in enumerate(self.params):
+            levels = [min(p.values), max(p.values)] if self.ends_only else p.values
+            for v in levels:
+                if v != base[i]:
+                    yield base[:i] + (v,) + base[i + 1:]
+
+    def _scale(self, u: np.ndarray) -> Iterator[tuple]:
+        """Точки из [0,1)^d → значения параметров (с квантованием по step/digits)."""
+        cols = []
+        for j, p in enumerate(self.params):
+            x = p.lo + u[:, j] * (p.hi - p.lo)
+            if p.step:
+                x = p.lo + np.round((x - p.lo) / p.step) * p.step
+                x = np.clip(x, p.lo, p.hi)
+            cols.append([_snap(v, p.lo, p.step, p.digits) for v in x.tolist()])
+        return zip(*cols)
+
+    def _lhs(self) -> Iterator[tuple]:
+        rng = np.random.default_rng(self.seed)
+        n, d = self.samples, len(self.params)
+        # по перестановке на измерение (int32) — сами точки строятся блоками
+        perms = [rng.permutation(n).astype(np.int32) for _ in range(d)]
+        for lo in range(0, n, _BATCH):
+            hi = min(n, lo + _BATCH)
+            u = np.column_stack([(perm[lo:hi] + rng.random(hi - lo)) / n for perm in perms])
+            yield from self._scale(u)
+
+    def _sobol(self) -> Iterator[tuple]:
+        try:
+            from scipy.stats import qmc
+        except ImportError:
+            raise SystemExit("Для design = \"sobol\" нужен SciPy (pip install scipy).")
+        sampler = qmc.Sobol(len(self.params), scramble=True, seed=self.seed)
+        left = self.samples
+        while left > 0:
+            k = min(_BATCH, left)
+            yield from self._scale(sampler.random(k))
+            left -= k
@@ -0,0 +1,114 @@
+# ============================================================
+# telemetry.jl
+# Поток попыток ministep'ов идущего расчёта для telemetry_monitor.py.
+# ENV JUTUL_TELEMETRY:
+#   <каталог>        — строки в <каталог>/<кейс>.<pid>.ndjson (файл на
+#                      запуск, перезаписывается), сигнал остановки —
+#                      файл <кейс>.<pid>.abort рядом;
+#   tcp://host:port  — строки в сокет, остановка — строка `abort …`
+#                      от монитора;
+#   пусто            — телеметрии нет, хук missing.
+# Строка NDJSON на попытку (post_ministep_hook Jutul):
+#   {"case":…,"pid":…,"n":…,"t":…,"dt":…,"its":…,"ok":…}
+# Запуск монитор различает по паре (case, pid).
+# dt и t (модельное время после принятых шагов) — в сутках, its —
+# линеаризаций в попытке. Первая строка — "event":"start" с wall,
+# последняя — "event":"end" (telemetry_close).
+# Остановка монитором — исключение TelemetryAbort из хука: расчёт
+# падает как обычно (FAIL_CASE в run_bhp_parallel.jl).
+# ============================================================
+using Sockets
+
+struct TelemetryAbort <: Exception
+    reason::String
+end
+Base.showerror(io::IO, e::TelemetryAbort) = print(io, "остановлен монитором: ", e.reason)
+
+mutable struct Telemetry
+    io::IO
+    case::String
+    abort_path::Union{String, Nothing}     # файловый режим
+    n::Int
+    t::Float64
+    reason::Union{String, Nothing}         # сокет: причина из строки `abort …`
+end
+
+_json(s::AbstractString) = "\"" * replace(s, "\\" => "\\\\", "\"" => "\\\"",
+                                         "\n" => "\\n", "\r" => "\\r", "\t" => "\\t") * "\""
+
+function _emit(tel::Telemetry, fields::AbstractString)
+    try
+        println(tel.io, "{\"case\":", _json(tel.case), ",\"pid\":", getpid(), ",", fields, "}")
+        flush(tel.io)
+    catch err
+        err isa Base.IOError || rethrow()      # монитор закрыл сокет — считаем дальше
+    end
+end
+
+function telemetry_open(case::AbstractString)
+    dest = get(ENV, "JUTUL_TELEMETRY", "")
+    isempty(dest) && return nothing
+    m = match(r"^tcp://([^:/]+):(\d+)/?$", dest)
+    tel = if m !== nothing
+        _listen!(Telemetry(connect(m.captures[1], parse(Int, m.captures[2])), case, nothing,
+                           0, 0.0, nothing))
+    else
+        isdir(dest) || mkpath(dest)
+        stem = joinpath(dest, replace(case, r"[\\/:]" => "__") * ".$(getpid())")
+        rm("$(stem).abort"; force=true)
+        Telemetry(open("$(stem).ndjson", "w"), case, "$(stem).abort", 0, 0.0, nothing)
+    end
+    _emit(tel, "\"event\":\"start\",\"wall\":$(time())")
+    return tel
+end
+
+# Сокет сам не читается: bytesavailable видит только уже буферизованное.
+# Задача-читатель ставит сокет на чтение и ждёт строку `abort …`; цикл
+# событий libuv крутится, пока хук ждёт flush записи в _emit.
+function _listen!(tel::Telemetry)
+    @async try
+        while !eof(tel.io)
+            line = readline(tel.io)
+            if startswith(line, "abort")
+                tel.reason = String(strip(line[6:end]))
+                break
+            end
+        end
+    catch err
+        err isa Base.IOError || err isa EOFError ||
+            @warn "telemetry: чтение сокета монитора прервано" exception=err
+    end
+    return tel
+end
+
+function _abort_reason(tel::Telemetry)
+    if tel.abort_path !== nothing
+        isfile(tel.abort_path) || return nothing
+        return strip(read(tel.abort_path, String))
+    end
+    yield()                                # дать задаче-читателю разобрать пришедшее
+    return tel.reason
+end
+
+telemetry_hook(::Nothing) = missing
+
+function telemetry_hook(tel::Telemetry)
+    return function (success, report, sim, dt, forces, max_iter, cfg)
+        tel.n += 1
+        d = dt / 86400
+        success && (tel.t += d)
+        _emit(tel, "\"n\":$(tel.n),\"t\":$(tel.t),\"dt\":$(d)," *
+                   "\"its\":$(length(report[:steps])),\"ok\":$(success)")
+        reason = _abort_reason(tel)
+        reason === nothing || throw(TelemetryAbort(reason))
+        return (success, report)
+    end
+end
+
+telemetry_close(::Nothing, ok::Bool, msg::AbstractString = "") = nothing
+
+function telemetry_close(tel::Telemetry, ok::Bool, msg::AbstractString = "")
+    _emit(tel, "\"event\":\"end\",\"ok\":$(ok),\"msg\":$(_json(msg)),\"wall\":$(time())")
+    close(tel.io)
+    return nothing
+end
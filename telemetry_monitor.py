@@ -0,0 +1,361 @@
+"""
+telemetry_monitor.py
+--------------------
+Монитор идущих расчётов по телеметрии telemetry.jl (ENV JUTUL_TELEMETRY):
+все кейсы читаются одновременно (asyncio), раз в --report секунд печатается
+сводка по перебору, безнадёжные кейсы останавливаются, не дожидаясь
+исчерпания max_nonlinear_iterations / min_timestep — ядра уходят живым.
+
+Источник:
+  • каталог — <кейс>.<pid>.ndjson, файл на запуск, новые файлы
+    подхватываются на лету; остановка — файл <кейс>.<pid>.abort с причиной;
+  • --listen host:port — расчёты подключаются по TCP, остановка —
+    строка `abort <причина>` в их соединение.
+Кейс видит сигнал после ближайшей попытки ministep'а и падает с
+TelemetryAbort (в run_bhp_parallel.jl — строка FAIL_CASE). Застрявшему
+в одной попытке расчёту через --kill-after секунд посылается SIGTERM
+по pid из строк телеметрии (в run_bhp_parallel.jl это воркер Distributed).
+
+Запуск — пара (case, pid): одноимённые кейсы разных процессов считаются
+отдельно, строка start того же процесса начинает новый запуск. Файлы,
+записанные до старта монитора, дочитываются как история: по ним
+считается сводка, но правила к ним не применяются, пока от запуска не
+придёт новая строка.
+
+Правила расходимости (0 — правило выключено):
+  --max-cuts N       N срезанных попыток подряд;
+  --min-dt D         попытка с dt < D сут;
+  --fail-rate F/W    доля срезанных среди последних W попыток > F;
+  --stall S          S секунд без продвижения модельного времени.
+
+    set JUTUL_TELEMETRY=D:\\telemetry
+    python telemetry_monitor.py D:\\telemetry --max-cuts 6 --min-dt 1e-4
+    python telemetry_monitor.py --listen 127.0.0.1:7070     # JUTUL_TELEMETRY=tcp://127.0.0.1:7070
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+SUFFIX = ".ndjson"
+ABORT_SUFFIX = ".abort"
+
+Key = Tuple[str, Optional[int]]     # (case, pid)
+
+
+class Rules(NamedTuple):
+    max_cuts: int = 6           # срезов подряд
+    min_dt: float = 0.0         # сут
+    fail_rate: float = 0.0      # доля срезов в окне
+    window: int = 20
+    stall: float = 0.0          # с без продвижения модельного времени
+
+
+class CaseState:
+    """Счётчики одного запуска кейса по его строкам телеметрии."""
+
+    def __init__(self, case: str, pid: Optional[int] = None):
+        self.case = case
+        self.pid = pid
+        self.live = False                       # были строки после старта монитора
+        self.attempts = self.accepted = self.its = self.wasted_its = 0
+        self.cuts_in_row = 0
+        self.t = 0.0                            # модельное время, сут
+        self.recent: Deque[bool] = deque()
+        self.progress_wall = time.time()
+        self.ended = False
+        self.ok: Optional[bool] = None
+        self.msg = ""
+        self.abort: Optional[str] = None        # причина, если остановлен монитором
+        self.abort_wall = 0.0
+        self.killed = False
+
+    def update(self, rec: dict, window: int) -> None:
+        event = rec.get("event")
+        if event == "start":
+            self.progress_wall = time.time()
+            return
+        if event == "end":
+            self.ended, self.ok, self.msg = True, bool(rec.get("ok")), rec.get("msg", "")
+            return
+        ok = bool(rec["ok"])
+        self.attempts += 1
+        self.its += int(rec.get("its", 0))
+        self.recent.append(ok)
+        if len(self.recent) > window:
+            self.recent.popleft()
+        if ok:
+            self.accepted += 1
+            self.cuts_in_row = 0
+            if rec["t"] > self.t:
+                self.t = float(rec["t"])
+                self.progress_wall = time.time()
+        else:
+            self.cuts_in_row += 1
+            self.wasted_its += int(rec.get("its", 0))
+
+    def row(self) -> dict:
+        return {"case": self.case, "pid": self.pid, "attempts": self.attempts, "accepted": self.accepted,
+                "its": self.its, "wasted_its": self.wasted_its, "t_days": self.t,
+                "ok": self.ok, "abort": self.abort, "msg": self.msg}
+
+
+def diverging(st: CaseState, rules: Rules, last_dt: Optional[float] = None,
+              now: Optional[float] = None) -> Optional[str]:
+    """Причина остановки кейса по правилам или None."""
+    if rules.max_cuts and st.cuts_in_row >= rules.max_cuts:
+        return f"{st.cuts_in_row} срезов шага подряд"
+    if rules.min_dt and last_dt is not None and last_dt < rules.min_dt:
+        return f"dt = {last_dt:.3g} сут < {rules.min_dt:g}"
+    if rules.fail_rate and len(st.recent) >= rules.window:
+        rate = 1 - sum(st.recent) / len(st.recent)
+        if rate > rules.fail_rate:
+            return f"срезано {rate:.0%} из последних {len(st.recent)} попыток"
+    if rules.stall and now is not None and now - st.progress_wall > rules.stall:
+        return f"нет продвижения {now - st.progress_wall:.0f} с (t = {st.t:.1f} сут)"
+    return None
+
+
+# -------------------- монитор ---------------------------------------
+
+class Monitor:
+    def __init__(self, rules: Rules, dry_run: bool = False, kill_after: float = 0.0):
+        self.rules = rules
+        self.dry_run = dry_run
+        self.kill_after = kill_after
+        self.cases: Dict[Key, CaseState] = {}
+        self.finished: List[CaseState] = []       # прежние запуски тех же (case, pid)
+        self.aborters: Dict[Key, Callable[[str], None]] = {}
+        self.t0 = time.time()
+        self.last_activity = time.time()
+
+    def states(self) -> List[CaseState]:
+        return self.finished + list(self.cases.values())
+
+    def feed(self, line: str, live: bool = True) -> None:
+        """
+        Строка телеметрии. live=False — история (файл дочитывается с начала):
+        счётчики обновляются, правила не проверяются.
+        """
+        rec = parse(line)
+        if rec is None:
+            return
+        key = rec_key(rec)
+        self.last_activity = time.time()
+        st = self.cases.get(key)
+        if st is None or rec.get("event") == "start":
+            if st is not None:
+                if not st.ended:
+                    st.ended, st.msg = True, "нет строки end (процесс перезапустил кейс)"
+                self.finished.append(st)
+            st = self.cases[key] = CaseState(*key)
+        st.update(rec, self.rules.window)
+        if live:
+            st.live = True
+        if not st.live or st.ended or st.abort is not None or "event" in rec:
+            return
+        reason = diverging(st, self.rules, rec.get("dt"))
+        if reason is not None:
+            self.stop(st, reason)
+
+    def stop(self, st: CaseState, reason: str) -> None:
+        """Останавливает идущий запуск; историю и чужие запуски не трогает."""
+        if not st.live or st.ended or self.cases.get((st.case, st.pid)) is not st:
+            return
+        st.abort, st.abort_wall = reason, time.time()
+        print(f"✗ {st.case} [pid {st.pid}]: {reason}"
+              + (" (dry-run: не останавливается)" if self.dry_run else ""), flush=True)
+        abort = self.aborters.get((st.case, st.pid))
+        if not self.dry_run and abort is not None:
+            abort(reason)
+
+    def check_timers(self) -> None:
+        now = time.time()
+        for st in self.cases.values():
+            if st.ended or not st.live:
+                continue
+            if st.abort is None:
+                reason = diverging(st, self.rules._replace(max_cuts=0, min_dt=0.0, fail_rate=0.0),
+                                   now=now)
+                if reason is not None:
+                    self.stop(st, reason)
+            elif (self.kill_after and not self.dry_run and not st.killed and st.pid
+                  and now - st.abort_wall > self.kill_after):
+                st.killed = True
+                try:
+                    os.kill(int(st.pid), signal.SIGTERM)
+                    print(f"✗ {st.case}: SIGTERM pid {st.pid}", flush=True)
+                except OSError as e:
+                    print(f"  {st.case}: не удалось завершить pid {st.pid}: {e}", flush=True)
+
+    def status(self) -> str:
+        sts = self.states()
+        active = [s for s in sts if s.live and not s.ended]
+        attempts = sum(s.attempts for s in sts)
+        accepted = sum(s.accepted for s in sts)
+        wall = max(time.time() - self.t0, 1e-9)
+        aborted = sum(s.abort is not None for s in sts)
+        return (f"[{time.strftime('%H:%M:%S')}] активных {len(active)}, завершено "
+                f"{len(sts) - len(active)} (остановлено {aborted}); попыток {attempts} "
+                f"({attempts / wall:.1f}/с), принято {accepted / max(attempts, 1):.0%}, "
+                f"модельных суток {sum(s.t for s in sts) / wall:.1f}/с")
+
+    def idle(self, seconds: float) -> bool:
+        return (bool(self.cases) and all(s.ended or not s.live for s in self.cases.values())
+                and time.time() - self.last_activity > seconds)
+
+
+def parse(line: str) -> Optional[dict]:
+    """Строка телеметрии или None (недописанная / чужая строка)."""
+    try:
+        rec = json.loads(line)
+    except ValueError:
+        return None
+    return rec if isinstance(rec, dict) and rec.get("case") else None
+
+
+def rec_key(rec: dict) -> Key:
+    pid = rec.get("pid")
+    return rec["case"], int(pid) if pid is not None else None
+
+
+async def tail_file(mon: Monitor, path: Path, poll: float, history: bool = False) -> None:
+    """
+    Читает <кейс>.<pid>.ndjson с начала, строка за строкой. history — файл
+    был до старта монитора: всё до первого конца файла идёт как история
+    (mon.feed(..., live=False)).
+    """
+    abort_path = path.with_suffix(ABORT_SUFFIX)
+
+    def abort(reason: str) -> None:
+        abort_path.write_text(reason + "\n", encoding="utf-8")
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        tail, live = "", not history
+        while True:
+            chunk = f.readline()
+            if not chunk:
+                live = True
+                if os.fstat(f.fileno()).st_size < f.tell():
+                    f.seek(0)                       # файл перезаписан новым запуском
+                    tail = ""
+                await asyncio.sleep(poll)
+                continue
+            tail += chunk
+            if not tail.endswith("\n"):
+                continue                            # строка ещё дописывается
+            line, tail = tail, ""
+            rec = parse(line)
+            if rec is None:
+                continue
+            mon.aborters[rec_key(rec)] = abort
+            mon.feed(line, live)
+
+
+async def watch_dir(mon: Monitor, root: Path, poll: float) -> None:
+    tasks: Dict[Path, asyncio.Task] = {}
+    history = True                                  # файлы первого обхода — до старта монитора
+    while True:
+        for p in root.glob(f"*{SUFFIX}"):
+            if p not in tasks:
+                tasks[p] = asyncio.create_task(tail_file(mon, p, poll, history))
+        history = False
+        await asyncio.sleep(poll * 5)
+
+
+async def serve(mon: Monitor, host: str, port: int) -> None:
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        def abort(reason: str) -> None:
+            writer.write(f"abort {reason}\n".encode("utf-8"))
+
+        while line := await reader.readline():
+            text = line.decode("utf-8", "replace")
+            rec = parse(text)
+            if rec is None:
+                continue
+            mon.aborters[rec_key(rec)] = abort
+            mon.feed(text)
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+async def run(mon: Monitor, source: Optional[Path], listen: Optional[str], poll: float,
+              report: float, until_idle: float) -> None:
+    if listen is not None:
+        host, _, port = listen.rpartition(":")
+        feeder = asyncio.create_task(serve(mon, host or "127.0.0.1", int(port)))
+    else:
+        feeder = asyncio.create_task(watch_dir(mon, source, poll))
+    next_report = time.time() + report
+    try:
+        while not feeder.done():
+            await asyncio.sleep(poll)
+            mon.check_timers()
+            if time.time() >= next_report:
+                print(mon.status(), flush=True)
+                next_report += report
+            if until_idle and mon.idle(until_idle):
+                break
+    finally:
+        feeder.cancel()
+    if feeder.done() and not feeder.cancelled() and feeder.exception() is not None:
+        raise feeder.exception()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Телеметрия идущих расчётов и остановка расходящихся кейсов")
+    ap.add_argument("source", nargs="?", type=Path, help="каталог JUTUL_TELEMETRY")
+    ap.add_argument("--listen", default=None, metavar="HOST:PORT",
+                    help="принимать телеметрию по TCP вместо каталога")
+    ap.add_argument("--max-cuts", type=int, default=6, help="срезов шага подряд (0 — выкл.)")
+    ap.add_argument("--min-dt", type=float, default=0.0, help="минимальный dt попытки, сут")
+    ap.add_argument("--fail-rate", default="", metavar="F/W",
+                    help="доля срезов F среди последних W попыток, например 0.7/20")
+    ap.add_argument("--stall", type=float, default=0.0, help="секунд без продвижения времени")
+    ap.add_argument("--kill-after", type=float, default=0.0,
+                    help="SIGTERM по pid, если кейс не остановился за столько секунд (0 — нет)")
+    ap.add_argument("--dry-run", action="store_true", help="только сообщать, не останавливать")
+    ap.add_argument("--poll", type=float, default=0.2, help="период опроса файлов, с")
+    ap.add_argument("--report", type=float, default=10.0, help="период сводки, с")
+    ap.add_argument("--until-idle", type=float, default=0.0,
+                    help="выйти, когда все кейсы завершены и новых нет столько секунд")
+    ap.add_argument("--json", type=Path, default=None, help="итог по кейсам в JSON")
+    args = ap.parse_args(argv)
+
+    if (args.source is None) == (args.listen is None):
+        ap.error("нужен каталог телеметрии или --listen")
+    if args.source is not None:
+        args.source.mkdir(parents=True, exist_ok=True)
+    fail_rate, window = 0.0, Rules().window
+    if args.fail_rate:
+        f, _, w = args.fail_rate.partition("/")
+        fail_rate, window = float(f), int(w or window)
+    rules = Rules(args.max_cuts, args.min_dt, fail_rate, window, args.stall)
+    mon = Monitor(rules, args.dry_run, args.kill_after)
+    try:
+        asyncio.run(run(mon, args.source, args.listen, args.poll, args.report, args.until_idle))
+    except KeyboardInterrupt:
+        pass
+    print(mon.status())
+    for st in mon.states():
+        if st.abort is not None:
+            print(f"  остановлен {st.case} [pid {st.pid}]: {st.abort}; потрачено {st.its} линеаризаций, "
+                  f"из них в срезанных попытках {st.wasted_its}")
+    if args.json is not None:
+        args.json.write_text(json.dumps([s.row() for s in mon.states()],
+                                        ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
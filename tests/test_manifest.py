@@ -0,0 +1,41 @@
+"""Два генератора в одном корне: --prune одного не трогает кейсы другого."""
+
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def run(*args: str) -> str:
+    res = subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True,
+                         text=True, check=True)
+    return res.stdout
+
+
+def test_sub_data_prune_keeps_bhp_cases(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for name in ("Egg_Model_ECL.DATA", "schedule_test.inc", "ACTIVE.INC"):
+        shutil.copy(ROOT / name, src / name)
+    shutil.copy(ROOT / "MDARCY.INC", src / "mDARCY.INC")     # имя, которое ждёт генератор
+    data = str(src / "Egg_Model_ECL.DATA")
+    out = tmp_path / "out"
+    run("new_data_bhp.py", "--data", data, "-o", str(out),
+        "-p", "QINJ", "--start", "10", "--stop", "12", "--step", "1", "-j", "1")
+    decks = sorted(out.glob("QINJ_*/*.DATA"))
+    assert len(decks) == 3
+
+    log = run("new_sub_data.py", "--base", str(out), "--bhp-start", "10", "--bhp-stop", "12",
+              "--total-days", "365", "--a-min", "100", "--a-max", "120", "--a-step", "10",
+              "--prune", "-j", "1")
+    assert "Удалено устаревших" not in log
+    assert all(d.is_file() for d in decks)
+    assert len(list(out.glob("QINJ_*/*_TSTEP_*.DATA"))) == 9
+
+    # повторный прогон первого генератора тоже не считает чужие кейсы устаревшими
+    log = run("new_data_bhp.py", "--data", data, "-o", str(out),
+              "-p", "QINJ", "--start", "10", "--stop", "12", "--step", "1", "-j", "1", "--prune")
+    assert "Удалено устаревших" not in log
+    assert len(list(out.glob("QINJ_*/*_TSTEP_*.DATA"))) == 9
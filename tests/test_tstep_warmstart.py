@@ -0,0 +1,59 @@
+"""Прогноз расписания tstep_warmstart: нормировка параметров и деление интервалов."""
+
+import datetime as dt
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import tstep_warmstart as tw  # noqa: E402
+
+GRID = np.concatenate([[0.0], np.geomspace(0.5, 400.0, tw.GRID_POINTS - 1)])
+
+
+def entry(case, dt_days, **feats):
+    return tw.Entry(case, feats, list(dt_days), 0, 0)
+
+
+def test_constant_feature_is_not_scaled_by_roundoff():
+    # 0.1 + 0.7 != 0.8: nanstd столбца ~1e-16
+    x = np.array([[0.1 + 0.7, b] for b in (300.0, 310.0, 320.0)] + [[0.8, 330.0]])
+    mu, sd = tw._scale(x)
+    assert sd[0] == 1.0
+    entries = [entry(f"c{i}", [1, 2], so=so, bhp=b) for i, (so, b) in enumerate(x)]
+    near = tw.neighbours(entries, {"so": 0.9, "bhp": 310.0}, 4)
+    assert all(d < 10 for _, d in near)
+    assert near[0][0] == 1
+
+
+def test_split_replays_single_neighbour():
+    steps = [1, 2, 5, 10, 20, 40, 0.75, 91.6875]
+    prof, near = tw.predict_profile([entry("n", steps, bhp=300.0)], {"bhp": 300.0}, GRID, "knn", 1)
+    assert near[0][0] == 0
+    assert prof.split(0.0, sum(steps)) == pytest.approx(steps, abs=1e-3)
+
+
+def test_report_intervals_keep_their_length():
+    steps = [1.5, 2.25, 7, 30, 45, 100]
+    prof, _ = tw.predict_profile([entry("n", steps, bhp=300.0)], {"bhp": 300.0}, GRID, "knn", 1)
+    schedule = "\n".join(["TSTEP", "   10 50 /", "",
+                          "DATES", "   1 JAN 2012 /", "/", "",
+                          "DATES", "   1 MAR 2012 /", "/", ""])
+    start = dt.date(2011, 10, 1)          # TSTEP 10 50 → 30 NOV, DATES 1 JAN — ещё 32 сут
+    text, out = tw.retime_schedule(schedule, start, prof.split)
+
+    lengths = [10.0, 50.0, float((dt.date(2012, 1, 1) - start).days) - 60.0,
+               float((dt.date(2012, 3, 1) - dt.date(2012, 1, 1)).days)]
+    t, parts = 0.0, []
+    for length in lengths:
+        piece = prof.split(t, length)
+        assert math.isclose(sum(piece), length, abs_tol=1e-9)
+        parts += piece
+        t += length
+    assert out == parts
+    assert out[:2] == pytest.approx([1.5, 2.25])
+    assert "1 JAN 2012" in text and "1 MAR 2012" in text
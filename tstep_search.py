@@ -0,0 +1,258 @@
+"""
+tstep_search.py
+---------------
+Адаптивный поиск окна первого шага TSTEP вместо полного перебора
+new_sub_data.py (1100..2700 через 20 ≈ 80 расчётов на папку).
+
+Целевая функция — суммарные итерации Ньютона (или линейные) как функция a
+при a + b = total; считается запуском симулятора на колоде *_TSTEP_a_b.DATA:
+  • kgrid  — coarse-to-fine: за раунд k точек (k = --workers) считаются
+    параллельно, интервал сужается до соседей лучшей точки;
+  • golden — золотое сечение на сетке a_step (по одному расчёту за шаг).
+Поиск останавливается, когда лучшее окно зажато с точностью --tol суток
+или исчерпан --max-evals. Предполагается унимодальность по a.
+
+Результаты копятся в <папка>/tstep_search.csv: повторный запуск не
+пересчитывает уже посчитанные a. Симулятор — внешняя команда, по умолчанию
+run_tstep_case.jl (те же настройки, что в run_bhp_parallel.jl); метрика
+берётся из логов jutul_N.jld2 или, если их нет, из *.PRT рядом с колодой.
+
+    python tstep_search.py --data D:\\runs\\QINJ_120\\EGG_MODEL_ECL.DATA -j 6 --tol 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import math
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from case_metrics import case_record, default_sim, run_monitored, sim_argv, write_record
+from case_pipeline import add_pool_args, run_jobs
+from new_sub_data import find_base_data_file, parse_template
+
+METRICS = ("newtons", "linear_iterations")
+METHODS = ("kgrid", "golden")
+RESULTS_NAME = "tstep_search.csv"
+DEFAULT_SIM = default_sim("data", "logs", "a")
+
+
+class Eval(NamedTuple):
+    a: int
+    b: int
+    value: float            # inf — расчёт не удался
+    seconds: float
+    status: str
+
+
+class SimJob(NamedTuple):
+    template: Path          # базовый .DATA
+    a: int
+    b: int
+    sim: str                # шаблон команды: {data} {logs} {a} {b}
+    metric: str
+
+
+def case_paths(template: Path, a: int, b: int) -> tuple:
+    """Колода и каталог логов — те же имена, что у new_sub_data / run_bhp_parallel."""
+    data = template.with_name(f"{template.stem}_TSTEP_{a:03}_{b:03}{template.suffix}")
+    return data, template.parent / "!logs" / f"TSTEP_{a}_{b}"
+
+
+def measure(data: Path, logs: Path, metric: str) -> float:
+    if logs.is_dir() and any(logs.glob("jutul_*.jld2")):
+        from jutul_logs import read_logs_dir
+        from wasted_work import summarize
+
+        return float(summarize(read_logs_dir(logs)).work[metric].total)
+    prt = data.with_suffix(".PRT")
+    if prt.is_file():
+        from prt_stats import summarize as prt_summary
+
+        s = prt_summary(prt)
+        return float(s.newton if metric == "newtons" else s.linear)
+    raise FileNotFoundError(f"нет логов jutul_N.jld2 в {logs} и нет {prt.name}")
+
+
+def run_case(job: SimJob) -> Eval:
+    data, logs = case_paths(job.template, job.a, job.b)
+    deck = parse_template(job.template.read_text(encoding="utf-8", errors="ignore"))
+    data.write_text(deck.render({"tstep": (job.a, job.b)}), encoding="utf-8")
+
+    fields = {"data": str(data), "logs": str(logs), "a": job.a, "b": job.b}
+    cmd = sim_argv(job.sim, **fields)
+    log_path = logs.with_suffix(".log")
+    rc, res = run_monitored(cmd, data.parent, log_path)
+    write_record(logs, case_record(data, logs, log_path, rc, res))
+    if rc != 0:
+        tail = log_path.read_text(encoding="utf-8", errors="replace").strip().splitlines()[-1:]
+        return Eval(job.a, job.b, math.inf, res.wall, "FAIL: " + (tail or [f"код {rc}"])[0][:200])
+    try:
+        return Eval(job.a, job.b, measure(data, logs, job.metric), res.wall, "ok")
+    except (OSError, ValueError) as e:
+        return Eval(job.a, job.b, math.inf, res.wall, f"FAIL: {e}")
+
+
+# -------------------- журнал расчётов -------------------------------
+
+def load_results(path: Path, metric: str) -> Dict[int, Eval]:
+    if not path.is_file():
+        return {}
+    out = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            if r["metric"] == metric:
+                out[int(r["a"])] = Eval(int(r["a"]), int(r["b"]), float(r["value"]),
+                                        float(r["seconds"]), r["status"])
+    return out
+
+
+def append_result(path: Path, ev: Eval, metric: str) -> None:
+    new = not path.is_file()
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        if new:
+            w.writerow(["a", "b", "metric", "value", "seconds", "status"])
+        w.writerow([ev.a, ev.b, metric, ev.value, f"{ev.seconds:.1f}", ev.status])
+
+
+# -------------------- поиск -----------------------------------------
+
+Evaluate = Callable[[Sequence[int]], None]
+
+
+class Search:
+    """Поиск минимума на сетке a; `evaluate` досчитывает недостающие точки в `seen`."""
+
+    def __init__(self, grid: List[int], seen: Dict[int, Eval], evaluate: Evaluate,
+                 tol: float, max_evals: int):
+        self.grid = grid
+        self.seen = seen
+        self._evaluate = evaluate
+        self.tol = tol
+        self.max_evals = max_evals
+        self.evals = 0
+
+    def value(self, i: int) -> float:
+        return self.seen[self.grid[i]].value
+
+    def evaluate(self, idx: Sequence[int]) -> bool:
+        """Досчитать точки; False — лимит расчётов исчерпан."""
+        todo = [self.grid[i] for i in sorted(set(idx)) if self.grid[i] not in self.seen]
+        room = self.max_evals - self.evals
+        if room <= 0 and todo:
+            return False
+        todo = todo[:room]
+        if todo:
+            self._evaluate(todo)
+            self.evals += len(todo)
+        return all(self.grid[i] in self.seen for i in idx)
+
+    def done(self, lo: int, hi: int) -> bool:
+        return hi - lo <= 1 or self.grid[hi] - self.grid[lo] <= self.tol
+
+    def kgrid(self, k: int) -> tuple:
+        lo, hi = 0, len(self.grid) - 1
+        k = max(k, 1)
+        while True:
+            n = min(k + 2, hi - lo + 1)
+            idx = sorted({lo + round(j * (hi - lo) / (n - 1)) for j in range(n)})
+            if not self.evaluate(idx):
+                break
+            known = [i for i in range(lo, hi + 1) if self.grid[i] in self.seen]
+            best = min(known, key=self.value)
+            pos = known.index(best)
+            lo, hi = known[max(pos - 1, 0)], known[min(pos + 1, len(known) - 1)]
+            if self.done(lo, hi) or all(self.grid[i] in self.seen for i in range(lo, hi + 1)):
+                break
+        return lo, hi
+
+    def golden(self) -> tuple:
+        inv = (math.sqrt(5) - 1) / 2
+        lo, hi = 0, len(self.grid) - 1
+        while not self.done(lo, hi) and hi - lo > 2:
+            x1 = hi - round(inv * (hi - lo))
+            x2 = lo + round(inv * (hi - lo))
+            if x1 >= x2:
+                x1, x2 = x2 - 1, x2
+            if not self.evaluate([x1, x2]):
+                break
+            if self.value(x1) <= self.value(x2):
+                hi = x2
+            else:
+                lo = x1
+        self.evaluate(range(lo, hi + 1))
+        return lo, hi
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Адаптивный поиск окна первого шага TSTEP")
+    ap.add_argument("--data", required=True, type=Path,
+                    help="базовый .DATA или папка кейса (QINJ_XXX) с ним")
+    ap.add_argument("--total-days", type=int, default=3000, help="Сумма первых двух чисел в TSTEP")
+    ap.add_argument("--a-min", type=int, default=1100)
+    ap.add_argument("--a-max", type=int, default=2700)
+    ap.add_argument("--a-step", type=int, default=20, help="шаг сетки a (минимальное разрешение)")
+    ap.add_argument("--tol", type=float, default=None,
+                    help="точность окна в сутках (по умолчанию = a-step)")
+    ap.add_argument("--method", choices=METHODS, default="kgrid")
+    ap.add_argument("--metric", choices=METRICS, default="newtons")
+    ap.add_argument("--max-evals", type=int, default=40, help="предел числа расчётов")
+    ap.add_argument("--sim", default=DEFAULT_SIM,
+                    help="команда симулятора; подстановки {data} {logs} {a} {b}")
+    add_pool_args(ap)
+    args = ap.parse_args(argv)
+
+    template = args.data.resolve()
+    if template.is_dir():
+        template = find_base_data_file(template)
+        if template is None:
+            raise SystemExit(f"В {args.data} нет .DATA.")
+    parse_template(template.read_text(encoding="utf-8", errors="ignore"))   # проверка TSTEP
+
+    a_min, a_max = max(1, args.a_min), min(args.total_days - 1, args.a_max)
+    grid = list(range(a_min, a_max + 1, args.a_step))
+    if len(grid) < 3:
+        raise SystemExit("Слишком узкий диапазон a для поиска.")
+    tol = args.a_step if args.tol is None else args.tol
+    log_path = template.parent / RESULTS_NAME
+    seen = {a: ev for a, ev in load_results(log_path, args.metric).items() if a in grid}
+
+    def evaluate(points: Sequence[int]) -> None:
+        jobs = [SimJob(template, a, args.total_days - a, args.sim, args.metric) for a in points]
+
+        def collect(ev: Eval) -> None:
+            seen[ev.a] = ev
+            append_result(log_path, ev, args.metric)
+            print(f"  a={ev.a:5d} b={ev.b:5d}  {args.metric}={ev.value:g}  "
+                  f"({ev.seconds:.0f} с) {'' if ev.status == 'ok' else ev.status}")
+
+        run_jobs(run_case, jobs, workers=min(args.workers, len(jobs)), on_result=collect,
+                 quiet=True)
+
+    if args.dry_run:
+        # дальнейшие раунды зависят от результатов — показываем только первый
+        n = min(max(args.workers, 1) + 2, len(grid))
+        first = sorted({grid[round(j * (len(grid) - 1) / (n - 1))] for j in range(n)} - set(seen))
+        run_jobs(run_case, [SimJob(template, a, args.total_days - a, args.sim, args.metric)
+                            for a in first],
+                 dry_run=True, describe=lambda j: f"a={j.a}, b={j.b}")
+        return
+
+    search = Search(grid, seen, evaluate, tol, args.max_evals)
+    print(f"{template.name}: сетка a {grid[0]}..{grid[-1]} ({len(grid)} точек), "
+          f"уже посчитано {len(seen)}, метод {args.method}")
+    lo, hi = search.kgrid(args.workers) if args.method == "kgrid" else search.golden()
+
+    ok = {a: ev for a, ev in seen.items() if math.isfinite(ev.value)}
+    if not ok:
+        raise SystemExit("Нет успешных расчётов.")
+    best = min(ok.values(), key=lambda ev: ev.value)
+    print(f"Лучшее окно: a={best.a}, b={best.b}, {args.metric}={best.value:g}; "
+          f"интервал [{grid[lo]}, {grid[hi]}]; расчётов {search.evals} "
+          f"(полный перебор — {len(grid)})")
+
+
+if __name__ == "__main__":
+    main()
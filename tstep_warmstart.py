@@ -0,0 +1,426 @@
+"""
+tstep_warmstart.py
+------------------
+Расписание TSTEP для нового кейса по прошлым расчётам — вместо ручного
+подбора первого шага (new_sub_data.py / tstep_search.py).
+
+Индекс (tstep_index.json) хранит для каждого досчитанного кейса:
+  • параметры колоды — bhp, qinj, so, p_init, skin (среднее по слотам поля
+    deck_patch, INCLUDE подставлены) и initial_dt (dt первой попытки);
+  • принятые dt ministep'ов (как write_tstep в generate_tstep.jl), число
+    срезанных попыток и итерации Ньютона в них (wasted_work).
+Источники — логи jutul_N.jld2 (нужен h5py) или tstep_summary.csv.
+
+Прогноз для новой колоды:
+  • knn    — k ближайших по нормированным параметрам, вес 1 / расстояние,
+    кейсы с частыми срезами шага весят меньше;
+  • linear — гребневая регрессия по параметрам;
+обе усредняют log dt соседей как функцию времени от начала расчёта.
+Каждый отчётный интервал колоды (значение TSTEP или продвигающая запись
+DATES) делится на шаги по этому профилю — моменты смены управления
+остаются на месте. Колода пишется как <stem>_TSTEP_a_b.DATA, a и b — первые
+два шага (a — initial_dt для run_tstep_case.jl / run_bhp_parallel.jl);
+SCHEDULE в ней раскрыт (INCLUDE подставлены).
+
+    python tstep_warmstart.py build D:\\runs --index D:\\tstep_index.json
+    python tstep_warmstart.py build --csv tstep_summary.csv --csv-root D:\\runs --index idx.json
+    python tstep_warmstart.py predict D:\\new\\BHP_250\\Egg_Model_ECL.DATA --index idx.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import os
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from case_metrics import DATA_RX
+from deck_patch import REPEAT_RX, TOKEN_RX, DeckTemplate
+from job_queue import logs_dir
+from result_cache import flatten_deck, rebase_includes, split_schedule
+from restart_fork import deck_date, start_date
+
+INDEX_VERSION = 1
+FEATURES = ("bhp", "qinj", "so", "p_init", "skin", "initial_dt")
+# поле deck_patch → параметр индекса
+DECK_FIELDS = {"bhp": "bhp", "qinj": "qinj", "soil": "so", "pressure": "p_init", "skin": "skin"}
+METHODS = ("knn", "linear")
+GRID_POINTS = 256
+MIN_SPLIT = 0.25         # остаток интервала короче MIN_SPLIT · dt присоединяется к шагу
+DT_DIGITS = 3            # шаги в колоде округляются до 10^-3 сут
+PER_LINE = 10
+
+
+class Entry(NamedTuple):
+    case: str
+    features: Dict[str, float]
+    dt: List[float]          # принятые dt ministep'ов, сут
+    cuts: int                # срезанных попыток (−1 — неизвестно)
+    wasted: int              # итераций Ньютона в срезанных попытках
+
+
+# -------------------- параметры колоды ------------------------------
+
+def _number(tok: str) -> float:
+    try:
+        return float(tok.strip("'").replace("D", "E").replace("d", "e"))
+    except ValueError:
+        return math.nan
+
+
+def deck_features(data: Path) -> Dict[str, float]:
+    """Параметры кейса из колоды: среднее по слотам поля (нет поля — NaN)."""
+    text = flatten_deck(data.read_bytes(), data.parent).decode("utf-8", "replace")
+    deck = DeckTemplate(text)
+    out = {}
+    for field, name in DECK_FIELDS.items():
+        vals = [v for v in map(_number, deck.values(field)) if not math.isnan(v)]
+        out[name] = float(np.mean(vals)) if vals else math.nan
+    m = DATA_RX.search(data.name)
+    out["initial_dt"] = float(m.group(1)) if m else math.nan
+    return out
+
+
+# -------------------- индекс ----------------------------------------
+
+def entry_from_logs(data: Path, logs: Path) -> Optional[Entry]:
+    from jutul_logs import DAY, read_logs_dir
+
+    att = read_logs_dir(logs)
+    if not att.size:
+        return None
+    ok = att["success"]
+    feats = deck_features(data)
+    feats["initial_dt"] = float(att["dt"][0] / DAY)
+    return Entry(str(data), feats, [float(d) for d in att["dt"][ok] / DAY],
+                 int((~ok).sum()), int(att["newtons"][~ok].sum()))
+
+
+def entries_from_csv(path: Path, root: Optional[Path]) -> List[Entry]:
+    """tstep_summary.csv: run_dir, initial_dt, dt1…dtN; параметры — из колоды run_dir."""
+    from new_sub_data import find_base_data_file
+
+    out = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            dts = [float(v) for k, v in row.items() if k.startswith("dt") and v]
+            if not dts:
+                continue
+            folder = root / row["run_dir"] if root is not None else None
+            base = find_base_data_file(folder) if folder is not None and folder.is_dir() else None
+            feats = deck_features(base) if base is not None else dict.fromkeys(FEATURES, math.nan)
+            feats["initial_dt"] = float(row["initial_dt"])
+            out.append(Entry(f"{row['run_dir']}@{row['initial_dt']}", feats, dts, -1, 0))
+    return out
+
+
+def load_index(path: Path) -> List[Entry]:
+    if not path.is_file():
+        return []
+    doc = json.loads(path.read_text(encoding="utf-8"))
+    if doc.get("version") != INDEX_VERSION:
+        raise SystemExit(f"{path}: другая версия индекса ({doc.get('version')}), пересоберите.")
+    return [Entry(e["case"], e["features"], e["dt"], e["cuts"], e["wasted"]) for e in doc["entries"]]
+
+
+def save_index(path: Path, entries: Sequence[Entry]) -> None:
+    doc = {"version": INDEX_VERSION, "features": list(FEATURES),
+           "entries": [e._asdict() for e in sorted(entries, key=lambda e: e.case)]}
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(doc, ensure_ascii=False, indent=0), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# -------------------- прогноз ---------------------------------------
+
+def _matrix(entries: Sequence[Entry]) -> np.ndarray:
+    return np.array([[e.features.get(k, math.nan) for k in FEATURES] for e in entries], dtype=float)
+
+
+def _scale(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)     # параметр неизвестен у всех
+        mu = np.nanmean(x, axis=0)
+        sd = np.nanstd(x, axis=0)
+    mu = np.where(np.isfinite(mu), mu, 0.0)
+    # параметр без разброса (so = 0.8 у всех): nanstd даёт ~1e-16, не делим на шум
+    sd = np.where(np.isfinite(sd) & (sd > 1e-12 * np.maximum(np.abs(mu), 1.0)), sd, 1.0)
+    return mu, sd
+
+
+def step_ends(dt: Sequence[float]) -> np.ndarray:
+    return np.cumsum(np.asarray(dt, dtype=float))
+
+
+def log_profile(dt: Sequence[float], grid: np.ndarray) -> np.ndarray:
+    """log dt шага, идущего с момента grid (на границе — следующий; после конца — последний)."""
+    dt = np.asarray(dt, dtype=float)
+    ends = step_ends(dt)
+    idx = np.minimum(np.searchsorted(ends, grid, side="right"), dt.size - 1)
+    return np.log(dt[idx])
+
+
+def neighbours(entries: Sequence[Entry], feats: Dict[str, float], k: int) -> List[Tuple[int, float]]:
+    """(номер записи, расстояние) k ближайших; сравниваются только известные у обоих параметры."""
+    x = _matrix(entries)
+    mu, sd = _scale(x)
+    q = (np.array([feats.get(n, math.nan) for n in FEATURES]) - mu) / sd
+    z = (x - mu) / sd
+    diff = z - q
+    known = np.isfinite(diff)
+    # нет общих параметров — запись дальше всех
+    d = np.where(known.any(axis=1),
+                 np.sqrt(np.where(known, diff, 0.0) ** 2 @ np.ones(len(FEATURES))
+                         / np.maximum(known.sum(axis=1), 1)), np.inf)
+    order = np.argsort(d, kind="stable")[:k]
+    return [(int(i), float(d[i])) for i in order]
+
+
+def predict_profile(entries: Sequence[Entry], feats: Dict[str, float], grid: np.ndarray,
+                    method: str = "knn", k: int = 4, ridge: float = 1e-2
+                    ) -> Tuple[Profile, List[Tuple[int, float]]]:
+    """
+    Профиль dt(t) и соседи, на которых основан прогноз. К сетке grid
+    добавляются концы шагов использованных расчётов: профиль меняется ровно
+    на их границах, и один сосед воспроизводится шаг в шаг.
+    """
+    near = neighbours(entries, feats, k)
+    if method == "linear" and len(entries) > len(FEATURES) + 1:
+        grid = np.union1d(grid, np.concatenate([step_ends(e.dt) for e in entries]))
+        x = _matrix(entries)
+        mu, sd = _scale(x)
+        z = np.nan_to_num((x - mu) / sd)                 # неизвестный параметр — среднее
+        q = np.nan_to_num((np.array([feats.get(n, math.nan) for n in FEATURES]) - mu) / sd)
+        y = np.stack([log_profile(e.dt, grid) for e in entries])
+        a = np.hstack([np.ones((len(entries), 1)), z])
+        reg = ridge * np.eye(a.shape[1])
+        reg[0, 0] = 0.0
+        coef = np.linalg.solve(a.T @ a + reg, a.T @ y)
+        return Profile(grid, np.concatenate([[1.0], q]) @ coef), near
+    grid = np.union1d(grid, np.concatenate([step_ends(entries[i].dt) for i, _ in near]))
+    w = []
+    for i, d in near:
+        e = entries[i]
+        rate = e.cuts / max(len(e.dt), 1) if e.cuts >= 0 else 0.0
+        w.append(1.0 / ((d + 1e-6) * (1.0 + rate)))
+    w = np.array(w)
+    w = w / w.sum() if w.sum() > 0 else np.full(len(near), 1.0 / len(near))   # общих параметров нет
+    prof = np.stack([log_profile(entries[i].dt, grid) for i, _ in near])
+    return Profile(grid, w @ prof), near
+
+
+class Profile:
+    """
+    dt(t) по прогнозу: кусочно-постоянная функция времени от начала, сут;
+    log_dt[i] — log dt шага, идущего с момента grid[i].
+    """
+
+    def __init__(self, grid: np.ndarray, log_dt: np.ndarray):
+        self.grid = grid
+        self.log_dt = log_dt
+
+    def __call__(self, t: float) -> float:
+        # допуск — округление шагов до DT_DIGITS: момент чуть раньше границы — уже за ней
+        t += 0.5 * 10.0 ** -DT_DIGITS + 1e-9
+        i = min(int(np.searchsorted(self.grid, t, side="right")) - 1, self.grid.size - 1)
+        return float(np.exp(self.log_dt[max(i, 0)]))
+
+    def split(self, t0: float, length: float) -> List[float]:
+        """Шаги, покрывающие отчётный интервал [t0, t0 + length]."""
+        steps: List[float] = []
+        t, left = t0, length
+        while left > 0:
+            dt = self(t)
+            if left - dt < MIN_SPLIT * dt:
+                dt = left
+            dt = round(dt, DT_DIGITS) if dt < left else left
+            steps.append(dt)
+            t += dt
+            left = round(left - dt, 9)
+        return steps
+
+
+# -------------------- колода ----------------------------------------
+
+def _fmt(d: float) -> str:
+    return str(int(round(d))) if abs(d - round(d)) < 1e-6 else f"{d:.6g}"
+
+
+def _tstep_block(steps: Sequence[float]) -> List[str]:
+    rows = [" ".join(_fmt(d) for d in steps[i:i + PER_LINE])
+            for i in range(0, len(steps), PER_LINE)]
+    return ["TSTEP"] + [f"   {r}" for r in rows[:-1]] + [f"   {rows[-1]} /", ""]
+
+
+def retime_schedule(schedule: str, start, profile: Callable[[float, float], List[float]]
+                    ) -> Tuple[str, List[float]]:
+    """
+    SCHEDULE (раскрытый, без комментариев) с отчётными интервалами, поделёнными
+    profile(t0, length). DATES пишется по записи на блок, перед продвигающей
+    записью — TSTEP с её шагами, кроме последнего. → (текст, все шаги подряд).
+    """
+    out: List[str] = []
+    steps: List[float] = []
+    kw: Optional[str] = None
+    record: List[str] = []
+    values: List[float] = []
+    t = 0.0                                        # сут от start
+
+    for line in schedule.splitlines():
+        if kw is None:
+            if line.strip().upper() in ("DATES", "TSTEP"):
+                kw = line.strip().upper()
+            else:
+                out.append(line)
+            continue
+        for tok in TOKEN_RX.findall(line):
+            if kw == "TSTEP":
+                if tok == "/":
+                    parts: List[float] = []
+                    for v in values:
+                        parts += profile(t, v)
+                        t += v
+                    if parts:
+                        out += _tstep_block(parts)
+                    steps += parts
+                    values, kw = [], None
+                    break
+                rep = REPEAT_RX.fullmatch(tok)
+                values += [_number(rep.group(2))] * int(rep.group(1)) if rep else [_number(tok)]
+            else:
+                if tok != "/":
+                    record.append(tok)
+                    continue
+                if not record:                     # пустая запись — конец DATES
+                    kw = None
+                    break
+                d = deck_date(record)
+                if start is None:
+                    start = d                      # без START отсчёт от первой DATES
+                length = float((d - start).days) - t   # t учитывает и TSTEP перед DATES
+                if length > 0:
+                    parts = profile(t, length)
+                    if len(parts) > 1:
+                        out += _tstep_block(parts[:-1])
+                    steps += parts
+                    t += length
+                out += ["DATES", f"   {' '.join(record)} /", "/", ""]
+                record = []
+    return "\n".join(out) + "\n", steps
+
+
+def warm_deck(data: Path, profile: Profile,
+              out_dir: Optional[Path] = None) -> Tuple[str, List[float]]:
+    """
+    Колода с расписанием по профилю: часть до SCHEDULE — как в исходной,
+    для out_dir не рядом с исходной пути её INCLUDE пересчитываются от out_dir.
+    """
+    raw = data.read_text(encoding="utf-8", errors="ignore")
+    head, schedule = split_schedule(raw)
+    if out_dir is not None and out_dir.resolve() != data.parent.resolve():
+        head = rebase_includes(head.encode("utf-8"), data.parent, out_dir).decode("utf-8")
+    if not schedule:
+        raise ValueError(f"{data.name}: нет секции SCHEDULE")
+    flat = flatten_deck(schedule.encode("utf-8"), data.parent).decode("utf-8", "replace")
+    body, steps = retime_schedule(flat, start_date(head), profile.split)
+    if not steps:
+        raise ValueError(f"{data.name}: в SCHEDULE нет TSTEP / DATES")
+    return head + body, steps
+
+
+def warm_name(data: Path, steps: Sequence[float]) -> str:
+    stem = DATA_RX.sub("", data.name)
+    stem = stem[:-len(data.suffix)] if stem.endswith(data.suffix) else stem
+    a = max(1, int(round(steps[0])))
+    b = max(1, int(round(steps[1]))) if len(steps) > 1 else a
+    return f"{stem}_TSTEP_{a:03}_{b:03}{data.suffix}"
+
+
+# -------------------- CLI -------------------------------------------
+
+def _build(args) -> None:
+    entries = {e.case: e for e in load_index(args.index)}
+    n = failed = 0
+    for root in args.roots:
+        paths = [root] if root.is_file() else sorted(root.rglob(args.glob))
+        for data in paths:
+            if "!logs" in data.parts:
+                continue
+            m = DATA_RX.search(data.name)
+            logs = logs_dir(data, *(int(g) for g in m.groups())) if m else logs_dir(data, None, None)
+            if not logs.is_dir() or not any(logs.glob("jutul_*.jld2")):
+                continue
+            try:
+                e = entry_from_logs(data.resolve(), logs)
+            except (OSError, ValueError, KeyError) as err:
+                print(f"✗ {data}: {err}")
+                failed += 1
+                continue
+            if e is not None:
+                entries[e.case] = e
+                n += 1
+    if args.csv is not None:
+        for e in entries_from_csv(args.csv, args.csv_root):
+            entries[e.case] = e
+            n += 1
+    save_index(args.index, list(entries.values()))
+    print(f"Индекс {args.index}: записей {len(entries)} (добавлено/обновлено {n}, ошибок {failed})")
+
+
+def _predict(args) -> None:
+    entries = load_index(args.index)
+    if not entries:
+        raise SystemExit(f"Индекс пуст: {args.index}")
+    horizon = max(sum(e.dt) for e in entries)
+    grid = np.concatenate([[0.0], np.geomspace(0.5, max(horizon, 1.0), GRID_POINTS - 1)])
+    for data in args.decks:
+        feats = deck_features(data)
+        if args.initial_dt is not None:
+            feats["initial_dt"] = float(args.initial_dt)
+        profile, near = predict_profile(entries, feats, grid, args.method, args.k)
+        text, steps = warm_deck(data, profile, args.out)
+        out = (args.out or data.parent) / warm_name(data, steps)
+        print(f"{data} → {out.name}: {len(steps)} шагов, первый {steps[0]:g} сут")
+        for i, d in near:
+            e = entries[i]
+            cuts = "?" if e.cuts < 0 else e.cuts
+            print(f"    {d:6.3f}  {e.case}  ({len(e.dt)} шагов, срезов {cuts})")
+        if not args.dry_run:
+            out.parent.mkdir(parents=True, exist_ok=True)
+            out.write_text(text, encoding="utf-8")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Расписание TSTEP нового кейса по прошлым расчётам")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="добавить досчитанные кейсы в индекс")
+    p_build.add_argument("roots", nargs="*", type=Path, help="каталоги с кейсами или .DATA")
+    p_build.add_argument("--glob", default="*.DATA", help="шаблон имён колод")
+    p_build.add_argument("--csv", type=Path, default=None, help="tstep_summary.csv")
+    p_build.add_argument("--csv-root", type=Path, default=None,
+                         help="каталог с папками run_dir из CSV (параметры колод)")
+    p_predict = sub.add_parser("predict", help="колоды с прогнозным расписанием")
+    p_predict.add_argument("decks", nargs="+", type=Path)
+    p_predict.add_argument("--method", choices=METHODS, default="knn")
+    p_predict.add_argument("-k", type=int, default=4, help="соседей для knn")
+    p_predict.add_argument("--initial-dt", type=float, default=None,
+                           help="initial_dt нового кейса, сут (по умолчанию — из имени или неизвестен)")
+    p_predict.add_argument("--out", type=Path, default=None, help="каталог колод (по умолчанию — рядом)")
+    p_predict.add_argument("--dry-run", action="store_true", help="только напечатать")
+    for p in (p_build, p_predict):
+        p.add_argument("--index", type=Path, default=Path("tstep_index.json"), help="файл индекса")
+    args = ap.parse_args(argv)
+    if args.command == "build":
+        _build(args)
+    else:
+        _predict(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+wasted_work.py
+--------------
+Потерянная работа решателя (accepted / all / wasted) как в counter.jl
+`process_logs`, но векторно и сразу по целым переборам:
+  • попытки группируются в ministep'ы до success=true — через cumsum маски
+    успеха, без цикла Python по попыткам;
+  • хвост неудачных попыток в конце файла (без success) в группы не входит,
+    как и в counter.jl;
+  • суммы по ministep'ам, шагам (файлам jutul_N) и кейсам — np.bincount.
+
+Вход — структурированный массив попыток в порядке файлов: ATTEMPT_DTYPE
+(jutul_logs) или STORE_DTYPE (ministep_store); статистика -1 считается нулём.
+
+    python wasted_work.py D:\\stats --by case a         # по хранилищу
+    python wasted_work.py --bench 4000000                # бенчмарк
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+STATS = ("newtons", "linearizations", "linear_iterations", "precond")
+# подписи и порядок строк как в выводе process_logs
+LABELS = (("newtons", "Newton"), ("linearizations", "Linearization"),
+          ("linear_iterations", "Linear solver"), ("precond", "Precond apply"))
+# initial_dt — строки tstep_summary.csv (a = b = -1) различаются только им
+FILE_KEYS = ("sweep", "case", "a", "b", "initial_dt", "log_idx")
+
+
+class Work(NamedTuple):
+    total: int
+    wasted: int
+
+
+class Summary(NamedTuple):
+    nsteps: int                     # файлов jutul_N (шагов)
+    tot_ms: int                     # принятых ministep'ов
+    work: Dict[str, Work]           # по STATS
+
+
+class Groups(NamedTuple):
+    file_id: np.ndarray             # на попытку: номер файла (0..nfiles-1)
+    ms_id: np.ndarray               # на попытку: номер ministep'а по всем файлам
+    closed: np.ndarray              # попытка входит в завершённый ministep
+    nfiles: int
+    nms: int
+
+
+def file_ids(att: np.ndarray, keys: Sequence[str] = FILE_KEYS) -> Tuple[np.ndarray, int]:
+    """Номер файла на попытку: смена любого ключевого поля между соседними строками."""
+    keys = [k for k in keys if k in att.dtype.names]
+    if att.size == 0:
+        return np.zeros(0, dtype=np.int64), 0
+    change = np.zeros(att.size, dtype=bool)
+    change[0] = True
+    for k in keys:
+        col = att[k]
+        diff = col[1:] != col[:-1]
+        if col.dtype.kind == "f":
+            diff &= ~(np.isnan(col[1:]) & np.isnan(col[:-1]))     # NaN — «неизвестно», не смена
+        change[1:] |= diff
+    fid = np.cumsum(change) - 1
+    return fid, int(fid[-1]) + 1
+
+
+def group_attempts(att: np.ndarray, keys: Sequence[str] = FILE_KEYS) -> Groups:
+    fid, nfiles = file_ids(att, keys)
+    ok = np.asarray(att["success"], dtype=np.int64)
+    c = np.cumsum(ok)
+    before = c - ok                                  # успехов до попытки (глобально)
+    if att.size == 0:
+        return Groups(fid, before, ok.astype(bool), 0, 0)
+    starts = np.flatnonzero(np.r_[True, fid[1:] != fid[:-1]])
+    ends = np.r_[starts[1:], att.size] - 1
+    first = before[starts]                           # успехов до начала файла
+    n_ok = c[ends] - first                           # успехов в файле
+    in_file = before - first[fid]                    # номер ministep'а внутри файла
+    closed = in_file < n_ok[fid]
+    return Groups(fid, before, closed, nfiles, int(c[-1]))
+
+
+def _stat(att: np.ndarray, name: str) -> np.ndarray:
+    return np.maximum(np.asarray(att[name], dtype=np.int64), 0)
+
+
+def summarize(att: np.ndarray, keys: Sequence[str] = FILE_KEYS) -> Summary:
+    """Итоги как у process_logs: total по попыткам завершённых ministep'ов, wasted = total - accepted."""
+    g = group_attempts(att, keys)
+    ok = np.asarray(att["success"], dtype=bool)
+    work = {}
+    for s in STATS:
+        v = _stat(att, s)
+        total = int(v[g.closed].sum())
+        work[s] = Work(total, total - int(v[ok].sum()))
+    return Summary(g.nfiles, g.nms, work)
+
+
+def ministep_table(att: np.ndarray, keys: Sequence[str] = FILE_KEYS) -> Dict[str, np.ndarray]:
+    """Строка на ministep (как jutul_ministeps_all.csv): attempts, dt, *_acc / *_all / *_wasted."""
+    g = group_attempts(att, keys)
+    ok = np.asarray(att["success"], dtype=bool)
+    ms = g.ms_id[g.closed]
+    acc_idx = np.flatnonzero(ok)                     # принятая попытка ministep'а k — acc_idx[k]
+    out = {"file_id": g.file_id[acc_idx], "log_idx": np.asarray(att["log_idx"])[acc_idx],
+           "attempts": np.bincount(ms, minlength=g.nms), "dt": np.asarray(att["dt"])[acc_idx]}
+    for s in STATS:
+        v = _stat(att, s)
+        out[f"{s}_all"] = np.bincount(ms, weights=v[g.closed], minlength=g.nms).astype(np.int64)
+        out[f"{s}_acc"] = v[acc_idx]
+        out[f"{s}_wasted"] = out[f"{s}_all"] - out[f"{s}_acc"]
+    return out
+
+
+def totals_by(att: np.ndarray, by: Sequence[str],
+              keys: Sequence[str] = FILE_KEYS) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Суммы all / wasted и число ministep'ов по группам `by` (кейс, окно a, …)."""
+    g = group_attempts(att, keys)
+    ok = np.asarray(att["success"], dtype=bool)
+    codes, levels = [], []
+    for k in by:
+        lv, inv = np.unique(np.asarray(att[k]), return_inverse=True)
+        levels.append(lv)
+        codes.append(inv)
+    shape = [max(lv.size, 1) for lv in levels]
+    flat = np.ravel_multi_index(codes, shape) if by else np.zeros(att.size, dtype=np.int64)
+    groups, gid = np.unique(flat, return_inverse=True)
+    n = groups.size
+    out = {"ministeps": np.bincount(gid[ok], minlength=n)}
+    for s in STATS:
+        v = _stat(att, s)
+        out[f"{s}_all"] = np.bincount(gid[g.closed], weights=v[g.closed], minlength=n).astype(np.int64)
+        acc = np.bincount(gid[ok], weights=v[ok], minlength=n).astype(np.int64)
+        out[f"{s}_wasted"] = out[f"{s}_all"] - acc
+    idx = np.unravel_index(groups, shape)
+    keys_out = (np.column_stack([lv[i].astype(object) for lv, i in zip(levels, idx)])
+                if by else np.empty((n, 0)))
+    return keys_out, out
+
+
+def print_summary(s: Summary) -> None:
+    """Тот же вывод, что печатает process_logs."""
+    print(f"Totals across {s.nsteps} steps, {s.tot_ms} ministeps:")
+    for key, label in LABELS:
+        w = s.work[key]
+        print(f"  {label:<15}: total {w.total} (wasted {w.wasted}) | "
+              f"avg/step {w.total / max(s.nsteps, 1):.3f}  avg/ministep {w.total / max(s.tot_ms, 1):.4f}")
+
+
+# -------------------- эталон и бенчмарк -----------------------------
+
+def _summarize_loop(att: np.ndarray, keys: Sequence[str] = FILE_KEYS) -> Summary:
+    """Прямой перенос циклов process_logs (для проверки и сравнения скорости)."""
+    fid, nfiles = file_ids(att, keys)
+    rows = att.tolist()
+    names = att.dtype.names
+    si = names.index("success")
+    cols = [names.index(s) for s in STATS]
+    tot_ms = 0
+    total = dict.fromkeys(STATS, 0)
+    wasted = dict.fromkeys(STATS, 0)
+    cur: List[tuple] = []
+    prev = -1
+    for f, r in zip(fid.tolist(), rows):
+        if f != prev:
+            cur, prev = [], f                     # незавершённый хвост файла отбрасывается
+        cur.append(r)
+        if r[si]:
+            tot_ms += 1
+            for s, j in zip(STATS, cols):
+                a = sum(max(x[j], 0) for x in cur)
+                total[s] += a
+                wasted[s] += a - max(r[j], 0)
+            cur = []
+    return Summary(nfiles, tot_ms, {s: Work(total[s], wasted[s]) for s in STATS})
+
+
+def synthetic_attempts(n: int, seed: int = 0) -> np.ndarray:
+    from jutul_logs import ATTEMPT_DTYPE
+
+    rng = np.random.default_rng(seed)
+    att = np.zeros(n, dtype=ATTEMPT_DTYPE)
+    att["log_idx"] = np.sort(rng.integers(1, max(2, n // 40), n))
+    att["success"] = rng.random(n) < 0.75
+    att["dt"] = rng.random(n) * 86400
+    for s, hi in zip(STATS, (15, 16, 200, 400)):
+        att[s] = rng.integers(0, hi, n)
+    return att
+
+
+def benchmark(n_max: int) -> None:
+    sizes = [n for n in (10**5, 10**6, 4 * 10**6, 10**7, 4 * 10**7) if n < n_max] + [n_max]
+    for n in sizes:
+        att = synthetic_attempts(n)
+        t0 = time.perf_counter()
+        s = summarize(att)
+        ministep_table(att)
+        dt = time.perf_counter() - t0
+        line = f"  {n:>10d} попыток: {dt:7.3f} с  ({n / dt / 1e6:6.1f} млн/с)"
+        if n <= 10**6:
+            t0 = time.perf_counter()
+            ref = _summarize_loop(att)
+            t_loop = time.perf_counter() - t0
+            assert ref == s, (ref, s)
+            line += f"  | цикл Python: {t_loop:6.2f} с (x{t_loop / dt:.0f})"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser("Потерянная работа решателя (как counter.jl) по хранилищу ministep'ов")
+    ap.add_argument("store", nargs="?", type=Path, help="каталог ministep_store")
+    ap.add_argument("--sweep", nargs="*", default=None)
+    ap.add_argument("--by", nargs="*", default=[], help="группировка: sweep case case_num a b …")
+    ap.add_argument("--bench", type=int, default=None, metavar="N", help="бенчмарк до N попыток")
+    args = ap.parse_args(argv)
+
+    if args.bench:
+        benchmark(args.bench)
+        return
+    if args.store is None:
+        ap.error("нужен каталог хранилища или --bench")
+
+    from ministep_store import MinistepStore
+
+    store = MinistepStore(args.store)
+    parts = list(store.parts(args.sweep))
+    att = np.concatenate(parts) if parts else np.empty(0)
+    if not att.size:
+        raise SystemExit("В хранилище нет попыток.")
+    print_summary(summarize(att))
+
+    if args.by:
+        keys, out = totals_by(att, args.by)
+        names = {"sweep": store.index["sweeps"], "case": store.index["cases"]}
+        w = csv.writer(sys.stdout)
+        w.writerow(list(args.by) + list(out))
+        for i, k in enumerate(keys.tolist()):
+            w.writerow([names[c][v] if c in names else v for c, v in zip(args.by, k)]
+                       + [int(col[i]) for col in out.values()])
+
+
+if __name__ == "__main__":
+    main()